@@ -21,6 +21,7 @@ config['paths']['server_settings_path'] = os.path.join(config['paths']['resource
 config['paths']['usermanager_path'] = os.path.join(config['paths']['resource_path'], 'user-db.json')
 if 'theano' in config:
     config['theano']['initial_number_of_nodes'] = '50'
+    config['theano']['function_cache_directory'] = os.path.join(config['paths']['resource_path'], 'theano_functions')
 
 from micropsi_core import runtime as micropsi
 
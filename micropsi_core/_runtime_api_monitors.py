@@ -8,6 +8,7 @@ __author__ = 'dominik'
 __date__ = '11.12.12'
 
 from micropsi_core.nodenet import monitor
+from micropsi_core.nodenet import step_profiler
 
 import micropsi_core
 
@@ -77,9 +78,10 @@ def export_monitor_data(nodenet_uid, monitor_uid=None):
         return micropsi_core.runtime.nodenets[nodenet_uid].construct_monitors_dict()
 
 
-def get_monitor_data(nodenet_uid, step=0):
+def get_monitor_data(nodenet_uid, step=0, monitor_from_step=None):
     """Returns monitor and nodenet data for drawing monitor plots for the current step,
-    if the current step is newer than the supplied simulation step."""
+    if the current step is newer than the supplied simulation step.
+    If monitor_from_step is given, only monitor values from that step on are returned."""
     data = {
         'nodenet_running': micropsi_core.runtime.nodenets[nodenet_uid].is_active,
         'current_step': micropsi_core.runtime.nodenets[nodenet_uid].current_step
@@ -87,5 +89,30 @@ def get_monitor_data(nodenet_uid, step=0):
     if step > data['current_step']:
         return data
     else:
-        data['monitors'] = micropsi_core.runtime.export_monitor_data(nodenet_uid)
+        data['monitors'] = micropsi_core.runtime.nodenets[nodenet_uid].construct_monitors_dict(monitor_from_step)
         return data
+
+
+def get_step_profile(nodenet_uid):
+    """Returns timing statistics of the recent steps of the given nodenet, per step operator, partition,
+    native module type, world step and monitor update. Durations are in seconds, histogram counts refer
+    to the returned histogram_bin_edges."""
+    profiler = micropsi_core.runtime.nodenets[nodenet_uid].profiler
+    return {
+        'enabled': profiler.enabled,
+        'window': profiler.window,
+        'histogram_bin_edges': step_profiler.HISTOGRAM_BIN_EDGES.tolist(),
+        'sections': profiler.get_profile()
+    }
+
+
+def reset_step_profile(nodenet_uid):
+    """Discards the recorded step timings of the given nodenet"""
+    micropsi_core.runtime.nodenets[nodenet_uid].profiler.reset()
+    return True
+
+
+def set_step_profiling(nodenet_uid, enabled):
+    """Switches recording of step timings for the given nodenet on or off"""
+    micropsi_core.runtime.nodenets[nodenet_uid].profiler.enabled = enabled
+    return True
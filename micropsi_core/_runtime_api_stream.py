@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runtime API functionality for streaming nodenet steps to subscribers
+"""
+
+import threading
+
+import micropsi_core
+from micropsi_core import tools
+
+# subscriptions per nodenet uid, see subscribe_nodenet_stream
+stream_subscriptions = {}
+stream_lock = threading.Lock()
+
+
+class StepSubscription(object):
+    """A subscriber to the steps of a nodenet.
+
+    The runner only marks the subscription as pending after each step. The frame is built when the
+    subscriber asks for it, so a slow subscriber skips intermediate steps instead of queueing them up.
+    Nodespace changes, monitor values and log records are collected since the last delivered frame,
+    so nothing but intermediate activations is lost by skipping.
+
+    Attributes:
+        nodenet_uid: the nodenet this subscription follows
+        nodespace: the nodespace to send nodenet data for, or None for no nodenet data
+        include_links: whether to send the links of the nodespace
+        viewport: a rectangle [left, top, right, bottom] to send the nodes of, or None for the whole nodespace
+        monitors: a list of monitor uids to send values for, or True for all monitors
+        logger: a list of logger names to send records for
+        step_profile: whether to send the step profile of the nodenet
+        dropped: the number of steps that were skipped since the last frame
+    """
+
+    def __init__(self, nodenet_uid, nodespace=None, include_links=True, monitors=None, logger=None, step_profile=False, viewport=None):
+        self.uid = tools.generate_uid()
+        self.nodenet_uid = nodenet_uid
+        self.nodespace = nodespace
+        self.include_links = include_links
+        self.viewport = viewport
+        self.monitors = monitors
+        self.logger = logger or []
+        self.step_profile = step_profile
+        self.closed = False
+        self.dropped = 0
+        self.__pending = True
+        self.__revision = None
+        self.__monitor_from_step = None
+        self.__log_seq = 0
+        self.__condition = threading.Condition()
+
+    def notify(self):
+        with self.__condition:
+            if self.__pending:
+                self.dropped += 1
+            self.__pending = True
+            self.__condition.notify()
+
+    def close(self):
+        with self.__condition:
+            self.closed = True
+            self.__condition.notify()
+
+    def wait(self, timeout=None):
+        """Waits until the nodenet stepped since the last frame.
+        Returns False if the timeout passed or the subscription was closed."""
+        with self.__condition:
+            if not self.__pending and not self.closed:
+                self.__condition.wait(timeout)
+            ready = self.__pending and not self.closed
+            self.__pending = False
+            return ready
+
+    def next_frame(self):
+        """Returns the data of the current step, filtered for this subscriber,
+        or None if the nodenet is no longer loaded."""
+        nodenet = micropsi_core.runtime.nodenets.get(self.nodenet_uid)
+        if nodenet is None:
+            self.close()
+            return None
+        frame = {
+            'current_step': nodenet.current_step,
+            'simulation_running': nodenet.is_active,
+            'dropped_frames': self.dropped
+        }
+        self.dropped = 0
+        if self.nodenet_uid in micropsi_core.runtime.batch_runs:
+            frame['batch_run'] = dict(micropsi_core.runtime.batch_runs[self.nodenet_uid])
+        if self.nodespace is not None:
+            frame['nodenet'] = micropsi_core.runtime.get_nodenet_data(self.nodenet_uid, self.nodespace, include_links=self.include_links, revision=self.__revision,
+                                                                       viewport=self.viewport, include_nodetypes=False)
+            self.__revision = frame['nodenet'].get('revision')
+        if self.monitors:
+            monitors = nodenet.construct_monitors_dict(self.__monitor_from_step)
+            if self.monitors is not True:
+                monitors = dict((uid, monitors[uid]) for uid in self.monitors if uid in monitors)
+            frame['monitors'] = monitors
+            self.__monitor_from_step = frame['current_step'] + 1
+        if self.logger:
+            logs = [l for l in micropsi_core.runtime.get_logger_messages(self.logger)['logs'] if l['seq'] > self.__log_seq]
+            if logs:
+                self.__log_seq = max(l['seq'] for l in logs)
+            frame['logs'] = logs
+        if self.step_profile:
+            frame['step_profile'] = micropsi_core.runtime.get_step_profile(self.nodenet_uid)
+        return frame
+
+
+def subscribe_nodenet_stream(nodenet_uid, nodespace=None, include_links=True, monitors=None, logger=None, step_profile=False, viewport=None):
+    """Registers a subscriber to the steps of the given nodenet and returns its subscription.
+    The first frame is available right away."""
+    subscription = StepSubscription(nodenet_uid, nodespace, include_links, monitors, logger, step_profile, viewport)
+    with stream_lock:
+        stream_subscriptions.setdefault(nodenet_uid, {})[subscription.uid] = subscription
+    return subscription
+
+
+def unsubscribe_nodenet_stream(subscription):
+    """Removes the given subscription"""
+    subscription.close()
+    with stream_lock:
+        subscriptions = stream_subscriptions.get(subscription.nodenet_uid, {})
+        subscriptions.pop(subscription.uid, None)
+        if not subscriptions:
+            stream_subscriptions.pop(subscription.nodenet_uid, None)
+    return True
+
+
+def notify_nodenet_subscribers(nodenet_uid):
+    """Tells the subscribers of the given nodenet that it changed. Called by the runner after each step."""
+    subscriptions = stream_subscriptions.get(nodenet_uid)
+    if subscriptions:
+        for subscription in list(subscriptions.values()):
+            subscription.notify()
@@ -6,6 +6,13 @@ Runtime API: operations for creating and maintaining worlds (environments for no
 
 import json
 import os
+import sys
+import time
+import hashlib
+import logging
+import threading
+import warnings
+from collections.abc import Mapping, MutableMapping
 import micropsi_core
 from micropsi_core import tools
 from micropsi_core.tools import Bunch
@@ -15,18 +22,193 @@ __author__ = 'joscha'
 __date__ = '11.12.12'
 
 
+class WorldRegistry(MutableMapping):
+    """The worlds of the runtime by uid.
+
+    Until a world is first accessed, it is only known by its definition in runtime.world_data, and gets
+    instantiated then. Worlds that have not been accessed for a while, have no nodenet attached, and did
+    not change since they were loaded or saved are unloaded again by evict_idle.
+    """
+
+    def __init__(self):
+        self.__loaded = {}
+        self.__last_access = {}
+        self.__fingerprints = {}
+        self.__lock = threading.RLock()
+
+    def __getitem__(self, uid):
+        with self.__lock:
+            if uid not in self.__loaded:
+                if uid not in micropsi_core.runtime.world_data:
+                    raise KeyError(uid)
+                instance = instantiate_world(micropsi_core.runtime.world_data[uid])
+                if instance is None:
+                    raise KeyError(uid)
+                self.__loaded[uid] = instance
+                self.__fingerprints[uid] = fingerprint_world(instance)
+            self.__last_access[uid] = time.time()
+            return self.__loaded[uid]
+
+    def __setitem__(self, uid, instance):
+        with self.__lock:
+            self.__loaded[uid] = instance
+            self.__fingerprints[uid] = fingerprint_world(instance)
+            self.__last_access[uid] = time.time()
+
+    def __delitem__(self, uid):
+        with self.__lock:
+            if uid not in self:
+                raise KeyError(uid)
+            self.__loaded.pop(uid, None)
+            self.__fingerprints.pop(uid, None)
+            self.__last_access.pop(uid, None)
+
+    def __contains__(self, uid):
+        return uid in self.__loaded or uid in micropsi_core.runtime.world_data
+
+    def __iter__(self):
+        uids = list(micropsi_core.runtime.world_data.keys())
+        uids.extend(uid for uid in list(self.__loaded.keys()) if uid not in micropsi_core.runtime.world_data)
+        return iter(uids)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def is_loaded(self, uid):
+        return uid in self.__loaded
+
+    def get_loaded_instances(self):
+        """Returns the worlds that are instantiated right now"""
+        with self.__lock:
+            return list(self.__loaded.values())
+
+    def get_descriptor(self, uid):
+        """Returns uid, name, owner and world_type of the given world, without instantiating it"""
+        if uid in self.__loaded:
+            instance = self.__loaded[uid]
+            return Bunch(uid=uid, name=instance.name, owner=instance.owner, world_type=instance.__class__.__name__)
+        data = micropsi_core.runtime.world_data[uid]
+        return Bunch(uid=uid, name=data.get('name') or uid, owner=data.get('owner'), world_type=data.get('world_type', 'World'))
+
+    def mark_saved(self, uid):
+        """Tells the registry that the given world was saved, so it may be unloaded when idle"""
+        with self.__lock:
+            if uid in self.__loaded:
+                self.__fingerprints[uid] = fingerprint_world(self.__loaded[uid])
+
+    def unload(self, uid):
+        """Drops the instance of the given world. Its next access instantiates it from its file again."""
+        with self.__lock:
+            instance = self.__loaded.pop(uid, None)
+            self.__fingerprints.pop(uid, None)
+            self.__last_access.pop(uid, None)
+        if instance is not None:
+            instance.unload()
+
+    def evict_idle(self, max_idle_seconds):
+        """Unloads the worlds that have not been accessed for the given number of seconds, as long as
+        no nodenet is attached to them and they did not change since they were loaded or saved.
+        Returns the uids of the unloaded worlds."""
+        evicted = {}
+        with self.__lock:
+            # check and drop in one go, so a world accessed or attached meanwhile is not unloaded
+            now = time.time()
+            attached = set(nodenet.world.uid for nodenet in list(micropsi_core.runtime.nodenets.values()) if nodenet.world)
+            for uid, instance in list(self.__loaded.items()):
+                if now - self.__last_access.get(uid, now) < max_idle_seconds or uid in attached:
+                    continue
+                if instance.is_active or instance.agents or fingerprint_world(instance) != self.__fingerprints.get(uid):
+                    continue
+                evicted[uid] = self.__loaded.pop(uid)
+                self.__fingerprints.pop(uid, None)
+                self.__last_access.pop(uid, None)
+        for uid, instance in evicted.items():
+            instance.unload()
+            logging.getLogger("world").info("Unloaded idle world %s" % uid)
+        return list(evicted.keys())
+
+
+class WorldSelection(Mapping):
+    """Some worlds of the registry, instantiated when accessed"""
+
+    def __init__(self, registry, uids):
+        self.registry = registry
+        self.uids = uids
+
+    def __getitem__(self, uid):
+        if uid not in self.uids:
+            raise KeyError(uid)
+        return self.registry[uid]
+
+    def __contains__(self, uid):
+        return uid in self.uids
+
+    def __iter__(self):
+        return iter(self.uids)
+
+    def __len__(self):
+        return len(self.uids)
+
+
+def instantiate_world(data):
+    """Returns a new instance of the world with the given definition, or None if it can not be instantiated"""
+    if "world_type" in data:
+        try:
+            return get_world_class_from_name(data.world_type)(**data)
+        except TypeError:
+            return world.World(**data)
+        except AttributeError as err:
+            warnings.warn("Unknown world_type: %s (%s)" % (data.world_type, str(err)))
+        except:
+            warnings.warn("Can not instantiate World \"%s\": %s" % (data.name, str(sys.exc_info()[1])))
+        return None
+    else:
+        return world.World(**data)
+
+
+def fingerprint_world(instance):
+    try:
+        return hashlib.sha1(json.dumps(instance.data, sort_keys=True).encode('utf-8')).hexdigest()
+    except (TypeError, ValueError):
+        # worlds we can not compare are never considered unchanged
+        return object()
+
+
 # World
 def get_available_worlds(owner=None):
     """Returns a dict of uids: World of (running and stored) worlds.
+    Worlds are instantiated when they are accessed, see get_world_descriptors for listing them.
 
     Arguments:
         owner (optional): when submitted, the list is filtered by this owner
     """
+    worlds = micropsi_core.runtime.worlds
     if owner:
-        return dict((uid, micropsi_core.runtime.worlds[uid]) for uid in micropsi_core.runtime.worlds if
-                    micropsi_core.runtime.worlds[uid].owner == owner)
+        return WorldSelection(worlds, [uid for uid in worlds if worlds.get_descriptor(uid).owner == owner])
     else:
-        return micropsi_core.runtime.worlds
+        return worlds
+
+
+def get_world_descriptors(owner=None):
+    """Returns a dict of uids: uid, name, owner and world_type of the available worlds, without
+    instantiating them.
+
+    Arguments:
+        owner (optional): when submitted, the list is filtered by this owner
+    """
+    worlds = micropsi_core.runtime.worlds
+    descriptors = dict((uid, worlds.get_descriptor(uid)) for uid in worlds)
+    if owner:
+        descriptors = dict((uid, data) for uid, data in descriptors.items() if data.owner == owner)
+    return descriptors
+
+
+def evict_idle_worlds(max_idle_seconds=None):
+    """Unloads worlds that were idle for the given number of seconds, or the configured world_idle_timeout.
+    Worlds with nodenets attached and worlds with unsaved changes stay loaded."""
+    if max_idle_seconds is None:
+        max_idle_seconds = micropsi_core.runtime.WORLD_IDLE_TIMEOUT
+    return micropsi_core.runtime.worlds.evict_idle(max_idle_seconds)
 
 
 def get_world_properties(world_uid):
@@ -42,7 +224,7 @@ def get_world_properties(world_uid):
         dictionary containing the information
     """
 
-    data = micropsi_core.runtime.worlds[world_uid].data
+    data = dict(micropsi_core.runtime.worlds[world_uid].data)
     data['worldadapters'] = get_worldadapters(world_uid)
     data['available_worldobjects'] = [key for key in micropsi_core.runtime.worlds[world_uid].supported_worldobjects]
     data['available_worldadapters'] = [key for key in micropsi_core.runtime.worlds[world_uid].supported_worldadapters]
@@ -107,6 +289,7 @@ def new_world(world_name, world_type, owner="", uid=None):
                                                   owner=owner)
     with open(filename, 'w+') as fp:
         fp.write(json.dumps(micropsi_core.runtime.world_data[uid], sort_keys=True, indent=4))
+    micropsi_core.runtime.update_definition_index(os.path.join(micropsi_core.runtime.RESOURCE_PATH, micropsi_core.runtime.WORLD_DIRECTORY), filename, micropsi_core.runtime.world_data[uid])
     try:
         kwargs = micropsi_core.runtime.world_data[uid]
         micropsi_core.runtime.worlds[uid] = get_world_class_from_name(world_type)(**kwargs)
@@ -121,7 +304,9 @@ def delete_world(world_uid):
         if micropsi_core.runtime.nodenets[uid].world and micropsi_core.runtime.nodenets[uid].world.uid == world_uid:
             micropsi_core.runtime.nodenets[uid].world = None
     del micropsi_core.runtime.worlds[world_uid]
-    os.remove(micropsi_core.runtime.world_data[world_uid].filename)
+    filename = micropsi_core.runtime.world_data[world_uid].filename
+    os.remove(filename)
+    micropsi_core.runtime.update_definition_index(os.path.join(micropsi_core.runtime.RESOURCE_PATH, micropsi_core.runtime.WORLD_DIRECTORY), filename)
     del micropsi_core.runtime.world_data[world_uid]
     return True
 
@@ -157,9 +342,12 @@ def revert_world(world_uid):
 
 def save_world(world_uid):
     """Stores the world state on the server."""
-    with open(os.path.join(micropsi_core.runtime.RESOURCE_PATH, micropsi_core.runtime.WORLD_DIRECTORY,
-                           world_uid) + '.json', 'w+') as fp:
+    path = os.path.join(micropsi_core.runtime.RESOURCE_PATH, micropsi_core.runtime.WORLD_DIRECTORY)
+    filename = os.path.join(path, world_uid) + '.json'
+    with open(filename, 'w+') as fp:
         fp.write(json.dumps(micropsi_core.runtime.worlds[world_uid].data, sort_keys=True, indent=4))
+    micropsi_core.runtime.update_definition_index(path, filename, micropsi_core.runtime.worlds[world_uid].data)
+    micropsi_core.runtime.worlds.mark_saved(world_uid)
     return True
 
 
@@ -182,6 +370,7 @@ def import_world(worlddata, owner=None):
     data['filename'] = filename
     with open(filename, 'w+') as fp:
         fp.write(json.dumps(data))
+    micropsi_core.runtime.update_definition_index(os.path.join(micropsi_core.runtime.RESOURCE_PATH, micropsi_core.runtime.WORLD_DIRECTORY), filename, data)
     micropsi_core.runtime.world_data[data['uid']] = micropsi_core.runtime.parse_definition(data, filename)
     micropsi_core.runtime.worlds[data['uid']] = get_world_class_from_name(
         micropsi_core.runtime.world_data[data['uid']].world_type)(
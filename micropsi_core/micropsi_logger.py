@@ -7,7 +7,9 @@ __author__ = 'rvuine'
 
 import os
 import logging
+import threading
 import time
+from itertools import count
 from operator import itemgetter
 
 MAX_RECORDS_PER_STORAGE = 1000
@@ -15,6 +17,10 @@ MAX_RECORDS_PER_STORAGE = 1000
 
 class RecordWebStorageHandler(logging.Handler):
 
+    # numbers the records of all storages in the order they are stored, so clients can ask for newer ones
+    sequence = count(1)
+    sequence_lock = threading.Lock()
+
     def __init__(self, record_storage):
         """
         Initialize the handler
@@ -29,8 +35,6 @@ class RecordWebStorageHandler(logging.Handler):
 
     def emit(self, record):
         self.format(record)
-        while len(self.record_storage) >= MAX_RECORDS_PER_STORAGE:
-            del self.record_storage[0]
         dictrecord = {
             "logger": record.name,
             "time": record.created * 1000,
@@ -39,7 +43,25 @@ class RecordWebStorageHandler(logging.Handler):
             "module": record.module,
             "msg": record.message
         }
-        self.record_storage.append(dictrecord)
+        with self.sequence_lock:
+            while len(self.record_storage) >= MAX_RECORDS_PER_STORAGE:
+                del self.record_storage[0]
+            dictrecord["seq"] = next(self.sequence)
+            self.record_storage.append(dictrecord)
+
+
+class ThreadLogFilter(logging.Filter):
+
+    def __init__(self, thread, level):
+        """
+        Drops the records below the given level that are logged from the given thread
+        """
+        logging.Filter.__init__(self)
+        self.thread = thread.ident
+        self.level = level
+
+    def filter(self, record):
+        return record.levelno >= self.level or record.thread != self.thread
 
 
 class MicropsiLogger():
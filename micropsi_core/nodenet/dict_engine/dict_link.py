@@ -84,6 +84,7 @@ class DictLink(Link):
         self.__certainty = certainty
         self.__source_gate._register_outgoing(self)
         self.__target_slot._register_incoming(self)
+        self.__source_node.nodenet._links_changed(self)
 
     def remove(self):
         """unplug the link from the node net
@@ -91,7 +92,9 @@ class DictLink(Link):
         """
         self.__source_gate._unregister_outgoing(self)
         self.__target_slot._unregister_incoming(self)
+        self.__source_node.nodenet._links_changed(self)
 
     def _set_weight(self, weight, certainty=1):
         self.__weight = weight
         self.__certainty = certainty
+        self.__source_node.nodenet._link_weight_changed(self)
@@ -45,6 +45,8 @@ class NetEntity(object):
     @position.setter
     def position(self, position):
         self.__position = position
+        self.nodenet._entity_changed(self.entitytype, self.uid)
+        self.nodenet._entity_moved(self.entitytype, self.uid)
 
     @property
     def name(self):
@@ -53,6 +55,7 @@ class NetEntity(object):
     @name.setter
     def name(self, name):
         self.__name = name
+        self.nodenet._entity_changed(self.entitytype, self.uid)
 
     @property
     def parent_nodespace(self):
@@ -70,6 +73,8 @@ class NetEntity(object):
                     if old_parent and old_parent.uid != uid and old_parent.is_entity_known_as(self.entitytype, self.uid):
                         old_parent._unregister_entity(self.entitytype, self.uid)
         self.__parent_nodespace = uid
+        self.nodenet._entity_changed(self.entitytype, self.uid)
+        self.nodenet._entity_moved(self.entitytype, self.uid)
 
     def __init__(self, nodenet, parent_nodespace, position, name="", entitytype="abstract_entities",
                  uid=None, index=None):
@@ -258,6 +258,7 @@ class DictNode(NetEntity, Node):
             elif parameter in self.__non_default_gate_parameters.get(gate_type, {}):
                 del self.__non_default_gate_parameters[gate_type][parameter]
         self.get_gate(gate_type).parameters[parameter] = value
+        self.nodenet._entity_changed('nodes', self.uid)
 
     def get_gatefunction(self, gate_type):
         if self.get_gate(gate_type):
@@ -277,6 +278,7 @@ class DictNode(NetEntity, Node):
                 self.__gatefunctions[gate_type] = getattr(gatefunctions, gatefunction)
             else:
                 raise NameError("Unknown Gatefunction")
+            self.nodenet._entity_changed('nodes', self.uid)
         else:
             raise KeyError("Wrong Gatetype")
 
@@ -302,6 +304,7 @@ class DictNode(NetEntity, Node):
                 del self.__parameters[parameter]
             else:
                 self.__parameters[parameter] = None
+            self.nodenet._entity_changed('nodes', self.uid)
 
     def set_parameter(self, parameter, value):
         if (value == '' or value is None):
@@ -310,6 +313,7 @@ class DictNode(NetEntity, Node):
             else:
                 value = None
         self.__parameters[parameter] = value
+        self.nodenet._entity_changed('nodes', self.uid)
 
     def clone_parameters(self):
         return self.__parameters.copy()
@@ -325,6 +329,7 @@ class DictNode(NetEntity, Node):
 
     def set_state(self, state_element, value):
         self.__state[state_element] = value
+        self.nodenet._entity_changed('nodes', self.uid)
 
     def clone_state(self):
         return self.__state.copy()
@@ -14,6 +14,8 @@ from .dict_node import DictNode
 from .dict_nodespace import DictNodespace
 import copy
 
+from configuration import config as settings
+
 STANDARD_NODETYPES = {
     "Nodespace": {
         "name": "Nodespace"
@@ -144,6 +146,24 @@ class DictNodenet(Nodenet):
 
         super(DictNodenet, self).__init__(name, worldadapter, world, owner, uid)
 
+        # entities changed since the last save, persisted via the delta log, see save()
+        self.__changes = {'nodes': set(), 'nodespaces': set(), 'links': {}}
+        # activations change on every step, so they are not tracked per node, see _activations_changed
+        self.__activations_changed = False
+        # the activations of the nodes as persisted, by uid, to record only those that differ
+        self.__persisted_activations = {}
+        self.__persisted_filename = None
+        self.__persisted_identity = None
+        self.__delta_records = 0
+
+        self.__incremental_save = settings['micropsi2'].get('incremental_save', 'True') == 'True'
+        self.__delta_log_max_records = 100
+        configured_max_records = settings['micropsi2'].get('delta_log_max_records', '100')
+        try:
+            self.__delta_log_max_records = int(configured_max_records)
+        except ValueError:
+            self.logger.warn("Unsupported delta_log_max_records value from configuration: %s, falling back to 100", configured_max_records)
+
         self.stepoperators = [DictPropagate(), DictCalculate(), DictPORRETDecay(), DoernerianEmotionalModulators()]
         self.stepoperators.sort(key=lambda op: op.priority)
 
@@ -170,15 +190,144 @@ class DictNodenet(Nodenet):
 
         self.nodegroups = {}
 
+        # cached gate-to-slot adjacency for the sheaf-free propagation path, see DictPropagate
+        self.linkmatrix = None
+
         self.initialize_nodenet({})
 
     def save(self, filename):
-        # dict_engine saves metadata and data into the same json file, so just dump .data
-        with open(filename, 'w+') as fp:
-            fp.write(json.dumps(self.data, sort_keys=True, indent=4))
-        if os.path.getsize(filename) < 100:
-            # kind of hacky, but we don't really know what was going on
-            raise RuntimeError("Error writing nodenet file")
+        """
+        Saves the nodenet to the given file.
+        If possible, only the entities that changed since the last save are appended to a delta log next to the
+        file. The log is compacted into the nodenet file when it grows too long, when most of the net changed,
+        or when the nodenet's identity (name, owner, world) changed.
+        """
+        deltafilename = self.get_delta_filename(filename)
+        if self.__can_save_incrementally(filename, deltafilename):
+            with open(deltafilename, 'a') as fp:
+                fp.write(json.dumps(self.construct_delta_record(), sort_keys=True) + "\n")
+            self.__delta_records += 1
+        else:
+            # dict_engine saves metadata and data into the same json file, so just dump .data
+            with open(filename, 'w+') as fp:
+                fp.write(json.dumps(self.data, sort_keys=True, indent=4))
+            if os.path.getsize(filename) < 100:
+                # kind of hacky, but we don't really know what was going on
+                raise RuntimeError("Error writing nodenet file")
+            if os.path.isfile(deltafilename):
+                os.remove(deltafilename)
+            self.__delta_records = 0
+            self.__persisted_filename = filename
+            self.__persisted_identity = self.__identity()
+            self.__persist_activations()
+        self.__clear_changes()
+
+    def __can_save_incrementally(self, filename, deltafilename):
+        if not self.__incremental_save:
+            return False
+        if self.__persisted_filename != filename or not os.path.isfile(filename):
+            return False
+        if self.__delta_records >= self.__delta_log_max_records:
+            return False
+        if self.__persisted_identity != self.__identity():
+            return False
+        changed_entities = len(self.__changes['nodes']) + len(self.__changes['nodespaces'])
+        if changed_entities * 2 > len(self.__nodes) + len(self.__nodespaces):
+            return False
+        if os.path.isfile(deltafilename) and os.path.getsize(deltafilename) > os.path.getsize(filename):
+            return False
+        return True
+
+    def __identity(self):
+        return self.name, self.owner, self.world.uid if self.world else None, self.worldadapter
+
+    def __activation_snapshot(self, node):
+        return (
+            tuple((uid, sheaf['activation']) for uid, sheaf in node.sheaves.items()),
+            tuple((gate_type, tuple((uid, sheaf['activation']) for uid, sheaf in node.get_gate(gate_type).sheaves.items()))
+                  for gate_type in node.get_gate_types()))
+
+    def __persist_activations(self):
+        self.__persisted_activations = dict((uid, self.__activation_snapshot(node)) for uid, node in self.__nodes.items())
+
+    def __clear_changes(self):
+        self.__changes = {'nodes': set(), 'nodespaces': set(), 'links': {}}
+        self.__activations_changed = False
+
+    def get_delta_filename(self, filename):
+        return os.path.splitext(filename)[0] + ".delta"
+
+    def construct_delta_record(self):
+        """ Returns a dict of the nodenet metadata and all nodes, nodespaces and links changed since the last save.
+        Deleted entities are recorded as None. If activations changed, the activations of the other nodes that
+        differ from their persisted ones are recorded as well"""
+        record = self.metadata
+        record.update({
+            'max_coords': self.max_coords,
+            'monitors': self.construct_monitors_dict(),
+            'modulators': self.construct_modulators_dict(),
+            'nodes': {},
+            'nodespaces': {},
+            'links': {}
+        })
+        for uid in self.__changes['nodes']:
+            if uid in self.__nodes:
+                record['nodes'][uid] = self.__nodes[uid].data
+                self.__persisted_activations[uid] = self.__activation_snapshot(self.__nodes[uid])
+            else:
+                record['nodes'][uid] = None
+                self.__persisted_activations.pop(uid, None)
+        if self.__activations_changed:
+            record['activations'] = {}
+            for uid, node in self.__nodes.items():
+                if uid in self.__changes['nodes']:
+                    continue
+                snapshot = self.__activation_snapshot(node)
+                if self.__persisted_activations.get(uid) != snapshot:
+                    self.__persisted_activations[uid] = snapshot
+                    record['activations'][uid] = {
+                        'activation': node.activation,
+                        'sheaves': node.clone_sheaves(),
+                        'gate_activations': node.construct_gates_dict()
+                    }
+            if not record['activations']:
+                del record['activations']
+        for uid in self.__changes['nodespaces']:
+            record['nodespaces'][uid] = self.__nodespaces[uid].data if uid in self.__nodespaces else None
+        for uid, link in self.__changes['links'].items():
+            record['links'][uid] = None
+            if link.source_node.uid in self.__nodes:
+                for candidate in link.source_gate.get_links():
+                    if candidate.uid == uid:
+                        record['links'][uid] = candidate.data
+                        break
+        return record
+
+    def apply_delta_log(self, initfrom, deltafilename):
+        """ Replays the records of the given delta log onto the given nodenet data. Returns the number of records"""
+        count = 0
+        with open(deltafilename) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    warnings.warn("Skipping unreadable records in nodenet delta log %s" % deltafilename)
+                    break
+                for key in ['nodes', 'nodespaces', 'links']:
+                    entities = initfrom.setdefault(key, {})
+                    for uid, data in record.pop(key, {}).items():
+                        if data is None:
+                            entities.pop(uid, None)
+                        else:
+                            entities[uid] = data
+                for uid, data in record.pop('activations', {}).items():
+                    if uid in initfrom['nodes']:
+                        initfrom['nodes'][uid].update(data)
+                initfrom.update(record)
+                count += 1
+        return count
 
     def load(self, filename):
         """Load the node net from a file"""
@@ -198,14 +347,28 @@ class DictNodenet(Nodenet):
                 except IOError:
                     warnings.warn("Could not open nodenet file")
 
+            delta_records = 0
+            deltafilename = self.get_delta_filename(filename)
+            if initfrom and os.path.isfile(deltafilename):
+                delta_records = self.apply_delta_log(initfrom, deltafilename)
+
             if self.__version == NODENET_VERSION:
                 self.initialize_nodenet(initfrom)
+                if initfrom:
+                    self.__persisted_filename = filename
+                    self.__persisted_identity = self.__identity()
+                    self.__delta_records = delta_records
+                    self.__persist_activations()
+                    self.__clear_changes()
                 return True
             else:
                 raise NotImplementedError("Wrong version of nodenet data, cannot import.")
 
     def remove(self, filename):
         os.remove(filename)
+        deltafilename = self.get_delta_filename(filename)
+        if os.path.isfile(deltafilename):
+            os.remove(deltafilename)
 
     def reload_native_modules(self, native_modules):
         """ reloads the native-module definition, and their nodefunctions
@@ -268,19 +431,14 @@ class DictNodenet(Nodenet):
         data = {}
         if nodespace_uid is None:
             nodespace_uid = "Root"
-        for nodespace_candidate_uid in self.get_nodespace_uids():
-            is_in_hierarchy = False
-            if nodespace_candidate_uid == nodespace_uid:
-                is_in_hierarchy = True
-            else:
-                parent_uid = self.get_nodespace(nodespace_candidate_uid).parent_nodespace
-                while parent_uid is not None and parent_uid != nodespace_uid:
-                    parent_uid = self.get_nodespace(parent_uid).parent_nodespace
-                if parent_uid == nodespace_uid:
-                    is_in_hierarchy = True
-
-            if is_in_hierarchy:
-                data[nodespace_candidate_uid] = self.get_nodespace(nodespace_candidate_uid).data
+        if nodespace_uid not in self.__nodespaces:
+            return data
+        # walk down the child indexes of the nodespaces instead of up from every nodespace in the net
+        pending = [nodespace_uid]
+        while pending:
+            nodespace = self.__nodespaces[pending.pop()]
+            data[nodespace.uid] = nodespace.data
+            pending.extend(nodespace.get_known_ids('nodespaces'))
         return data
 
     def get_nodetype(self, type):
@@ -290,7 +448,7 @@ class DictNodenet(Nodenet):
         else:
             return self.__native_modules.get(type)
 
-    def get_nodespace_data(self, nodespace, include_links):
+    def get_nodespace_data(self, nodespace, include_links, node_uids=None):
         world_uid = self.world.uid if self.world is not None else None
 
         data = {
@@ -309,24 +467,26 @@ class DictNodenet(Nodenet):
             data['user_prompt'] = self.user_prompt.copy()
             self.user_prompt = None
         links = []
-        followupnodes = []
-        for uid in self.__nodes:
-            if self.get_node(uid).parent_nodespace == nodespace:  # maybe sort directly by nodespace??
-                node = self.get_node(uid)
-                data['nodes'][uid] = node.data
-                if node.position[0] > data['max_coords']['x']:
-                    data['max_coords']['x'] = node.position[0]
-                if node.position[1] > data['max_coords']['y']:
-                    data['max_coords']['y'] = node.position[1]
-                if include_links:
-                    links.extend(self.get_node(uid).get_associated_links())
-                    followupnodes.extend(self.get_node(uid).get_associated_node_uids())
+        if node_uids is None:
+            node_uids = self.__nodespaces[nodespace].get_known_ids('nodes') if nodespace in self.__nodespaces else []
+        for uid in node_uids:
+            node = self.__nodes[uid]
+            data['nodes'][uid] = node.data
+            if node.position[0] > data['max_coords']['x']:
+                data['max_coords']['x'] = node.position[0]
+            if node.position[1] > data['max_coords']['y']:
+                data['max_coords']['y'] = node.position[1]
+            if include_links:
+                links.extend(node.get_associated_links())
         if include_links:
             for link in links:
+                if link.uid in data['links']:
+                    continue
                 data['links'][link.uid] = link.data
-            for uid in followupnodes:
-                if uid not in data['nodes']:
-                    data['nodes'][uid] = self.get_node(uid).data
+                # boundary links also bring their node from the other nodespace along
+                for uid in (link.source_node.uid, link.target_node.uid):
+                    if uid not in data['nodes']:
+                        data['nodes'][uid] = self.__nodes[uid].data
         return data
 
     def delete_node(self, node_uid):
@@ -338,6 +498,7 @@ class DictNodenet(Nodenet):
             if parent_nodespace and parent_nodespace.is_entity_known_as('nodespaces', node_uid):
                 parent_nodespace._unregister_entity('nodespaces', node_uid)
             del self.__nodespaces[node_uid]
+            self._entity_changed('nodespaces', node_uid)
         else:
             node = self.__nodes[node_uid]
             node.unlink_completely()
@@ -346,6 +507,8 @@ class DictNodenet(Nodenet):
             if self.__nodes[node_uid].type == "Activator":
                 parent_nodespace.unset_activator_value(self.__nodes[node_uid].get_parameter('type'))
             del self.__nodes[node_uid]
+            self.spatial_index.remove(node_uid)
+            self._entity_changed('nodes', node_uid)
 
     def delete_nodespace(self, uid):
         self.delete_node(uid)
@@ -353,17 +516,51 @@ class DictNodenet(Nodenet):
     def clear(self):
         super(DictNodenet, self).clear()
         self.__nodes = {}
+        self.linkmatrix = None
+        # entities are dropped without being recorded as deleted, so the next save has to be a full one
+        self.__persisted_filename = None
 
         self.max_coords = {'x': 0, 'y': 0}
 
         self.__nodespaces = {}
+        self.spatial_index.clear()
         DictNodespace(self, None, (0, 0), "Root", "Root")
 
     def _register_node(self, node):
         self.__nodes[node.uid] = node
+        self._entity_changed('nodes', node.uid)
+        self._entity_moved('nodes', node.uid)
 
     def _register_nodespace(self, nodespace):
         self.__nodespaces[nodespace.uid] = nodespace
+        self._entity_changed('nodespaces', nodespace.uid)
+
+    def _entity_changed(self, entitytype, uid):
+        """ Called by nodes and nodespaces when their persistent state changes"""
+        if entitytype in self.__changes:
+            self.__changes[entitytype].add(uid)
+
+    def _activations_changed(self):
+        """ Called once after activations were calculated or set. Activations are not part of the per-entity
+        change tracking, the next delta record stores the activations of all nodes instead"""
+        self.__activations_changed = True
+
+    def _entity_moved(self, entitytype, uid):
+        """ Called by nodes and nodespaces when their position or parent nodespace changes"""
+        if entitytype == 'nodes' and uid in self.__nodes:
+            node = self.__nodes[uid]
+            self.spatial_index.update(uid, node.parent_nodespace, node.position)
+
+    def _links_changed(self, link):
+        """ Called by links when they are created or removed. Drops the cached link matrix"""
+        self.linkmatrix = None
+        self.__changes['links'][link.uid] = link
+
+    def _link_weight_changed(self, link):
+        """ Called by links when their weight changes. Updates the cached link matrix in place"""
+        if self.linkmatrix is not None:
+            self.linkmatrix.update_weight(link)
+        self.__changes['links'][link.uid] = link
 
     def merge_data(self, nodenet_data, keep_uids=False):
         """merges the nodenet state with the current node net, might have to give new UIDs to some entities"""
@@ -426,9 +623,11 @@ class DictNodenet(Nodenet):
         with self.netlock:
 
             for operator in self.stepoperators:
-                operator.execute(self, self.__nodes.copy(), self.netapi)
+                with self.profiler.timed(operator.__class__.__name__):
+                    operator.execute(self, self.__nodes.copy(), self.netapi)
 
             self.__step += 1
+            self._activations_changed()
 
     def create_node(self, nodetype, nodespace_uid, position, name="", uid=None, parameters=None, gate_parameters=None):
         nodespace_uid = self.get_nodespace(nodespace_uid).uid
@@ -649,6 +848,7 @@ class DictNodenet(Nodenet):
         gate = self.nodegroups[nodespace_uid][group][1]
         for i in range(len(nodes)):
             nodes[i].set_gate_activation(gate, new_activations[i])
+        self._activations_changed()
 
     def get_thetas(self, nodespace_uid, group):
         if nodespace_uid is None:
@@ -4,6 +4,7 @@ Nodespace definition
 """
 
 import warnings
+from collections import OrderedDict
 
 from micropsi_core.nodenet.dict_engine.dict_netentity import NetEntity
 from micropsi_core.nodenet.nodespace import Nodespace
@@ -22,7 +23,7 @@ class DictNodespace(NetEntity, Nodespace):
 
     Attributes:
         activators: a dictionary of activators that control the spread of activation, via activator nodes
-        netentities: a dictionary containing all the contained nodes and nodespaces, to speed up drawing
+        netentities: the uids of all directly contained nodes and nodespaces by entity type, to speed up drawing
     """
 
     @property
@@ -48,14 +49,12 @@ class DictNodespace(NetEntity, Nodespace):
         if entitytype:
             if entitytype not in self.__netentities:
                 return []
-            return self.__netentities[entitytype]
+            return list(self.__netentities[entitytype])
         else:
-            return [uid for uid_list in self.__netentities.values() for uid in uid_list]
+            return [uid for uids in self.__netentities.values() for uid in uids]
 
     def is_entity_known_as(self, entitytype, uid):
-        if entitytype not in self.__netentities:
-            self.__netentities[entitytype] = []
-        return uid in self.__netentities[entitytype]
+        return uid in self.__netentities.get(entitytype, ())
 
     def has_activator(self, type):
         return type in self.__activators
@@ -71,8 +70,8 @@ class DictNodespace(NetEntity, Nodespace):
 
     def _register_entity(self, entity):
         if entity.entitytype not in self.__netentities:
-            self.__netentities[entity.entitytype] = []
-        self.__netentities[entity.entitytype].append(entity.uid)
+            self.__netentities[entity.entitytype] = OrderedDict()
+        self.__netentities[entity.entitytype][entity.uid] = True
 
     def _unregister_entity(self, entitytype, uid):
-        self.__netentities[entitytype].remove(uid)
+        del self.__netentities[entitytype][uid]
@@ -2,6 +2,68 @@ __author__ = 'rvuine'
 
 from micropsi_core.nodenet.stepoperators import StepOperator, Propagate, Calculate
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class DictLinkMatrix(object):
+    """
+    A sparse (coordinate list) view of all links between the given nodes, used to propagate the default sheaf
+    without walking every link in python.
+    Rows are target slots, columns are source gates. Weights are kept up to date by the nodenet, any structural
+    change to the links drops the matrix.
+    """
+
+    def __init__(self, nodes):
+        self.gates = []
+        self.slots = []
+        self.link_index = {}
+        gate_index = {}
+        slot_index = {}
+        rows = []
+        cols = []
+        weights = []
+        for uid, node in nodes.items():
+            for gate_type in node.get_gate_types():
+                gate = node.get_gate(gate_type)
+                for link in gate.get_links():
+                    if id(gate) not in gate_index:
+                        gate_index[id(gate)] = len(self.gates)
+                        self.gates.append(gate)
+                    slot = link.target_slot
+                    if id(slot) not in slot_index:
+                        slot_index[id(slot)] = len(self.slots)
+                        self.slots.append(slot)
+                    self.link_index[link.uid] = len(weights)
+                    rows.append(slot_index[id(slot)])
+                    cols.append(gate_index[id(gate)])
+                    weights.append(float(link.weight))
+        self.rows = np.array(rows, dtype=np.int64)
+        self.cols = np.array(cols, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float64)
+
+    def update_weight(self, link):
+        index = self.link_index.get(link.uid)
+        if index is not None:
+            self.weights[index] = float(link.weight)
+
+    def propagate(self):
+        """ Propagates the default sheaf of all linked gates to their target slots.
+        Returns False without touching any slot if a gate carries other sheaves than the default one"""
+        for gate in self.gates:
+            if len(gate.sheaves) != 1 or 'default' not in gate.sheaves:
+                return False
+        if not self.gates:
+            return True
+        activations = np.fromiter((float(gate.sheaves['default']['activation']) for gate in self.gates),
+                                  dtype=np.float64, count=len(self.gates))
+        slot_activations = np.bincount(self.rows, weights=self.weights * activations[self.cols], minlength=len(self.slots))
+        for slot, activation in zip(self.slots, slot_activations.tolist()):
+            slot.sheaves['default']['activation'] = activation
+        return True
+
 
 class DictPropagate(Propagate):
     """
@@ -17,6 +79,13 @@ class DictPropagate(Propagate):
         for uid, node in nodes.items():
             node.reset_slots()
 
+        # fast path: as long as no sheaves are open, propagate through the cached link matrix
+        if np is not None:
+            if nodenet.linkmatrix is None:
+                nodenet.linkmatrix = DictLinkMatrix(nodes)
+            if nodenet.linkmatrix.propagate():
+                return
+
         # propagate sheaf existence
         for uid, node in nodes.items():
             for gate_type in node.get_gate_types():
@@ -63,14 +132,18 @@ class DictCalculate(Calculate):
 
         self.calculate_node_functions(activators)       # activators go first
         self.calculate_node_functions(everythingelse)   # then all the peasant nodes get calculated
-        self.calculate_node_functions(nativemodules)    # then native modules, so API sees a deterministic state
+        self.calculate_node_functions(nativemodules, nodenet.profiler)  # then native modules, so API sees a deterministic state
 
         for uid, node in activators.items():
             node.activation = nodenet.get_nodespace(node.parent_nodespace).get_activator_value(node.get_parameter('type'))
 
-    def calculate_node_functions(self, nodes):
+    def calculate_node_functions(self, nodes, profiler=None):
         for uid, node in nodes.copy().items():
-            node.node_function()
+            if profiler is None or not profiler.enabled:
+                node.node_function()
+            else:
+                with profiler.timed("native module %s", node.type):
+                    node.node_function()
 
 
 class DictPORRETDecay(StepOperator):
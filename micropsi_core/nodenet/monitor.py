@@ -5,7 +5,10 @@ Monitor definition
 """
 
 import random
+import logging
+import numpy as np
 import micropsi_core.tools
+from configuration import config as settings
 from abc import ABCMeta, abstractmethod
 
 
@@ -13,6 +16,148 @@ __author__ = 'joscha'
 __date__ = '09.05.12'
 
 
+class MonitorValues(object):
+    """Fixed-capacity ring buffer for monitor values, backed by a step array and a value array.
+
+    Behaves like the dict keyed by step that monitors used to store, so existing callers
+    can keep using len(), `in`, item access and items(). Missing values (None) are stored as NaN.
+    The buffer holds twice its capacity, so the retained values are always one contiguous
+    slice and range queries can return views instead of copies.
+
+    If downsampling is enabled, a full buffer averages pairs of its older half instead of
+    dropping the oldest value, so the retained history covers ever larger step intervals.
+    """
+
+    def __init__(self, capacity=None, downsampling=None):
+        if capacity is None:
+            capacity = 10000
+            try:
+                capacity = int(settings['micropsi2'].get('monitor_retention', capacity))
+            except ValueError:
+                logging.getLogger("system").warning("Unsupported monitor_retention value from configuration: %s, using %d", settings['micropsi2'].get('monitor_retention'), capacity)
+        if downsampling is None:
+            downsampling = settings['micropsi2'].get('monitor_downsampling', 'False') == "True"
+        self.capacity = max(int(capacity), 4)
+        self.downsampling = downsampling
+        self._steps = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._values = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, step):
+        return self._index(step) is not None
+
+    def __getitem__(self, step):
+        index = self._index(step)
+        if index is None:
+            raise KeyError(step)
+        return self._export_value(self._values[index])
+
+    def __setitem__(self, step, value):
+        if self._end > self._start:
+            last = self._steps[self._end - 1]
+            if step == last:
+                self._values[self._end - 1] = self._import_value(value)
+                return
+            if step < last:
+                # the nodenet went back in time, forget the values that are now in the future
+                self._end = self._start + int(np.searchsorted(self._steps[self._start:self._end], step))
+        self.append(step, value)
+
+    def _index(self, step):
+        steps = self._steps[self._start:self._end]
+        index = int(np.searchsorted(steps, step))
+        if index < len(steps) and steps[index] == step:
+            return self._start + index
+        return None
+
+    def _import_value(self, value):
+        if value is None:
+            return np.nan
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            if self._values.dtype != object:
+                self._values = self._values.astype(object)
+            return value
+
+    def _export_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, float) and value != value:
+            return None
+        return value.item() if isinstance(value, np.generic) else value
+
+    def append(self, step, value):
+        if len(self) >= self.capacity:
+            if self.downsampling:
+                self._downsample()
+            else:
+                self._start += 1
+        if self._end == len(self._steps):
+            self._compact()
+        value = self._import_value(value)
+        self._steps[self._end] = step
+        self._values[self._end] = value
+        self._end += 1
+
+    def _compact(self):
+        count = len(self)
+        self._steps[:count] = self._steps[self._start:self._end]
+        self._values[:count] = self._values[self._start:self._end]
+        self._start = 0
+        self._end = count
+
+    def _downsample(self):
+        """Averages pairs of values in the older half of the buffer, keeping the first step of each pair."""
+        self._compact()
+        half = (len(self) // 2) & ~1
+        steps = self._steps[:half:2].copy()
+        pairs = self._values[:half].reshape(-1, 2)
+        if self._values.dtype == object:
+            values = pairs[:, 1].copy()
+        else:
+            valid = ~np.isnan(pairs)
+            counts = valid.sum(axis=1)
+            sums = np.where(valid, pairs, 0).sum(axis=1)
+            values = np.full(len(counts), np.nan)
+            np.divide(sums, counts, out=values, where=counts > 0)
+        rest = len(self) - half
+        self._steps[half // 2:half // 2 + rest] = self._steps[half:self._end]
+        self._values[half // 2:half // 2 + rest] = self._values[half:self._end]
+        self._steps[:half // 2] = steps
+        self._values[:half // 2] = values
+        self._end = half // 2 + rest
+
+    def get_range(self, from_step=None, to_step=None):
+        """Returns the (steps, values) arrays of all values from from_step to to_step inclusive.
+        The arrays are views into the buffer, copy them if you need to keep them across steps."""
+        steps = self._steps[self._start:self._end]
+        lower = 0 if from_step is None else int(np.searchsorted(steps, from_step, side='left'))
+        upper = len(steps) if to_step is None else int(np.searchsorted(steps, to_step, side='right'))
+        return steps[lower:upper], self._values[self._start + lower:self._start + upper]
+
+    def keys(self):
+        return [int(s) for s in self._steps[self._start:self._end]]
+
+    def items(self):
+        return [(int(s), self._export_value(v)) for s, v in zip(self._steps[self._start:self._end], self._values[self._start:self._end])]
+
+    def to_dict(self, from_step=None, to_step=None):
+        steps, values = self.get_range(from_step, to_step)
+        return dict((int(s), self._export_value(v)) for s, v in zip(steps, values))
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+
 class Monitor(metaclass=ABCMeta):
     """A gate or slot monitor watching the activation of the given slot or gate over time
 
@@ -20,14 +165,18 @@ class Monitor(metaclass=ABCMeta):
         nodenet: the parent nodenet
         uid: the uid of this monitor
         name: a name for this monitor
-        values: the observed values
+        values: the observed values, a MonitorValues ring buffer keyed by step
 
     """
     @property
     def data(self):
+        return self.get_data()
+
+    def get_data(self, from_step=None):
+        """Returns the data of this monitor, with values restricted to the steps since from_step"""
         data = {
             "uid": self.uid,
-            "values": self.values,
+            "values": self.values.to_dict(from_step),
             "name": self.name,
             "color": self.color,
             "classname": self.__class__.__name__
@@ -37,7 +186,7 @@ class Monitor(metaclass=ABCMeta):
     def __init__(self, nodenet, name='', uid=None, color=None):
         self.uid = uid or micropsi_core.tools.generate_uid()
         self.nodenet = nodenet
-        self.values = {}
+        self.values = MonitorValues()
         self.name = name or "some monitor"
         self.color = color or "#%02d%02d%02d" % (random.randint(0,99), random.randint(0,99), random.randint(0,99))
         nodenet._register_monitor(self)
@@ -47,14 +196,13 @@ class Monitor(metaclass=ABCMeta):
         pass  # pragma: no cover
 
     def clear(self):
-        self.values = {}
+        self.values.clear()
 
 
 class NodeMonitor(Monitor):
 
-    @property
-    def data(self):
-        data = super(NodeMonitor, self).data
+    def get_data(self, from_step=None):
+        data = super(NodeMonitor, self).get_data(from_step)
         data.update({
             "node_uid": self.node_uid,
             "type": self.type,
@@ -83,9 +231,8 @@ class NodeMonitor(Monitor):
 
 class LinkMonitor(Monitor):
 
-    @property
-    def data(self):
-        data = super(LinkMonitor, self).data
+    def get_data(self, from_step=None):
+        data = super(LinkMonitor, self).get_data(from_step)
         data.update({
             "source_node_uid": self.source_node_uid,
             "target_node_uid": self.target_node_uid,
@@ -125,9 +272,8 @@ class LinkMonitor(Monitor):
 
 class ModulatorMonitor(Monitor):
 
-    @property
-    def data(self):
-        data = super(ModulatorMonitor, self).data
+    def get_data(self, from_step=None):
+        data = super(ModulatorMonitor, self).get_data(from_step)
         data.update({
             "modulator": self.modulator
         })
@@ -145,9 +291,8 @@ class ModulatorMonitor(Monitor):
 
 class CustomMonitor(Monitor):
 
-    @property
-    def data(self):
-        data = super(CustomMonitor, self).data
+    def get_data(self, from_step=None):
+        data = super(CustomMonitor, self).get_data(from_step)
         data.update({
             "function": self.function,
         })
@@ -175,6 +175,19 @@ class NetAPI(object):
         """
         self.__nodenet.create_link(source_node.uid, source_gate, target_node.uid, target_slot, weight, certainty)
 
+    def link_many(self, source_nodes, source_gates, target_nodes, target_slots, weights=None):
+        """
+        Creates links between the given nodes at once. The arguments are lists of equal length, one entry
+        per link, and weights default to 1. Existing links will be updated with the given weights.
+        Engines that support it write all links in one pass, which is much faster than calling link repeatedly.
+        """
+        self.__nodenet.create_links(
+            [node.uid for node in source_nodes],
+            source_gates,
+            [node.uid for node in target_nodes],
+            target_slots,
+            weights)
+
     def link_with_reciprocal(self, source_node, target_node, linktype, weight=1, certainty=1):
         """
         Creates two (reciprocal) links between two nodes, valid linktypes are subsur, porret, catexp and symref
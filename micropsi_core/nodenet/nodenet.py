@@ -13,6 +13,10 @@ from threading import Lock
 import logging
 from .nodespace import Nodespace
 from .netapi import NetAPI
+from .step_profiler import StepProfiler
+from .spatial_index import SpatialIndex
+
+from configuration import config as settings
 
 __author__ = 'joscha'
 __date__ = '09.05.12'
@@ -181,6 +185,13 @@ class Nodenet(metaclass=ABCMeta):
 
         self.netapi = NetAPI(self)
 
+        # positions of the nodes by nodespace, maintained by the implementations, see get_node_uids_in_viewport
+        self.spatial_index = SpatialIndex()
+
+        self.profiler = StepProfiler(
+            enabled=settings['micropsi2'].get('step_profiling', 'False') == 'True',
+            window=int(settings['micropsi2'].get('step_profiling_window', '1000')))
+
     @abstractmethod
     def save(self, filename):
         """
@@ -304,6 +315,17 @@ class Nodenet(metaclass=ABCMeta):
         """
         pass  # pragma: no cover
 
+    def create_links(self, source_node_uids, gate_types, target_node_uids, slot_types, weights=None):
+        """
+        Creates links between the given nodes/gates and nodes/slots, given as parallel lists.
+        Weights default to 1. Engines that can write many links at once override this.
+        """
+        if weights is None:
+            weights = [1] * len(source_node_uids)
+        for source_node_uid, gate_type, target_node_uid, slot_type, weight in zip(source_node_uids, gate_types, target_node_uids, slot_types, weights):
+            self.create_link(source_node_uid, gate_type, target_node_uid, slot_type, weight)
+        return True
+
     @abstractmethod
     def set_link_weight(self, source_node_uid, gate_type, target_node_uid, slot_type, weight=1, certainty=1):
         """
@@ -344,10 +366,11 @@ class Nodenet(metaclass=ABCMeta):
         pass  # pragma: no cover
 
     @abstractmethod
-    def get_nodespace_data(self, nodespace_uid, include_links):
+    def get_nodespace_data(self, nodespace_uid, include_links, node_uids=None):
         """
         Returns a data dict of the structure defined in the .data property, filtered for nodes in the given
-        nodespace.
+        nodespace. If node_uids is given, only these nodes of the nodespace are returned, together with the
+        links touching them and the nodes at the other end of these links.
 
         Implementations are expected to fill the following keys:
         'nodes' - map of nodes it the given rectangle
@@ -358,6 +381,13 @@ class Nodenet(metaclass=ABCMeta):
         """
         pass  # pragma: no cover
 
+    def get_node_uids_in_viewport(self, nodespace_uid, viewport):
+        """
+        Returns the uids of the nodes in the given nodespace that are positioned within the viewport
+        rectangle [left, top, right, bottom].
+        """
+        return self.spatial_index.query(nodespace_uid, viewport)
+
     @abstractmethod
     def merge_data(self, nodenet_data, keep_uids=False):
         """
@@ -486,16 +516,25 @@ class Nodenet(metaclass=ABCMeta):
     def get_monitor(self, uid):
         return self.__monitors[uid]
 
+    def get_monitors(self):
+        return self.__monitors
+
     def update_monitors(self):
         for uid in self.__monitors:
             self.__monitors[uid].step(self.current_step)
 
-    def construct_monitors_dict(self):
+    def construct_monitors_dict(self, from_step=None):
         data = {}
         for monitor_uid in self.__monitors:
-            data[monitor_uid] = self.__monitors[monitor_uid].data
+            data[monitor_uid] = self.__monitors[monitor_uid].get_data(from_step)
         return data
 
+    def _activations_changed(self):
+        """
+        Called when activations were set from outside of a step
+        """
+        pass
+
     def _register_monitor(self, monitor):
         self.__monitors[monitor.uid] = monitor
 
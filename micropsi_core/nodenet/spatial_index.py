@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Spatial index over the positions of nodes, used to serve the part of a nodespace that is visible in the editor.
+
+Nodes are kept in square grid cells per nodespace. A viewport query only looks at the cells the viewport
+overlaps, so its cost is proportional to the nodes around the viewport, not to the size of the nodespace.
+"""
+
+
+class SpatialIndex(object):
+    """Grid of node uids by nodespace and position
+
+    Attributes:
+        cell_size: the edge length of the grid cells, in editor coordinates
+    """
+
+    def __init__(self, cell_size=200):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, uid):
+        return uid in self.entries
+
+    def _cell(self, nodespace_uid, position):
+        return nodespace_uid, int(position[0] // self.cell_size), int(position[1] // self.cell_size)
+
+    def update(self, uid, nodespace_uid, position):
+        """Adds the node with the given uid, or moves it to the given nodespace and position.
+        Nodes without a position are kept at the origin."""
+        position = (float(position[0]), float(position[1])) if position else (0., 0.)
+        cell = self._cell(nodespace_uid, position)
+        if uid in self.entries:
+            old_cell = self._cell(*self.entries[uid])
+            if old_cell != cell:
+                self._discard(old_cell, uid)
+        self.cells.setdefault(cell, {})[uid] = position
+        self.entries[uid] = (nodespace_uid, position)
+
+    def remove(self, uid):
+        if uid in self.entries:
+            self._discard(self._cell(*self.entries.pop(uid)), uid)
+
+    def clear(self):
+        self.cells = {}
+        self.entries = {}
+
+    def _discard(self, cell, uid):
+        nodes = self.cells.get(cell)
+        if nodes is not None:
+            nodes.pop(uid, None)
+            if not nodes:
+                del self.cells[cell]
+
+    def query(self, nodespace_uid, viewport):
+        """Returns the uids of the nodes in the given nodespace within the viewport.
+
+        Arguments:
+            viewport: the rectangle [left, top, right, bottom], edges included
+        """
+        left, top, right, bottom = [float(v) for v in viewport]
+        _, first_column, first_row = self._cell(nodespace_uid, (left, top))
+        _, last_column, last_row = self._cell(nodespace_uid, (right, bottom))
+        uids = []
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > len(self.cells):
+            # the viewport spans more cells than there are occupied ones, look at those instead
+            cells = [(cell, nodes) for cell, nodes in self.cells.items() if cell[0] == nodespace_uid and
+                     first_column <= cell[1] <= last_column and first_row <= cell[2] <= last_row]
+        else:
+            cells = []
+            for column in range(first_column, last_column + 1):
+                for row in range(first_row, last_row + 1):
+                    nodes = self.cells.get((nodespace_uid, column, row))
+                    if nodes:
+                        cells.append(((nodespace_uid, column, row), nodes))
+        for cell, nodes in cells:
+            inner = first_column < cell[1] < last_column and first_row < cell[2] < last_row
+            for uid, (x, y) in nodes.items():
+                if inner or (left <= x <= right and top <= y <= bottom):
+                    uids.append(uid)
+        return uids
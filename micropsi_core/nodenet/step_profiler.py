@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Timing of the parts of a nodenet step: step operators, partition calculation and propagation,
+native modules, the world step and monitor updates.
+
+Every nodenet has a StepProfiler. Timed sections record their wall time into a window of the most
+recent durations per section, from which statistics and a histogram with logarithmic bins are
+computed when asked for.
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+# histogram bin edges in seconds, from one microsecond to ten seconds
+HISTOGRAM_BIN_EDGES = np.logspace(-6, 1, 15)
+
+
+class StepProfiler(object):
+    """Records the durations of named sections of nodenet steps
+
+    Attributes:
+        enabled: if False, timed sections are not recorded
+        window: the number of recent durations kept per section
+    """
+
+    def __init__(self, enabled=False, window=1000):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}
+
+    def timed(self, name, *args):
+        """Returns a context manager that records the wall time of its block under the given name.
+        Like logging calls, the name is only formatted with the given args if profiling is enabled."""
+        if not self.enabled:
+            return NO_TIMER
+        return Timer(self, name % args if args else name)
+
+    def record(self, name, duration):
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.window)
+        self.samples[name].append(duration)
+
+    def reset(self):
+        self.samples = {}
+
+    def get_profile(self):
+        """Returns statistics of the recorded durations per section, in seconds"""
+        profile = {}
+        for name, samples in list(self.samples.items()):
+            durations = np.array(samples)
+            if len(durations) == 0:
+                continue
+            counts, _ = np.histogram(np.clip(durations, HISTOGRAM_BIN_EDGES[0], HISTOGRAM_BIN_EDGES[-1]), bins=HISTOGRAM_BIN_EDGES)
+            profile[name] = {
+                'count': len(durations),
+                'mean': float(durations.mean()),
+                'median': float(np.median(durations)),
+                'p95': float(np.percentile(durations, 95)),
+                'max': float(durations.max()),
+                'last': float(durations[-1]),
+                'histogram': counts.tolist()
+            }
+        return profile
+
+
+class Timer(object):
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class NoTimer(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NO_TIMER = NoTimer()
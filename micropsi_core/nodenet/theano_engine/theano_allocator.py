@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Allocators for node IDs, nodespace IDs and element ranges of theano partitions.
+
+Both work on the allocation vectors of the partition, in which free entries are 0. They keep their
+free lists next to the vector they were built from, and rebuild them with one vectorized scan if the
+partition replaced the vector, i.e. after growing or loading.
+"""
+
+import bisect
+import heapq
+
+import numpy as np
+
+
+class IdAllocator(object):
+    """Hands out the free indices of an ID vector, lowest first.
+
+    IDs taken without the allocator (explicit IDs when loading or merging) stay in the free list,
+    and are skipped when they come up.
+    """
+
+    def __init__(self, reserved=1):
+        # IDs below this are never handed out
+        self.reserved = reserved
+        self.array = None
+        # a heap of the free IDs
+        self.free = []
+
+    def rebuild(self, array):
+        self.array = array
+        # ascending, and thereby already a heap
+        self.free = (np.nonzero(array[self.reserved:] == 0)[0] + self.reserved).tolist()
+
+    def allocate(self, array):
+        """Returns a free ID of the given vector, or None if all IDs are in use"""
+        if array is not self.array or not self.free:
+            self.rebuild(array)
+        while self.free:
+            id = heapq.heappop(self.free)
+            if array[id] == 0:
+                return id
+        return None
+
+    def release(self, array, id):
+        if array is self.array and id >= self.reserved:
+            heapq.heappush(self.free, id)
+
+
+class RangeAllocator(object):
+    """Hands out ranges of consecutive free entries of an element vector.
+
+    Free ranges are indexed by their start, their end and their length. Released ranges coalesce
+    with free neighbours, and requests are served from the smallest free range that fits, found by
+    bisecting the sorted list of distinct free lengths.
+    """
+
+    def __init__(self, reserved=1):
+        # elements below this are never handed out
+        self.reserved = reserved
+        self.array = None
+        self.starts = {}
+        self.ends = {}
+        self.by_length = {}
+        # the keys of by_length, ascending
+        self.lengths = []
+
+    def rebuild(self, array):
+        self.array = array
+        self.starts = {}
+        self.ends = {}
+        self.by_length = {}
+        self.lengths = []
+        free = np.zeros(len(array) + 2, dtype=np.int8)
+        free[1 + self.reserved:-1] = array[self.reserved:] == 0
+        changes = np.diff(free)
+        starts = np.nonzero(changes == 1)[0]
+        ends = np.nonzero(changes == -1)[0]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self._add(start, end - start)
+
+    def _add(self, start, length):
+        self.starts[start] = length
+        self.ends[start + length] = start
+        if length not in self.by_length:
+            self.by_length[length] = set()
+            bisect.insort(self.lengths, length)
+        self.by_length[length].add(start)
+
+    def _remove(self, start):
+        length = self.starts.pop(start)
+        del self.ends[start + length]
+        self.by_length[length].discard(start)
+        if not self.by_length[length]:
+            del self.by_length[length]
+            del self.lengths[bisect.bisect_left(self.lengths, length)]
+        return length
+
+    def _find(self, length):
+        index = bisect.bisect_left(self.lengths, length)
+        if index < len(self.lengths):
+            return next(iter(self.by_length[self.lengths[index]]))
+        return None
+
+    def allocate(self, array, length):
+        """Returns the offset of a free range of the given length, or None if there is none"""
+        if array is not self.array:
+            self.rebuild(array)
+        start = self._find(length)
+        if start is not None and array[start:start + length].any():
+            # the vector was written to without us
+            self.rebuild(array)
+            start = self._find(length)
+        if start is None:
+            return None
+        free_length = self._remove(start)
+        if free_length > length:
+            self._add(start + length, free_length - length)
+        return start
+
+    def release(self, array, start, length):
+        if array is not self.array:
+            return
+        end = start + length
+        if end in self.starts:
+            end += self._remove(end)
+        if start in self.ends:
+            start = self.ends[start]
+            self._remove(start)
+        self._add(start, end - start)
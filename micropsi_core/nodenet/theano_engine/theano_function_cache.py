@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cache of compiled theano functions for partitions.
+
+Theano functions are bound to the shared variables they were compiled with, so partitions used to
+recompile their step functions whenever they loaded, grew, or started using a new feature. The cache
+compiles each function once per key against template shared variables of the same types, and hands
+out copies with the partition's own shared variables swapped in. Shapes are not part of a variable's
+type, so growing partitions reuse the compiled graph.
+
+Compiled templates are pickled to a directory next to theano's own compilation cache, and reused
+after restarts. The file names include a hash of the source of the function building the graph, so
+changes to the graph never load stale functions.
+"""
+
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+
+import theano
+import theano.sparse as ST
+import numpy as np
+import scipy.sparse as sp
+
+from configuration import config as settings
+
+
+class FunctionCache(object):
+    """Compiled theano functions by key, see get"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.templates = {}
+
+    def get(self, key, variables, builder):
+        """
+        Returns the function built by builder for the given key, working on the given shared variables.
+
+        Arguments:
+            key: a tuple of everything besides the variable types the graph depends on, e.g. feature flags
+            variables: a dict of the shared variables the function works on, by name
+            builder: a function that takes an object with the shared variables as attributes, and returns
+                a compiled theano function working on them. The key has to determine the graph it builds.
+        """
+        names = sorted(variables.keys())
+        full_key = (builder.__name__,) + tuple(key) + tuple((name, str(variables[name].type)) for name in names)
+        if full_key not in self.templates:
+            self.templates[full_key] = self.__load(full_key, builder) or self.__compile(full_key, variables, builder)
+        function, template_variables = self.templates[full_key]
+        used = set(i.variable for i in function.maker.inputs)
+        swap = dict((template_variables[name], variables[name]) for name in names if template_variables[name] in used)
+        return function.copy(swap=swap)
+
+    def clear(self):
+        self.templates = {}
+
+    def __compile(self, full_key, variables, builder):
+        template_variables = dict((name, make_template_variable(name, variable)) for name, variable in variables.items())
+        function = builder(TemplateVariables(template_variables))
+        self.__store(full_key, builder, (function, template_variables))
+        return function, template_variables
+
+    def __filename(self, full_key, builder):
+        if not self.directory:
+            return None
+        try:
+            source = inspect.getsource(builder)
+        except (IOError, TypeError):
+            return None
+        digest = hashlib.sha1((repr(full_key) + source + theano.__version__).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, "%s_%s.pkl" % (builder.__name__, digest))
+
+    def __load(self, full_key, builder):
+        filename = self.__filename(full_key, builder)
+        if filename is None or not os.path.isfile(filename):
+            return None
+        try:
+            with open(filename, 'rb') as fp:
+                return pickle.load(fp)
+        except Exception as err:
+            logging.getLogger("system").warn("Could not load compiled theano function %s: %s" % (filename, str(err)))
+            return None
+
+    def __store(self, full_key, builder, template):
+        filename = self.__filename(full_key, builder)
+        if filename is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(filename + '.tmp', 'wb') as fp:
+                pickle.dump(template, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filename + '.tmp', filename)
+        except Exception as err:
+            logging.getLogger("system").warn("Could not store compiled theano function %s: %s" % (filename, str(err)))
+
+
+class TemplateVariables(object):
+    """The shared variables a function is built on, as attributes"""
+
+    def __init__(self, variables):
+        self.__dict__.update(variables)
+
+
+def make_template_variable(name, variable):
+    """Returns a small shared variable of the same type as the given one"""
+    if isinstance(variable.type, ST.SparseType):
+        matrix = sp.csc_matrix if variable.type.format == 'csc' else sp.csr_matrix
+        return theano.shared(matrix((1, 1), dtype=variable.dtype), name=name)
+    return theano.shared(np.zeros((1,) * variable.ndim, dtype=variable.dtype), name=name, broadcastable=variable.broadcastable)
+
+
+def get_function_cache_directory():
+    directory = settings['theano'].get('function_cache_directory')
+    if directory is None:
+        return os.path.join(theano.config.compiledir, 'micropsi2_functions')
+    if directory.strip() == '':
+        return None
+    return os.path.expanduser(directory)
+
+
+function_cache = FunctionCache(get_function_cache_directory())
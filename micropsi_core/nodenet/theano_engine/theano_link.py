@@ -56,7 +56,7 @@ class TheanoLink(Link):
             source_element = source_partition.allocated_node_offsets[node_from_id(self.__source_node_uid)] + ngt
             y = np.where(from_elements == source_element)[0][0]
             x = np.where(to_elements == target_element)[0][0]
-            return float(weights[x][y])
+            return float(weights[x, y])
 
     @property
     def certainty(self):
@@ -67,6 +67,7 @@ class TheanoNode(Node):
             del self._nodenet.positions[self.uid]
         else:
             self._nodenet.positions[self.uid] = position
+        self._nodenet._node_moved(self.uid)
 
     @property
     def name(self):
@@ -87,6 +88,7 @@ class TheanoNode(Node):
     @parent_nodespace.setter
     def parent_nodespace(self, uid):
         self._partition.allocated_node_parents[self._id] = nodespace_from_id(uid)
+        self._nodenet._node_moved(self.uid)
 
     @property
     def activation(self):
@@ -382,8 +384,7 @@ class TheanoGate(Gate):
                     weights = inlinks[2].get_value(borrow=True)
                     if element in from_elements:
                         element_index = np.where(from_elements == element)[0][0]
-                        gatecolumn = weights[:, element_index]
-                        links_indices = np.nonzero(gatecolumn)[0]
+                        links_indices = weights[:, element_index].nonzero()[0]
                         for link_index in links_indices:
                             target_id = to_partition.allocated_elements_to_nodes[to_elements[link_index]]
                             target_type = to_partition.allocated_nodes[target_id]
@@ -481,8 +482,7 @@ class TheanoSlot(Slot):
                 if element in to_elements:
                     from_partition = self.__nodenet.partitions[partition_from_spid]
                     element_index = np.where(to_elements == element)[0][0]
-                    slotrow = weights[element_index]
-                    links_indices = np.nonzero(slotrow)[0]
+                    links_indices = weights[element_index].nonzero()[1]
                     for link_index in links_indices:
                         source_id = from_partition.allocated_elements_to_nodes[from_elements[link_index]]
                         source_type = from_partition.allocated_nodes[source_id]
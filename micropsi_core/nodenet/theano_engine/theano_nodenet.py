@@ -6,6 +6,7 @@ Nodenet definition
 import json
 import os
 import copy
+import shutil
 import warnings
 
 import theano
@@ -169,6 +170,9 @@ class TheanoNodenet(Nodenet):
         # map of numerical node IDs to data targets
         self.inverted_actuator_map = {}
 
+        # gate monitors grouped by partition, see update_monitors
+        self._monitor_plan = None
+
         super(TheanoNodenet, self).__init__(name, worldadapter, world, owner, uid)
 
         precision = settings['theano']['precision']
@@ -284,7 +288,7 @@ class TheanoNodenet(Nodenet):
                 nodes_data = initfrom['nodes']
 
             for partition in self.partitions.values():
-                datafilename = os.path.join(os.path.dirname(filename), self.uid + "-data-" + partition.spid + ".npz")
+                datafilename = os.path.join(os.path.dirname(filename), self.uid + "-data-" + partition.spid)
                 partition.load(datafilename, nodes_data)
 
             # reloading native modules ensures the types in allocated_nodes are up to date
@@ -308,7 +312,11 @@ class TheanoNodenet(Nodenet):
         neighbors = os.listdir(os.path.dirname(filename))
         for neighbor in neighbors:
             if neighbor.startswith(self.uid):
-                os.remove(os.path.join(os.path.dirname(filename), neighbor))
+                path = os.path.join(os.path.dirname(filename), neighbor)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
 
     def initialize_nodenet(self, initfrom):
 
@@ -321,6 +329,7 @@ class TheanoNodenet(Nodenet):
                 self.names = initfrom['names']
             if 'positions' in initfrom:
                 self.positions = initfrom['positions']
+            self._rebuild_spatial_index()
             if 'actuatormap' in initfrom:
                 self.actuatormap = initfrom['actuatormap']
             if 'sensormap' in initfrom:
@@ -386,15 +395,14 @@ class TheanoNodenet(Nodenet):
                 warnings.warn("Invalid nodetype %s for node %s" % (data['type'], uid))
 
         # merge in links
-        for linkid in nodenet_data.get('links', {}):
-            data = nodenet_data['links'][linkid]
-            self.create_link(
-                uidmap[data['source_node_uid']],
-                data['source_gate_name'],
-                uidmap[data['target_node_uid']],
-                data['target_slot_name'],
-                data['weight']
-            )
+        links = list(nodenet_data.get('links', {}).values())
+        self.create_links(
+            [uidmap[data['source_node_uid']] for data in links],
+            [data['source_gate_name'] for data in links],
+            [uidmap[data['target_node_uid']] for data in links],
+            [data['target_slot_name'] for data in links],
+            [data['weight'] for data in links]
+        )
 
         for monitorid in nodenet_data.get('monitors', {}):
             data = nodenet_data['monitors'][monitorid]
@@ -454,10 +462,74 @@ class TheanoNodenet(Nodenet):
 
         with self.netlock:
             for operator in self.stepoperators:
-                operator.execute(self, None, self.netapi)
+                with self.profiler.timed(operator.__class__.__name__):
+                    operator.execute(self, None, self.netapi)
 
             self.__step += 1
 
+    def _register_monitor(self, monitor):
+        super(TheanoNodenet, self)._register_monitor(monitor)
+        self._monitor_plan = None
+
+    def _unregister_monitor(self, monitor_uid):
+        super(TheanoNodenet, self)._unregister_monitor(monitor_uid)
+        self._monitor_plan = None
+
+    def _build_monitor_plan(self):
+        """
+        Groups the gate monitors by partition, with the node ids, node types and activation
+        element indices they read. All other monitors are returned in a separate list.
+        """
+        batched = {}
+        others = []
+        for mon in self.get_monitors().values():
+            if isinstance(mon, monitor.NodeMonitor) and mon.type == 'gate' and mon.sheaf == 'default' and self.is_node(mon.node_uid):
+                node = self.get_node(mon.node_uid)
+                if mon.target in node.get_gate_types():
+                    monitors, ids, gates = batched.setdefault(self.get_partition(mon.node_uid).spid, ([], [], []))
+                    monitors.append(mon)
+                    ids.append(node_from_id(mon.node_uid))
+                    gates.append(get_numerical_gate_type(mon.target, node.nodetype))
+                    continue
+            others.append(mon)
+
+        plan = []
+        for spid, (monitors, ids, gates) in batched.items():
+            partition = self.partitions[spid]
+            ids = np.asarray(ids, dtype=np.int32)
+            gates = np.asarray(gates, dtype=np.int32)
+            types = partition.allocated_nodes[ids].copy()
+            elements = partition.allocated_node_offsets[ids] + gates
+            plan.append((partition, monitors, ids, types, gates, elements))
+        return plan, others
+
+    def _monitor_plan_valid(self):
+        plan, others = self._monitor_plan
+        for partition, monitors, ids, types, gates, elements in plan:
+            if self.partitions.get(partition.spid) is not partition:
+                return False
+            if not np.array_equal(partition.allocated_nodes[ids], types):
+                return False
+            if not np.array_equal(partition.allocated_node_offsets[ids] + gates, elements):
+                return False
+        return True
+
+    def update_monitors(self):
+        """
+        Samples all gate monitors of a partition with one gather from its activation vector,
+        instead of resolving node and gate objects per monitor.
+        """
+        if self._monitor_plan is None or not self._monitor_plan_valid():
+            self._monitor_plan = self._build_monitor_plan()
+        plan, others = self._monitor_plan
+        step = self.current_step
+        for partition, monitors, ids, types, gates, elements in plan:
+            values = partition.a.get_value(borrow=True)[elements].tolist()
+            for mon, value in zip(monitors, values):
+                mon.values[step] = value
+        for mon in others:
+            mon.step(step)
+
     def get_partition(self, uid):
         if uid is None:
             return self.rootpartition
@@ -523,6 +595,7 @@ class TheanoNodenet(Nodenet):
             self.positions[uid] = position
         if name is not None and name != "" and name != uid:
             self.names[uid] = name
+        self._node_moved(uid)
 
         if parameters is None:
             parameters = {}
@@ -643,6 +716,7 @@ class TheanoNodenet(Nodenet):
         for otherpartition in self.partitions.values():
             if spid in otherpartition.inlinks:
                 del otherpartition.inlinks[spid]
+        self._rebuild_spatial_index()
 
     def create_nodespace(self, parent_uid, position, name="", uid=None, options=None):
         if options is None:
@@ -665,7 +739,8 @@ class TheanoNodenet(Nodenet):
             self.last_allocated_partition += 1
             spid = self.create_partition(self.last_allocated_partition, parent_uid)
             partition = self.partitions[spid]
-            id = partition.create_nodespace(0, id_to_pass)
+            # the root nodespace of a partition always has the ID 1
+            id = partition.create_nodespace(0, 1 if id_to_pass is None else id_to_pass)
             uid = nodespace_to_id(id, partition.pid)
         else:
             id = partition.create_nodespace(parent_id, id_to_pass)
@@ -699,6 +774,19 @@ class TheanoNodenet(Nodenet):
             del self.names[uid]
         if uid in self.positions:
             del self.positions[uid]
+        self.spatial_index.remove(uid)
+
+    def _node_moved(self, uid):
+        """ Called when the position or the parent nodespace of a node changes, updates the spatial index"""
+        partition = self.get_partition(uid)
+        id = node_from_id(uid)
+        parent_uid = nodespace_to_id(partition.allocated_node_parents[id], partition.pid)
+        self.spatial_index.update(uid, parent_uid, self.positions.get(uid, (10, 10)))
+
+    def _rebuild_spatial_index(self):
+        self.spatial_index.clear()
+        for uid in self.get_node_uids():
+            self._node_moved(uid)
 
     def get_sensors(self, nodespace=None, datasource=None):
         sensors = {}
@@ -778,6 +866,62 @@ class TheanoNodenet(Nodenet):
 
         return True
 
+    def create_links(self, source_node_uids, gate_types, target_node_uids, slot_types, weights=None):
+        if weights is None:
+            weights = [1] * len(source_node_uids)
+
+        # element indices of all links, grouped by source and target partition
+        links = {}
+        numerical_types = {}
+
+        def element(partition, node_id, type, is_gate):
+            numerical_type = partition.allocated_nodes[node_id]
+            key = (numerical_type, type, is_gate)
+            if key not in numerical_types:
+                nodetype = None
+                if numerical_type > MAX_STD_NODETYPE:
+                    nodetype = self.get_nodetype(get_string_node_type(numerical_type, self.native_modules))
+                if is_gate:
+                    index = get_numerical_gate_type(type, nodetype)
+                    valid = index <= get_gates_per_type(numerical_type, self.native_modules)
+                else:
+                    index = get_numerical_slot_type(type, nodetype)
+                    valid = index <= get_slots_per_type(numerical_type, self.native_modules)
+                numerical_types[key] = index if valid else None
+            index = numerical_types[key]
+            if index is None:
+                raise ValueError("Node %s does not have a %s of type %s" % (node_to_id(node_id, partition.pid), "gate" if is_gate else "slot", type))
+            return partition.allocated_node_offsets[node_id] + index
+
+        for source_node_uid, gate_type, target_node_uid, slot_type, weight in zip(source_node_uids, gate_types, target_node_uids, slot_types, weights):
+            source_partition = self.get_partition(source_node_uid)
+            target_partition = self.get_partition(target_node_uid)
+            from_elements, to_elements, link_weights = links.setdefault((source_partition.spid, target_partition.spid), ([], [], []))
+            from_elements.append(element(source_partition, node_from_id(source_node_uid), gate_type, True))
+            to_elements.append(element(target_partition, node_from_id(target_node_uid), slot_type, False))
+            link_weights.append(weight)
+
+        for (source_spid, target_spid), (from_elements, to_elements, link_weights) in links.items():
+            if source_spid == target_spid:
+                self.partitions[target_spid].set_link_weights_by_element(from_elements, to_elements, link_weights)
+            else:
+                self.partitions[target_spid].set_inlink_weights_by_element(source_spid, from_elements, to_elements, link_weights)
+
+        for uid, gate_type in set(zip(source_node_uids, gate_types)):
+            if uid in self.proxycache:
+                self.proxycache[uid].get_gate(gate_type).invalidate_caches()
+            for partition in self.partitions.values():
+                if uid in partition.native_module_instances:
+                    partition.native_module_instances[uid].get_gate(gate_type).invalidate_caches()
+        for uid, slot_type in set(zip(target_node_uids, slot_types)):
+            if uid in self.proxycache:
+                self.proxycache[uid].get_slot(slot_type).invalidate_caches()
+            for partition in self.partitions.values():
+                if uid in partition.native_module_instances:
+                    partition.native_module_instances[uid].get_slot(slot_type).invalidate_caches()
+
+        return True
+
     def delete_link(self, source_node_uid, gate_type, target_node_uid, slot_type):
         return self.set_link_weight(source_node_uid, gate_type, target_node_uid, slot_type, 0)
 
@@ -850,16 +994,27 @@ class TheanoNodenet(Nodenet):
                 instance = self.get_node(node_to_id(id, partition.pid))
                 partition.allocated_nodes[id] = get_numerical_node_type(instance.type, self.native_modules)
 
-    def get_nodespace_data(self, nodespace_uid, include_links):
+    def get_nodespace_data(self, nodespace_uid, include_links, node_uids=None):
         partition = self.get_partition(nodespace_uid)
+        if node_uids is None:
+            nodes = self.construct_nodes_dict(nodespace_uid, 1000)
+        else:
+            nodes = dict((uid, self.get_node(uid).data) for uid in node_uids)
         data = {
             'links': {},
-            'nodes': self.construct_nodes_dict(nodespace_uid, 1000),
+            'nodes': nodes,
             'nodespaces': self.construct_nodespaces_dict(nodespace_uid),
             'monitors': self.construct_monitors_dict(),
             'modulators': self.construct_modulators_dict()
         }
-        if include_links:
+        if include_links and node_uids is not None:
+            data['links'] = self.construct_node_links_dict(node_uids)
+            # links also bring the nodes at their other end along
+            for link in data['links'].values():
+                for uid in (link['source_node_uid'], link['target_node_uid']):
+                    if uid not in data['nodes']:
+                        data['nodes'][uid] = self.get_node(uid).data
+        elif include_links:
             data['links'] = self.construct_links_dict(nodespace_uid)
 
             followupnodes = []
@@ -899,101 +1054,34 @@ class TheanoNodenet(Nodenet):
                 nspartition = self.get_partition(nodespace_uid)
                 if nspartition != partition:
                     continue
-                parent = nodespace_from_id(nodespace_uid)
-                node_ids = np.where(partition.allocated_node_parents == parent)[0]
-            else:
-                node_ids = np.nonzero(partition.allocated_nodes)[0]
+
+            # collect all links within the partition in one pass over the nonzero entries of w
             w_matrix = partition.w.get_value(borrow=True)
-            for node_id in node_ids:
-
-                source_type = partition.allocated_nodes[node_id]
-                for gate_type in range(get_gates_per_type(source_type, self.native_modules)):
-                    gatecolumn = w_matrix[:, partition.allocated_node_offsets[node_id] + gate_type]
-                    links_indices = np.nonzero(gatecolumn)[0]
-                    for index in links_indices:
-                        target_id = partition.allocated_elements_to_nodes[index]
-                        target_type = partition.allocated_nodes[target_id]
-                        target_slot_numerical = index - partition.allocated_node_offsets[target_id]
-                        target_slot_type = get_string_slot_type(target_slot_numerical, self.get_nodetype(get_string_node_type(target_type, self.native_modules)))
-                        source_gate_type = get_string_gate_type(gate_type, self.get_nodetype(get_string_node_type(source_type, self.native_modules)))
-                        if partition.sparse:               # sparse matrices return matrices of dimension (1,1) as values
-                            weight = float(gatecolumn[index].data)
-                        else:
-                            weight = gatecolumn[index].item()
-
-                        linkuid = "%s:%s:%s:%s" % (node_to_id(node_id, partition.pid), source_gate_type, target_slot_type, node_to_id(target_id, partition.pid))
-                        linkdata = {
-                            "uid": linkuid,
-                            "weight": weight,
-                            "certainty": 1,
-                            "source_gate_name": source_gate_type,
-                            "source_node_uid": node_to_id(node_id, partition.pid),
-                            "target_slot_name": target_slot_type,
-                            "target_node_uid": node_to_id(target_id, partition.pid)
-                        }
-                        data[linkuid] = linkdata
-
-                target_type = partition.allocated_nodes[node_id]
-                for slot_type in range(get_slots_per_type(target_type, self.native_modules)):
-                    slotrow = w_matrix[partition.allocated_node_offsets[node_id] + slot_type]
-                    if partition.sparse:
-                        links_indices = np.nonzero(slotrow)[1]
-                    else:
-                        links_indices = np.nonzero(slotrow)[0]
-                    for index in links_indices:
-                        source_id = partition.allocated_elements_to_nodes[index]
-                        source_type = partition.allocated_nodes[source_id]
-                        source_gate_numerical = index - partition.allocated_node_offsets[source_id]
-                        source_gate_type = get_string_gate_type(source_gate_numerical, self.get_nodetype(get_string_node_type(source_type, self.native_modules)))
-                        target_slot_type = get_string_slot_type(slot_type, self.get_nodetype(get_string_node_type(target_type, self.native_modules)))
-                        if partition.sparse:
-                            weight = float(slotrow[0, index])
-                        else:
-                            weight = slotrow[index].item()
-
-                        linkuid = "%s:%s:%s:%s" % (node_to_id(source_id, partition.pid), source_gate_type, target_slot_type, node_to_id(node_id, partition.pid))
-                        linkdata = {
-                            "uid": linkuid,
-                            "weight": weight,
-                            "certainty": 1,
-                            "source_gate_name": source_gate_type,
-                            "source_node_uid": node_to_id(source_id, partition.pid),
-                            "target_slot_name": target_slot_type,
-                            "target_node_uid": node_to_id(node_id, partition.pid)
-                        }
-                        data[linkuid] = linkdata
+            if partition.sparse:
+                coo = w_matrix.tocoo()
+                slots, gates, weights = coo.row, coo.col, coo.data
+            else:
+                slots, gates = np.nonzero(w_matrix)
+                weights = w_matrix[slots, gates]
+            nonzero = weights != 0
+            slots, gates, weights = slots[nonzero], gates[nonzero], weights[nonzero]
+
+            if nodespace_uid is not None:
+                # only links that originate or end in the given nodespace
+                in_nodespace = partition.allocated_node_parents == nodespace_from_id(nodespace_uid)
+                mask = in_nodespace[partition.allocated_elements_to_nodes[gates]] | \
+                    in_nodespace[partition.allocated_elements_to_nodes[slots]]
+                slots, gates, weights = slots[mask], gates[mask], weights[mask]
+
+            self._add_links_to_dict(data, partition, gates, partition, slots, weights)
 
             # find links coming in from other partitions
             for partition_from_spid, inlinks in partition.inlinks.items():
                 from_partition = self.partitions[partition_from_spid]
                 from_elements = inlinks[0].get_value(borrow=True)
                 to_elements = inlinks[1].get_value(borrow=True)
-                weights = inlinks[2].get_value(borrow=True)
-                for i, element in enumerate(from_elements):
-                    gatecolumn = weights[:, i]
-                    links_indices = np.nonzero(gatecolumn)[0]
-                    for link_index in links_indices:
-                        source_id = from_partition.allocated_elements_to_nodes[element]
-                        source_type = from_partition.allocated_nodes[source_id]
-                        source_gate_numerical = element - from_partition.allocated_node_offsets[source_id]
-                        source_gate_type = get_string_gate_type(source_gate_numerical, self.get_nodetype(get_string_node_type(source_type, self.native_modules)))
-
-                        target_id = partition.allocated_elements_to_nodes[to_elements[link_index]]
-                        target_type = partition.allocated_nodes[target_id]
-                        target_slot_numerical = to_elements[link_index] - partition.allocated_node_offsets[target_id]
-                        target_slot_type = get_string_slot_type(target_slot_numerical, self.get_nodetype(get_string_node_type(target_type, self.native_modules)))
-
-                        linkuid = "%s:%s:%s:%s" % (node_to_id(source_id, from_partition.pid), source_gate_type, target_slot_type, node_to_id(target_id, partition.pid))
-                        linkdata = {
-                            "uid": linkuid,
-                            "weight": float(weights[link_index, i]),
-                            "certainty": 1,
-                            "source_gate_name": source_gate_type,
-                            "source_node_uid": node_to_id(source_id, from_partition.pid),
-                            "target_slot_name": target_slot_type,
-                            "target_node_uid": node_to_id(target_id, partition.pid)
-                        }
-                        data[linkuid] = linkdata
+                inlink_weights = inlinks[2].get_value(borrow=True).tocoo()
+                self._add_links_to_dict(data, from_partition, from_elements[inlink_weights.col], partition, to_elements[inlink_weights.row], inlink_weights.data)
 
             # find links going out to other partitions
             for partition_to_spid, to_partition in self.partitions.items():
@@ -1001,35 +1089,109 @@ class TheanoNodenet(Nodenet):
                     inlinks = to_partition.inlinks[partition.spid]
                     from_elements = inlinks[0].get_value(borrow=True)
                     to_elements = inlinks[1].get_value(borrow=True)
-                    weights = inlinks[2].get_value(borrow=True)
-                    for i, element in enumerate(to_elements):
-                        slotrow = weights[i]
-                        links_indices = np.nonzero(slotrow)[0]
-                        for link_index in links_indices:
-                            source_id = partition.allocated_elements_to_nodes[from_elements[link_index]]
-                            source_type = partition.allocated_nodes[source_id]
-                            source_gate_numerical = from_elements[link_index] - partition.allocated_node_offsets[source_id]
-                            source_gate_type = get_string_gate_type(source_gate_numerical, self.get_nodetype(get_string_node_type(source_type, self.native_modules)))
-
-                            target_id = to_partition.allocated_elements_to_nodes[element]
-                            target_type = to_partition.allocated_nodes[target_id]
-                            target_slot_numerical = element - to_partition.allocated_node_offsets[target_id]
-                            target_slot_type = get_string_slot_type(target_slot_numerical, self.get_nodetype(get_string_node_type(target_type, self.native_modules)))
-
-                            linkuid = "%s:%s:%s:%s" % (node_to_id(source_id, partition.pid), source_gate_type, target_slot_type, node_to_id(target_id, to_partition.pid))
-                            linkdata = {
-                                "uid": linkuid,
-                                "weight": float(weights[i, link_index]),
-                                "certainty": 1,
-                                "source_gate_name": source_gate_type,
-                                "source_node_uid": node_to_id(source_id, partition.pid),
-                                "target_slot_name": target_slot_type,
-                                "target_node_uid": node_to_id(target_id, to_partition.pid)
-                            }
-                            data[linkuid] = linkdata
+                    inlink_weights = inlinks[2].get_value(borrow=True).tocoo()
+                    self._add_links_to_dict(data, partition, from_elements[inlink_weights.col], to_partition, to_elements[inlink_weights.row], inlink_weights.data)
+
+        return data
+
+    def construct_node_links_dict(self, node_uids):
+        """
+        Returns the link dicts of all links from or to the given nodes, looking only at the rows and columns
+        of the weight matrices that belong to their elements
+        """
+        data = {}
+        node_ids = {}
+        for uid in node_uids:
+            node_ids.setdefault(self.get_partition(uid).spid, []).append(node_from_id(uid))
+
+        for spid, ids in node_ids.items():
+            partition = self.partitions[spid]
+            counts = [get_elements_per_type(type, self.native_modules) for type in partition.allocated_nodes[ids].tolist()]
+            offsets = partition.allocated_node_offsets[ids]
+            elements = np.concatenate([np.arange(offset, offset + count) for offset, count in zip(offsets.tolist(), counts)]).astype(np.int32)
+
+            # links ending in the nodes are in their rows, links starting at them in their columns
+            w_matrix = partition.w.get_value(borrow=True)
+            if partition.sparse:
+                incoming = w_matrix[elements, :].tocoo()
+                outgoing = w_matrix[:, elements].tocoo()
+                nonzero = incoming.data != 0
+                self._add_links_to_dict(data, partition, incoming.col[nonzero], partition, elements[incoming.row[nonzero]], incoming.data[nonzero])
+                nonzero = outgoing.data != 0
+                self._add_links_to_dict(data, partition, elements[outgoing.col[nonzero]], partition, outgoing.row[nonzero], outgoing.data[nonzero])
+            else:
+                slots, gates = np.nonzero(w_matrix[elements, :])
+                self._add_links_to_dict(data, partition, gates, partition, elements[slots], w_matrix[elements[slots], gates])
+                slots, gates = np.nonzero(w_matrix[:, elements])
+                self._add_links_to_dict(data, partition, elements[gates], partition, slots, w_matrix[slots, elements[gates]])
+
+            # links coming in from other partitions
+            for partition_from_spid, inlinks in partition.inlinks.items():
+                to_elements = inlinks[1].get_value(borrow=True)
+                rows = np.where(np.in1d(to_elements, elements))[0]
+                if len(rows):
+                    from_elements = inlinks[0].get_value(borrow=True)
+                    weights = inlinks[2].get_value(borrow=True)[rows, :].tocoo()
+                    self._add_links_to_dict(data, self.partitions[partition_from_spid], from_elements[weights.col], partition, to_elements[rows[weights.row]], weights.data)
+
+            # links going out to other partitions
+            for to_partition in self.partitions.values():
+                if spid in to_partition.inlinks:
+                    inlinks = to_partition.inlinks[spid]
+                    from_elements = inlinks[0].get_value(borrow=True)
+                    cols = np.where(np.in1d(from_elements, elements))[0]
+                    if len(cols):
+                        to_elements = inlinks[1].get_value(borrow=True)
+                        weights = inlinks[2].get_value(borrow=True)[:, cols].tocoo()
+                        self._add_links_to_dict(data, partition, from_elements[cols[weights.col]], to_partition, to_elements[weights.row], weights.data)
 
         return data
 
+    def _add_links_to_dict(self, data, from_partition, gate_elements, to_partition, slot_elements, weights):
+        """
+        Adds link dicts to data for the given arrays of source gate elements (in from_partition),
+        target slot elements (in to_partition) and weights
+        """
+        source_ids = from_partition.allocated_elements_to_nodes[gate_elements]
+        source_gates = gate_elements - from_partition.allocated_node_offsets[source_ids]
+        source_types = from_partition.allocated_nodes[source_ids]
+        target_ids = to_partition.allocated_elements_to_nodes[slot_elements]
+        target_slots = slot_elements - to_partition.allocated_node_offsets[target_ids]
+        target_types = to_partition.allocated_nodes[target_ids]
+
+        gate_names = {}
+        slot_names = {}
+        source_uids = {}
+        target_uids = {}
+        for source_id, source_type, source_gate, target_id, target_type, target_slot, weight in zip(
+                source_ids.tolist(), source_types.tolist(), source_gates.tolist(),
+                target_ids.tolist(), target_types.tolist(), target_slots.tolist(), weights.tolist()):
+            if (source_type, source_gate) not in gate_names:
+                nodetype = self.get_nodetype(get_string_node_type(source_type, self.native_modules))
+                gate_names[(source_type, source_gate)] = get_string_gate_type(source_gate, nodetype)
+            if (target_type, target_slot) not in slot_names:
+                nodetype = self.get_nodetype(get_string_node_type(target_type, self.native_modules))
+                slot_names[(target_type, target_slot)] = get_string_slot_type(target_slot, nodetype)
+            if source_id not in source_uids:
+                source_uids[source_id] = node_to_id(source_id, from_partition.pid)
+            if target_id not in target_uids:
+                target_uids[target_id] = node_to_id(target_id, to_partition.pid)
+            source_gate_type = gate_names[(source_type, source_gate)]
+            target_slot_type = slot_names[(target_type, target_slot)]
+            source_uid = source_uids[source_id]
+            target_uid = target_uids[target_id]
+
+            linkuid = "%s:%s:%s:%s" % (source_uid, source_gate_type, target_slot_type, target_uid)
+            data[linkuid] = {
+                "uid": linkuid,
+                "weight": weight,
+                "certainty": 1,
+                "source_gate_name": source_gate_type,
+                "source_node_uid": source_uid,
+                "target_slot_name": target_slot_type,
+                "target_node_uid": target_uid
+            }
+
     def construct_native_modules_and_comments_dict(self):
         data = {}
         i = 0
@@ -1225,11 +1387,10 @@ class TheanoNodenet(Nodenet):
             if nodespace_to_uid not in partition_to.nodegroups or group_to not in partition_to.nodegroups[nodespace_to_uid]:
                 raise ValueError("Group %s does not exist in nodespace %s." % (group_to, nodespace_to_uid))
 
-            if partition_from.spid in partition_to.inlinks:
-                inlinks = partition_to.inlinks[partition_from.spid]
-                indices = np.where((inlinks[0].get_value(borrow=True) == partition_from.nodegroups[nodespace_from_uid][group_from]) &
-                                   (inlinks[1].get_value(borrow=True) == partition_to.nodegroups[nodespace_to_uid][group_to]))[0]
-                return inlinks[2].get_value(borrow=True)[indices]
+            return partition_to.get_inlink_weights(
+                partition_from.spid,
+                partition_from.nodegroups[nodespace_from_uid][group_from],
+                partition_to.nodegroups[nodespace_to_uid][group_to])
         else:
             return partition_from.get_link_weights(nodespace_from_uid, group_from, nodespace_to_uid, group_to)
 
@@ -3,7 +3,9 @@
 import json
 import os
 import copy
+import shutil
 import warnings
+import zlib
 
 import theano
 from theano import tensor as T
@@ -14,9 +16,61 @@ import theano.sparse as ST
 from theano.tensor import nnet as N
 
 from micropsi_core.nodenet.theano_engine.theano_definitions import *
+from micropsi_core.nodenet.theano_engine.theano_allocator import IdAllocator, RangeAllocator
+from micropsi_core.nodenet.theano_engine.theano_function_cache import function_cache
 
 from configuration import config as settings
 
+
+# the archive of the arrays that changed since the .npz archive of a partition was written, see save_npz
+CHANGES_SUFFIX = ".changes.npz"
+
+
+def deduplicate_links(from_elements, to_elements, weights):
+    """Returns the given links as arrays, keeping only the last link for each element pair"""
+    from_elements = np.asarray(from_elements, dtype=np.int32)
+    to_elements = np.asarray(to_elements, dtype=np.int32)
+    weights = np.asarray(weights, dtype=T.config.floatX)
+    if len(from_elements) == 0:
+        return from_elements, to_elements, weights
+    keys = to_elements.astype(np.int64) * (int(from_elements.max()) + 1) + from_elements
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = len(keys) - 1 - last
+    return from_elements[keep], to_elements[keep], weights[keep]
+
+
+def merge_sparse_weights(matrix, rows, cols, weights):
+    """Returns the given sparse matrix as csr, with the given entries set to the given weights, and zeros pruned"""
+    shape = matrix.shape
+    update = sp.csr_matrix((np.asarray(weights, dtype=matrix.dtype), (rows, cols)), shape=shape)
+    mask = sp.csr_matrix((np.ones(len(rows), dtype=matrix.dtype), (rows, cols)), shape=shape)
+    matrix = (matrix - matrix.multiply(mask) + update).tocsr()
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def get_growth(size, required):
+    """Returns by how much to grow vectors of the given size to fit the required number of additional entries.
+    Capacity at least doubles, so steady node creation only copies the vectors a logarithmic number of times."""
+    return max(int(required), int(size), 1)
+
+
+def grow_vector(vector, size, fill=0):
+    """Returns a copy of the given vector, grown to the given size with new entries set to fill"""
+    grown = np.empty(size, dtype=vector.dtype)
+    grown[:len(vector)] = vector
+    grown[len(vector):] = fill
+    return grown
+
+
+def array_checksum(array):
+    """ Returns a crc32 checksum over the contents of the given array """
+    array = np.ascontiguousarray(array)
+    if array.size == 0:
+        return 0
+    return zlib.crc32(array.data)
+
+
 class TheanoPartition():
 
     @property
@@ -27,6 +81,14 @@ class TheanoPartition():
     def rootnodespace_uid(self):
         return "s%s1" % self.spid
 
+    @property
+    def inlinks(self):
+        """The links from other partitions by their spid, as tuples of the shared from elements, to elements
+        and weights, and the compiled propagation function. Pending link changes are merged first."""
+        if self.__pending_inlinks:
+            self.merge_pending_inlinks()
+        return self.__inlinks
+
     @property
     def has_new_usages(self):
         return self.__has_new_usages
@@ -165,6 +227,9 @@ class TheanoPartition():
         # logger used by this partition
         self.logger = nodenet.logger
 
+        # datafile name and per-array checksums of the last npz save, to skip saving unchanged partitions
+        self.__saved_checksums = None
+
         # array, index is node id, value is numeric node type
         self.allocated_nodes = None
 
@@ -219,6 +284,10 @@ class TheanoPartition():
                                              # but for now, we manually track this property
         self.n_node_retlinked = None         # same for ret
 
+        self.__por_decay_entries = None      # positions of the links from pipe por gates in the data of a sparse w,
+                                             # or the por gate columns of a dense w. Reset on link changes.
+        self.__por_decay_indices = None      # the w.indices array the entries were computed for
+
         # instantiate numpy data structures
         self.allocated_nodes = np.zeros(self.NoN, dtype=np.int32)
         self.allocated_node_offsets = np.zeros(self.NoN, dtype=np.int32)
@@ -236,7 +305,8 @@ class TheanoPartition():
 
         self.allocated_elements_to_activators = np.zeros(self.NoE, dtype=np.int32)
 
-        self.inlinks = {}
+        self.__inlinks = {}
+        self.__pending_inlinks = {}
 
         # instantiate theano data structures
         if self.sparse:
@@ -303,28 +373,50 @@ class TheanoPartition():
         self.__has_gatefunction_one_over_x = False
         self.por_ret_dirty = True
 
-        self.last_allocated_node = 0
-        self.last_allocated_offset = 0
-        self.last_allocated_nodespace = 0
+        self.node_id_allocator = IdAllocator(reserved=1)
+        self.element_allocator = RangeAllocator(reserved=1)
+        # nodespace 1 is the partition's root nodespace. Its parent is 0, so its entry looks free,
+        # it is always created with its explicit ID
+        self.nodespace_id_allocator = IdAllocator(reserved=2)
 
         self.compile_propagate()
 
     def compile_propagate(self):
+        self.propagate = function_cache.get(
+            (self.sparse,),
+            dict(w=self.w, a=self.a, a_in=self.a_in),
+            self.build_propagate)
+
+    def build_propagate(self, v):
         if self.sparse:
-            self.propagate = theano.function([], None, updates=[(self.a, self.a_in + ST.dot(self.w, self.a)),
-                                                                          (self.a_in, T.zeros_like(self.a_in))])
+            return theano.function([], None, updates=[(v.a, v.a_in + ST.dot(v.w, v.a)),
+                                                      (v.a_in, T.zeros_like(v.a_in))])
         else:
-            self.propagate = theano.function([], None, updates=[(self.a, self.a_in + T.dot(self.w, self.a)),
-                                                                          (self.a_in, T.zeros_like(self.a_in))])
+            return theano.function([], None, updates=[(v.a, v.a_in + T.dot(v.w, v.a)),
+                                                      (v.a_in, T.zeros_like(v.a_in))])
 
     def compile_calculate_nodes(self):
-        slots = self.a_shifted
-        countdown = self.g_countdown
-        por_linked = self.n_node_porlinked
-        ret_linked = self.n_node_retlinked
+        flags = (
+            self.has_pipes,
+            self.has_directional_activators,
+            self.has_gatefunction_absolute,
+            self.has_gatefunction_sigmoid,
+            self.has_gatefunction_tanh,
+            self.has_gatefunction_rect,
+            self.has_gatefunction_one_over_x)
+        variables = dict((name, getattr(self, name)) for name in (
+            'a', 'a_shifted', 'g_countdown', 'g_wait', 'g_expect', 'g_factor', 'g_function_selector', 'g_theta',
+            'g_threshold', 'g_amplification', 'g_min', 'g_max', 'n_function_selector', 'n_node_porlinked', 'n_node_retlinked'))
+        self.calculate_nodes = function_cache.get(flags, variables, self.build_calculate_nodes)
+
+    def build_calculate_nodes(self, v):
+        slots = v.a_shifted
+        countdown = v.g_countdown
+        por_linked = v.n_node_porlinked
+        ret_linked = v.n_node_retlinked
 
         # node functions implemented with identity by default (native modules are calculated by python)
-        nodefunctions = self.a
+        nodefunctions = v.a
 
         # pipe logic
 
@@ -354,7 +446,7 @@ class TheanoPartition():
                                                                                     # reset if no sub, or por-linked but 0
         cdrc_por = T.le(slots[:, 9], 0) + (T.eq(por_linked, 1) * T.le(slots[:, 7], 0))
                                                                                     # count down failure countdown
-        countdown_por = T.switch(cdrc_por, self.g_wait, T.maximum(countdown - 1, -1))
+        countdown_por = T.switch(cdrc_por, v.g_wait, T.maximum(countdown - 1, -1))
 
         pipe_por_cond = T.switch(T.eq(por_linked, 1), T.gt(slots[:, 7], 0), 1)      # (if linked, por must be > 0)
         pipe_por_cond = pipe_por_cond * T.gt(slots[:, 9], 0)                        # and (sub > 0)
@@ -362,12 +454,12 @@ class TheanoPartition():
         pipe_por = slots[:, 10]                                                     # start with sur
         pipe_por = pipe_por + T.gt(slots[:, 6], 0.1)                                # add gen-loop 1 if por > 0
                                                                                     # check if we're in timeout
-        pipe_por = T.switch(T.le(countdown, 0) * T.lt(pipe_por, self.g_expect), -1, pipe_por)
+        pipe_por = T.switch(T.le(countdown, 0) * T.lt(pipe_por, v.g_expect), -1, pipe_por)
         pipe_por = pipe_por * pipe_por_cond                                         # apply conditions
                                                                                     # add por (for search) if sub=sur=0
         pipe_por = pipe_por + (slots[:, 7] * T.eq(slots[:, 9], 0) * T.eq(slots[:, 10], 0))
                                                                                     # reset failure countdown on confirm
-        countdown_por = T.switch(T.ge(pipe_por, self.g_expect), self.g_wait, countdown_por)
+        countdown_por = T.switch(T.ge(pipe_por, v.g_expect), v.g_wait, countdown_por)
 
         ### ret plumbing
         pipe_ret = -slots[:, 8] * T.ge(slots[:, 6], 0)                              # start with -sub if por >= 0
@@ -387,7 +479,7 @@ class TheanoPartition():
                                                                                     # reset if no sub, or por-linked but 0
         cd_reset_cond = T.le(slots[:, 6],0) + (T.eq(por_linked, 1) * T.le(slots[:, 4], 0))
                                                                                     # count down failure countdown
-        countdown_sur = T.switch(cd_reset_cond, self.g_wait, T.maximum(countdown - 1, -1))
+        countdown_sur = T.switch(cd_reset_cond, v.g_wait, T.maximum(countdown - 1, -1))
 
         pipe_sur_cond = T.eq(ret_linked, 0)                                         # (not ret-linked
         pipe_sur_cond = pipe_sur_cond + (T.ge(slots[:, 5],0) * T.gt(slots[:, 6], 0))# or (ret is 0, but sub > 0))
@@ -398,11 +490,11 @@ class TheanoPartition():
         pipe_sur = pipe_sur + T.gt(slots[:, 3], 0.2)                                # add gen-loop 1
         pipe_sur = pipe_sur + slots[:, 9]                                           # add exp
                                                                                     # drop to zero if < expectation
-        pipe_sur = T.switch(T.lt(pipe_sur, self.g_expect) * T.gt(pipe_sur, 0), 0, pipe_sur)
+        pipe_sur = T.switch(T.lt(pipe_sur, v.g_expect) * T.gt(pipe_sur, 0), 0, pipe_sur)
                                                                                     # check if we're in timeout
-        pipe_sur = T.switch(T.le(countdown, 0) * T.lt(pipe_sur, self.g_expect), -1, pipe_sur)
+        pipe_sur = T.switch(T.le(countdown, 0) * T.lt(pipe_sur, v.g_expect), -1, pipe_sur)
                                                                                     # reset failure countdown on confirm
-        countdown_sur = T.switch(T.ge(pipe_sur, self.g_expect), self.g_wait, countdown_sur)
+        countdown_sur = T.switch(T.ge(pipe_sur, v.g_expect), v.g_wait, countdown_sur)
         pipe_sur = pipe_sur * pipe_sur_cond                                         # apply conditions
 
         ### cat plumbing
@@ -421,60 +513,64 @@ class TheanoPartition():
         pipe_exp = pipe_exp + slots[:, 7]                                           # add exp
 
         if self.has_pipes:
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_GEN), pipe_gen, nodefunctions)
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_POR), pipe_por, nodefunctions)
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_RET), pipe_ret, nodefunctions)
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_SUB), pipe_sub, nodefunctions)
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_SUR), pipe_sur, nodefunctions)
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_CAT), pipe_cat, nodefunctions)
-            nodefunctions = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_EXP), pipe_exp, nodefunctions)
-            countdown = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_POR), countdown_por, countdown)
-            countdown = T.switch(T.eq(self.n_function_selector, NFPG_PIPE_SUR), countdown_sur, countdown)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_GEN), pipe_gen, nodefunctions)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_POR), pipe_por, nodefunctions)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_RET), pipe_ret, nodefunctions)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_SUB), pipe_sub, nodefunctions)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_SUR), pipe_sur, nodefunctions)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_CAT), pipe_cat, nodefunctions)
+            nodefunctions = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_EXP), pipe_exp, nodefunctions)
+            countdown = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_POR), countdown_por, countdown)
+            countdown = T.switch(T.eq(v.n_function_selector, NFPG_PIPE_SUR), countdown_sur, countdown)
 
         # gate logic
 
         # multiply with gate factor for the node space
         if self.has_directional_activators:
-            nodefunctions = nodefunctions * self.g_factor
+            nodefunctions = nodefunctions * v.g_factor
 
         # apply actual gate functions
         gate_function_output = nodefunctions
 
         # apply GATE_FUNCTION_ABS to masked gates
         if self.has_gatefunction_absolute:
-            gate_function_output = T.switch(T.eq(self.g_function_selector, GATE_FUNCTION_ABSOLUTE), abs(gate_function_output), gate_function_output)
+            gate_function_output = T.switch(T.eq(v.g_function_selector, GATE_FUNCTION_ABSOLUTE), abs(gate_function_output), gate_function_output)
         # apply GATE_FUNCTION_SIGMOID to masked gates
         if self.has_gatefunction_sigmoid:
-            gate_function_output = T.switch(T.eq(self.g_function_selector, GATE_FUNCTION_SIGMOID), N.sigmoid(gate_function_output + self.g_theta), gate_function_output)
+            gate_function_output = T.switch(T.eq(v.g_function_selector, GATE_FUNCTION_SIGMOID), N.sigmoid(gate_function_output + v.g_theta), gate_function_output)
         # apply GATE_FUNCTION_TANH to masked gates
         if self.has_gatefunction_tanh:
-            gate_function_output = T.switch(T.eq(self.g_function_selector, GATE_FUNCTION_TANH), T.tanh(gate_function_output + self.g_theta), gate_function_output)
+            gate_function_output = T.switch(T.eq(v.g_function_selector, GATE_FUNCTION_TANH), T.tanh(gate_function_output + v.g_theta), gate_function_output)
         # apply GATE_FUNCTION_RECT to masked gates
         if self.has_gatefunction_rect:
-            gate_function_output = T.switch(T.eq(self.g_function_selector, GATE_FUNCTION_RECT), T.switch(gate_function_output + self.g_theta > 0, gate_function_output - self.g_theta, 0), gate_function_output)
+            gate_function_output = T.switch(T.eq(v.g_function_selector, GATE_FUNCTION_RECT), T.switch(gate_function_output + v.g_theta > 0, gate_function_output - v.g_theta, 0), gate_function_output)
         # apply GATE_FUNCTION_DIST to masked gates
         if self.has_gatefunction_one_over_x:
-            gate_function_output = T.switch(T.eq(self.g_function_selector, GATE_FUNCTION_DIST), T.switch(T.neq(0, gate_function_output), 1 / gate_function_output, 0), gate_function_output)
+            gate_function_output = T.switch(T.eq(v.g_function_selector, GATE_FUNCTION_DIST), T.switch(T.neq(0, gate_function_output), 1 / gate_function_output, 0), gate_function_output)
 
         # apply threshold
         thresholded_gate_function_output = \
-            T.switch(T.ge(gate_function_output, self.g_threshold), gate_function_output, 0)
+            T.switch(T.ge(gate_function_output, v.g_threshold), gate_function_output, 0)
 
         # apply amplification
-        amplified_gate_function_output = thresholded_gate_function_output * self.g_amplification
+        amplified_gate_function_output = thresholded_gate_function_output * v.g_amplification
 
         # apply minimum and maximum
-        limited_gate_function_output = T.clip(amplified_gate_function_output, self.g_min, self.g_max)
+        limited_gate_function_output = T.clip(amplified_gate_function_output, v.g_min, v.g_max)
 
         gatefunctions = limited_gate_function_output
 
         # put the theano graph into a callable function to be executed
-        self.calculate_nodes = theano.function([], None, updates=[(self.a, gatefunctions), (self.g_countdown, countdown)])
+        return theano.function([], None, updates=[(v.a, gatefunctions), (v.g_countdown, countdown)])
 
     def get_compiled_propagate_inlinks(self, from_partition, from_elements, to_elements, weights):
-        propagated_a = T.dot(weights, from_partition.a[from_elements])
-        a_in = T.inc_subtensor(self.a_in[to_elements], propagated_a, inplace=True, tolerate_inplace_aliasing=True)
-        return theano.function([], None, updates=[(self.a_in, a_in)], accept_inplace=True)
+        variables = dict(from_a=from_partition.a, a_in=self.a_in, from_elements=from_elements, to_elements=to_elements, weights=weights)
+        return function_cache.get((), variables, self.build_propagate_inlinks)
+
+    def build_propagate_inlinks(self, v):
+        propagated_a = ST.dot(v.weights, v.from_a[v.from_elements])
+        a_in = T.inc_subtensor(v.a_in[v.to_elements], propagated_a, inplace=True, tolerate_inplace_aliasing=True)
+        return theano.function([], None, updates=[(v.a_in, a_in)], accept_inplace=True)
 
     def calculate(self):
         if self.has_new_usages:
@@ -496,34 +592,59 @@ class TheanoPartition():
         self.__calculate_native_modules()
 
     def por_ret_decay(self):
-
-        #    por_cols = T.lvector("por_cols")
-        #    por_rows = T.lvector("por_rows")
-        #    new_w = T.set_subtensor(nodenet.w[por_rows, por_cols], nodenet.w[por_rows, por_cols] - 0.0001)
-        #    self.decay = theano.function([por_cols, por_rows], None, updates={nodenet.w: new_w}, accept_inplace=True)
-
         porretdecay = self.nodenet.get_modulator('por_ret_decay')
         if self.has_pipes and porretdecay != 0:
-            n_function_selector = self.n_function_selector.get_value(borrow=True)
             w = self.w.get_value(borrow=True)
-            por_cols = np.where(n_function_selector == NFPG_PIPE_POR)[0]
-            por_rows = np.nonzero(w[:, por_cols] > 0.)[0]
-            cols, rows = np.meshgrid(por_cols, por_rows)
-            w_update = w[rows, cols]
-            w_update *= (1 - porretdecay)
-            if self.nodenet.current_step % 1000 == 0:
-                nullify_grid = np.nonzero(w_update < porretdecay**2)
-                w_update[nullify_grid] = 0
-            w[rows, cols] = w_update
+            entries = self.__get_por_decay_entries(w)
+            nullify = self.nodenet.current_step % 1000 == 0
+            if self.sparse:
+                # decay the positive por links in place, in the data array of the csr matrix
+                values = w.data[entries]
+                positive = values > 0
+                values[positive] *= (1 - porretdecay)
+                w.data[entries] = values
+                if nullify:
+                    nullified = entries[positive & (values < porretdecay**2)]
+                    if len(nullified):
+                        w.data[nullified] = 0
+                        w.eliminate_zeros()
+                        self.__por_decay_entries = None
+                        self.por_ret_dirty = True
+            else:
+                values = w[:, entries]
+                positive = values > 0
+                values[positive] *= (1 - porretdecay)
+                if nullify:
+                    nullified = positive & (values < porretdecay**2)
+                    if nullified.any():
+                        values[nullified] = 0
+                        self.por_ret_dirty = True
+                w[:, entries] = values
             self.w.set_value(w, borrow=True)
 
+    def __get_por_decay_entries(self, w):
+        if self.__por_decay_entries is None or (self.sparse and w.indices is not self.__por_decay_indices):
+            n_function_selector = self.n_function_selector.get_value(borrow=True)
+            if self.sparse:
+                por_columns = n_function_selector == NFPG_PIPE_POR
+                self.__por_decay_entries = np.nonzero(por_columns[w.indices])[0]
+                self.__por_decay_indices = w.indices
+            else:
+                self.__por_decay_entries = np.nonzero(n_function_selector == NFPG_PIPE_POR)[0]
+        return self.__por_decay_entries
+
     def __take_native_module_slot_snapshots(self):
         for uid, instance in self.native_module_instances.items():
             instance.take_slot_activation_snapshot()
 
     def __calculate_native_modules(self):
+        profiler = self.nodenet.profiler
         for uid, instance in self.native_module_instances.items():
-            instance.node_function()
+            if not profiler.enabled:
+                instance.node_function()
+                continue
+            with profiler.timed("native module %s", instance.type):
+                instance.node_function()
 
     def __calculate_g_factors(self):
         a = self.a.get_value(borrow=True)
@@ -597,19 +718,15 @@ class TheanoPartition():
 
         new_NoN = int(self.NoN + growby)
 
-        new_allocated_nodes = np.zeros(new_NoN, dtype=np.int32)
-        new_allocated_node_parents = np.zeros(new_NoN, dtype=np.int32)
-        new_allocated_node_offsets = np.zeros(new_NoN, dtype=np.int32)
+        new_allocated_nodes = grow_vector(self.allocated_nodes, new_NoN)
+        new_allocated_node_parents = grow_vector(self.allocated_node_parents, new_NoN)
+        new_allocated_node_offsets = grow_vector(self.allocated_node_offsets, new_NoN)
 
-        new_allocated_nodes[0:self.NoN] = self.allocated_nodes
-        new_allocated_node_parents[0:self.NoN] = self.allocated_node_parents
-        new_allocated_node_offsets[0:self.NoN] = self.allocated_node_offsets
-
-        self.NoN = new_NoN
-        self.allocated_nodes = new_allocated_nodes
-        self.allocated_node_parents = new_allocated_node_parents
-        self.allocated_node_offsets = new_allocated_node_offsets
-        self.has_new_usages = True
+        with self.nodenet.netlock:
+            self.NoN = new_NoN
+            self.allocated_nodes = new_allocated_nodes
+            self.allocated_node_parents = new_allocated_node_parents
+            self.allocated_node_offsets = new_allocated_node_offsets
 
     def save(self, datafilename):
 
@@ -650,83 +767,210 @@ class TheanoPartition():
 
         inlink_from_element_count = 0
         inlink_to_element_count = 0
+        inlink_link_count = 0
         for spid, inlinks in self.inlinks.items():
             inlink_from_element_count += len(inlinks[0].get_value(borrow=True))
             inlink_to_element_count += len(inlinks[1].get_value(borrow=True))
+            inlink_link_count += inlinks[2].get_value(borrow=True).nnz
         inlinks_pids = np.zeros(len(self.inlinks), dtype=np.int16)
         inlink_from_lengths = np.zeros(len(self.inlinks), dtype=np.int32)
         inlink_to_lengths = np.zeros(len(self.inlinks), dtype=np.int32)
+        inlink_link_counts = np.zeros(len(self.inlinks), dtype=np.int32)
         inlink_from_elements = np.zeros(inlink_from_element_count, dtype=np.int32)
         inlink_to_elements = np.zeros(inlink_to_element_count, dtype=np.int32)
-        inlink_weights = np.zeros(inlink_from_element_count*inlink_to_element_count, dtype=self.nodenet.numpyfloatX)
+        inlink_rows = np.zeros(inlink_link_count, dtype=np.int32)
+        inlink_cols = np.zeros(inlink_link_count, dtype=np.int32)
+        inlink_data = np.zeros(inlink_link_count, dtype=self.nodenet.numpyfloatX)
 
         from_offset = 0
         to_offset = 0
+        link_offset = 0
         for i, spid in enumerate(self.inlinks.keys()):
             inlinks_pids[i] = int(spid)
             from_elements = self.inlinks[spid][0].get_value(borrow=True)
             to_elements = self.inlinks[spid][1].get_value(borrow=True)
-            weights = self.inlinks[spid][2].get_value(borrow=True)
+            weights = self.inlinks[spid][2].get_value(borrow=True).tocoo()
             from_length = len(from_elements)
             to_length = len(to_elements)
+            link_count = weights.nnz
             inlink_from_lengths[i] = from_length
             inlink_to_lengths[i] = to_length
+            inlink_link_counts[i] = link_count
             inlink_from_elements[from_offset:from_offset+from_length] = from_elements
             inlink_to_elements[to_offset:to_offset+to_length] = to_elements
-            inlink_weights[(from_offset*to_offset):((from_offset+from_length)*(to_offset+to_length))] = np.ravel(weights)
+            inlink_rows[link_offset:link_offset+link_count] = weights.row
+            inlink_cols[link_offset:link_offset+link_count] = weights.col
+            inlink_data[link_offset:link_offset+link_count] = weights.data
             from_offset += from_length
             to_offset += to_length
+            link_offset += link_count
+
+        arrays = dict(
+            allocated_nodes=allocated_nodes,
+            allocated_node_offsets=allocated_node_offsets,
+            allocated_elements_to_nodes=allocated_elements_to_nodes,
+            allocated_node_parents=allocated_node_parents,
+            allocated_nodespaces=allocated_nodespaces,
+            w_data=w.data,
+            w_indices=w.indices,
+            w_indptr=w.indptr,
+            a=a,
+            g_theta=g_theta,
+            g_factor=g_factor,
+            g_threshold=g_threshold,
+            g_amplification=g_amplification,
+            g_min=g_min,
+            g_max=g_max,
+            g_function_selector=g_function_selector,
+            g_expect=g_expect,
+            g_countdown=g_countdown,
+            g_wait=g_wait,
+            n_function_selector=n_function_selector,
+            sizeinformation=sizeinformation,
+            allocated_elements_to_activators=allocated_elements_to_activators,
+            allocated_nodespaces_por_activators=allocated_nodespaces_por_activators,
+            allocated_nodespaces_ret_activators=allocated_nodespaces_ret_activators,
+            allocated_nodespaces_sub_activators=allocated_nodespaces_sub_activators,
+            allocated_nodespaces_sur_activators=allocated_nodespaces_sur_activators,
+            allocated_nodespaces_cat_activators=allocated_nodespaces_cat_activators,
+            allocated_nodespaces_exp_activators=allocated_nodespaces_exp_activators,
+            inlink_pids=inlinks_pids,
+            inlink_from_lengths=inlink_from_lengths,
+            inlink_to_lengths=inlink_to_lengths,
+            inlink_from_elements=inlink_from_elements,
+            inlink_to_elements=inlink_to_elements,
+            inlink_link_counts=inlink_link_counts,
+            inlink_rows=inlink_rows,
+            inlink_cols=inlink_cols,
+            inlink_data=inlink_data)
+
+        storage_format = "npz"
+        configured_storage_format = settings['theano'].get('storage_format', 'npz')
+        if configured_storage_format in ("npz", "npy"):
+            storage_format = configured_storage_format
+        else:
+            self.logger.warn("Unsupported storage_format value from configuration: %s, falling back to npz", configured_storage_format)
 
-        np.savez(datafilename,
-                 allocated_nodes=allocated_nodes,
-                 allocated_node_offsets=allocated_node_offsets,
-                 allocated_elements_to_nodes=allocated_elements_to_nodes,
-                 allocated_node_parents=allocated_node_parents,
-                 allocated_nodespaces=allocated_nodespaces,
-                 w_data=w.data,
-                 w_indices=w.indices,
-                 w_indptr=w.indptr,
-                 a=a,
-                 g_theta=g_theta,
-                 g_factor=g_factor,
-                 g_threshold=g_threshold,
-                 g_amplification=g_amplification,
-                 g_min=g_min,
-                 g_max=g_max,
-                 g_function_selector=g_function_selector,
-                 g_expect=g_expect,
-                 g_countdown=g_countdown,
-                 g_wait=g_wait,
-                 n_function_selector=n_function_selector,
-                 sizeinformation=sizeinformation,
-                 allocated_elements_to_activators=allocated_elements_to_activators,
-                 allocated_nodespaces_por_activators=allocated_nodespaces_por_activators,
-                 allocated_nodespaces_ret_activators=allocated_nodespaces_ret_activators,
-                 allocated_nodespaces_sub_activators=allocated_nodespaces_sub_activators,
-                 allocated_nodespaces_sur_activators=allocated_nodespaces_sur_activators,
-                 allocated_nodespaces_cat_activators=allocated_nodespaces_cat_activators,
-                 allocated_nodespaces_exp_activators=allocated_nodespaces_exp_activators,
-                 inlink_pids=inlinks_pids,
-                 inlink_from_lengths=inlink_from_lengths,
-                 inlink_to_lengths=inlink_to_lengths,
-                 inlink_from_elements=inlink_from_elements,
-                 inlink_to_elements=inlink_to_elements,
-                 inlink_weights=inlink_weights)
+        if storage_format == "npy":
+            self.save_npy_directory(datafilename, arrays)
+            for filename in (datafilename + ".npz", datafilename + CHANGES_SUFFIX):
+                if os.path.isfile(filename):
+                    os.remove(filename)
+        else:
+            self.save_npz(datafilename, arrays)
+            if os.path.isdir(datafilename):
+                shutil.rmtree(datafilename)
+
+    def save_npz(self, datafilename, arrays):
+        """
+        Writes the given arrays into an .npz archive. Once the archive exists, only the arrays that differ from it
+        (according to their checksums) are written, into a second, smaller archive next to it. The archive is
+        rewritten when the changed arrays make up more than half of the data.
+        """
+        checksums = dict((name, array_checksum(array)) for name, array in arrays.items())
+        changesfilename = datafilename + CHANGES_SUFFIX
+        saved = None
+        if self.__saved_checksums is not None and self.__saved_checksums[0] == datafilename and os.path.isfile(datafilename + ".npz"):
+            saved = self.__saved_checksums[1]
+        if saved is not None:
+            changed = [name for name in arrays if saved.get(name) != checksums[name]]
+            if not changed:
+                if os.path.isfile(changesfilename):
+                    os.remove(changesfilename)
+                return
+            changed_size = sum(np.asarray(arrays[name]).nbytes for name in changed)
+            if set(changed) <= set(saved) and changed_size * 2 <= sum(np.asarray(array).nbytes for array in arrays.values()):
+                with open(changesfilename + ".tmp", 'wb') as fp:
+                    np.savez(fp, **dict((name, arrays[name]) for name in changed))
+                os.replace(changesfilename + ".tmp", changesfilename)
+                return
+        np.savez(datafilename, **arrays)
+        if os.path.isfile(changesfilename):
+            os.remove(changesfilename)
+        self.__saved_checksums = (datafilename, checksums)
+
+    def save_npy_directory(self, directory, arrays):
+        """
+        Writes the given arrays as one uncompressed .npy file each into the given directory, along with a
+        manifest. Arrays that did not change since the last save (according to the manifest) are not rewritten.
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifestfilename = os.path.join(directory, "manifest.json")
+
+        previous = {}
+        if os.path.isfile(manifestfilename):
+            try:
+                with open(manifestfilename) as fp:
+                    previous = json.load(fp).get('arrays', {})
+            except ValueError:
+                self.logger.warn("Could not read partition manifest %s, rewriting all arrays", manifestfilename)
+
+        manifest = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            entry = {
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'crc32': array_checksum(array)
+            }
+            arrayfilename = os.path.join(directory, name + ".npy")
+            if previous.get(name) != entry or not os.path.isfile(arrayfilename):
+                # write next to the old file and swap, the old one may still be memory-mapped
+                with open(arrayfilename + ".tmp", 'wb') as fp:
+                    np.save(fp, array)
+                os.replace(arrayfilename + ".tmp", arrayfilename)
+            manifest[name] = entry
+
+        with open(manifestfilename + ".tmp", 'w') as fp:
+            fp.write(json.dumps({'version': 1, 'arrays': manifest}, sort_keys=True, indent=4))
+        os.replace(manifestfilename + ".tmp", manifestfilename)
+
+    def load_npy_directory(self, directory):
+        """
+        Returns a dict of copy-on-write memory maps of all arrays listed in the manifest of the given directory,
+        or None if the directory could not be read.
+        """
+        manifestfilename = os.path.join(directory, "manifest.json")
+        try:
+            with open(manifestfilename) as fp:
+                manifest = json.load(fp)
+            arrays = {}
+            for name in manifest['arrays']:
+                arrays[name] = np.load(os.path.join(directory, name + ".npy"), mmap_mode='c')
+            return arrays
+        except (ValueError, KeyError):
+            warnings.warn("Could not read nodenet data from directory %s" % directory)
+        except IOError:
+            warnings.warn("Could not open nodenet data directory %s" % directory)
+        return None
 
     def load(self, datafilename, nodes_data):
         """Load the node net from a file"""
         # try to access file
 
         datafile = None
-        if os.path.isfile(datafilename):
+        if os.path.isdir(datafilename):
+            self.logger.info("Loading nodenet %s partition %i bulk data from directory %s" % (self.nodenet.name, self.pid, datafilename))
+            datafile = self.load_npy_directory(datafilename)
+            if datafile is None:
+                return False
+        elif os.path.isfile(datafilename + ".npz"):
+            changesfilename = datafilename + CHANGES_SUFFIX
+            basename = datafilename
+            datafilename += ".npz"
             try:
                 self.logger.info("Loading nodenet %s partition %i bulk data from file %s" % (self.nodenet.name, self.pid, datafilename))
-                datafile = np.load(datafilename)
+                archive = np.load(datafilename)
+                datafile = dict((name, archive[name]) for name in archive.files)
+                self.__saved_checksums = (basename, dict((name, array_checksum(array)) for name, array in datafile.items()))
+                if os.path.isfile(changesfilename):
+                    changes = np.load(changesfilename)
+                    datafile.update((name, changes[name]) for name in changes.files)
             except ValueError:
-                warnings.warn("Could not read nodenet data from file %s" % datafile)
+                warnings.warn("Could not read nodenet data from file %s" % datafilename)
                 return False
             except IOError:
-                warnings.warn("Could not open nodenet file %s" % datafile)
+                warnings.warn("Could not open nodenet file %s" % datafilename)
                 return False
 
         if not datafile:
@@ -805,72 +1049,101 @@ class TheanoPartition():
             # if we're configured to be dense, convert from csr
             if not self.sparse:
                 w = w.todense()
-            self.w = theano.shared(value=w.astype(T.config.floatX), name="w", borrow=False)
-            self.a = theano.shared(value=datafile['a'].astype(T.config.floatX), name="a", borrow=False)
+            self.w = theano.shared(value=w.astype(T.config.floatX), name="w", borrow=True)
+            self.__por_decay_entries = None
+            self.a = theano.shared(value=datafile['a'].astype(T.config.floatX, copy=False), name="a", borrow=True)
         else:
             self.logger.warn("no w_data, w_indices or w_indptr in file, falling back to defaults")
 
         if 'g_theta' in datafile:
-            self.g_theta = theano.shared(value=datafile['g_theta'].astype(T.config.floatX), name="theta", borrow=False)
+            self.g_theta = theano.shared(value=datafile['g_theta'].astype(T.config.floatX, copy=False), name="theta", borrow=True)
         else:
             self.logger.warn("no g_theta in file, falling back to defaults")
 
         if 'g_factor' in datafile:
-            self.g_factor = theano.shared(value=datafile['g_factor'].astype(T.config.floatX), name="g_factor", borrow=False)
+            self.g_factor = theano.shared(value=datafile['g_factor'].astype(T.config.floatX, copy=False), name="g_factor", borrow=True)
         else:
             self.logger.warn("no g_factor in file, falling back to defaults")
 
         if 'g_threshold' in datafile:
-            self.g_threshold = theano.shared(value=datafile['g_threshold'].astype(T.config.floatX), name="g_threshold", borrow=False)
+            self.g_threshold = theano.shared(value=datafile['g_threshold'].astype(T.config.floatX, copy=False), name="g_threshold", borrow=True)
         else:
             self.logger.warn("no g_threshold in file, falling back to defaults")
 
         if 'g_amplification' in datafile:
-            self.g_amplification = theano.shared(value=datafile['g_amplification'].astype(T.config.floatX), name="g_amplification", borrow=False)
+            self.g_amplification = theano.shared(value=datafile['g_amplification'].astype(T.config.floatX, copy=False), name="g_amplification", borrow=True)
         else:
             self.logger.warn("no g_amplification in file, falling back to defaults")
 
         if 'g_min' in datafile:
-            self.g_min = theano.shared(value=datafile['g_min'].astype(T.config.floatX), name="g_min", borrow=False)
+            self.g_min = theano.shared(value=datafile['g_min'].astype(T.config.floatX, copy=False), name="g_min", borrow=True)
         else:
             self.logger.warn("no g_min in file, falling back to defaults")
 
         if 'g_max' in datafile:
-            self.g_max = theano.shared(value=datafile['g_max'].astype(T.config.floatX), name="g_max", borrow=False)
+            self.g_max = theano.shared(value=datafile['g_max'].astype(T.config.floatX, copy=False), name="g_max", borrow=True)
         else:
             self.logger.warn("no g_max in file, falling back to defaults")
 
         if 'g_function_selector' in datafile:
-            self.g_function_selector = theano.shared(value=datafile['g_function_selector'], name="gatefunction", borrow=False)
+            self.g_function_selector = theano.shared(value=datafile['g_function_selector'], name="gatefunction", borrow=True)
         else:
             self.logger.warn("no g_function_selector in file, falling back to defaults")
 
         if 'g_expect' in datafile:
-            self.g_expect = theano.shared(value=datafile['g_expect'], name="expectation", borrow=False)
+            self.g_expect = theano.shared(value=datafile['g_expect'], name="expectation", borrow=True)
         else:
             self.logger.warn("no g_expect in file, falling back to defaults")
 
         if 'g_countdown' in datafile:
-            self.g_countdown = theano.shared(value=datafile['g_countdown'], name="countdown", borrow=False)
+            self.g_countdown = theano.shared(value=datafile['g_countdown'], name="countdown", borrow=True)
         else:
             self.logger.warn("no g_countdown in file, falling back to defaults")
 
         if 'g_wait' in datafile:
-            self.g_wait = theano.shared(value=datafile['g_wait'], name="wait", borrow=False)
+            self.g_wait = theano.shared(value=datafile['g_wait'], name="wait", borrow=True)
         else:
             self.logger.warn("no g_wait in file, falling back to defaults")
 
         if 'n_function_selector' in datafile:
-            self.n_function_selector = theano.shared(value=datafile['n_function_selector'], name="nodefunction_per_gate", borrow=False)
+            self.n_function_selector = theano.shared(value=datafile['n_function_selector'], name="nodefunction_per_gate", borrow=True)
         else:
             self.logger.warn("no n_function_selector in file, falling back to defaults")
 
         if 'inlink_pids' in datafile and \
+            'inlink_from_lengths' in datafile and \
+            'inlink_to_lengths' in datafile and \
+            'inlink_from_elements' in datafile and \
+            'inlink_to_elements' in datafile and \
+            'inlink_link_counts' in datafile and \
+            'inlink_rows' in datafile and \
+            'inlink_cols' in datafile and \
+            'inlink_data' in datafile:
+
+            inlink_pids = datafile['inlink_pids']
+            inlink_from_elements = np.split(datafile['inlink_from_elements'], np.cumsum(datafile['inlink_from_lengths'])[:-1])
+            inlink_to_elements = np.split(datafile['inlink_to_elements'], np.cumsum(datafile['inlink_to_lengths'])[:-1])
+            link_offsets = np.cumsum(datafile['inlink_link_counts'])[:-1]
+            inlink_rows = np.split(datafile['inlink_rows'], link_offsets)
+            inlink_cols = np.split(datafile['inlink_cols'], link_offsets)
+            inlink_data = np.split(datafile['inlink_data'], link_offsets)
+
+            for i, pid in enumerate(inlink_pids):
+                from_elements = inlink_from_elements[i].astype(np.int32)
+                to_elements = inlink_to_elements[i].astype(np.int32)
+                self.set_inlink_weights_by_element(
+                    "%03i" % pid,
+                    from_elements[inlink_cols[i]],
+                    to_elements[inlink_rows[i]],
+                    inlink_data[i]
+                )
+        elif 'inlink_pids' in datafile and \
             'inlink_from_lengths' in datafile and \
             'inlink_to_lengths' in datafile and \
             'inlink_from_elements' in datafile and \
             'inlink_to_elements' in datafile and \
             'inlink_weights' in datafile:
+            # files from before inlinks were sparse store a dense weight matrix per partition
 
             inlink_pids = datafile['inlink_pids']
             inlink_from_lengths = datafile['inlink_from_lengths']
@@ -921,21 +1194,13 @@ class TheanoPartition():
 
         new_NoNS = int(self.NoNS + growby)
 
-        new_allocated_nodespaces = np.zeros(new_NoNS, dtype=np.int32)
-        new_allocated_nodespaces_por_activators = np.zeros(new_NoNS, dtype=np.int32)
-        new_allocated_nodespaces_ret_activators = np.zeros(new_NoNS, dtype=np.int32)
-        new_allocated_nodespaces_sub_activators = np.zeros(new_NoNS, dtype=np.int32)
-        new_allocated_nodespaces_sur_activators = np.zeros(new_NoNS, dtype=np.int32)
-        new_allocated_nodespaces_cat_activators = np.zeros(new_NoNS, dtype=np.int32)
-        new_allocated_nodespaces_exp_activators = np.zeros(new_NoNS, dtype=np.int32)
-
-        new_allocated_nodespaces[0:self.NoNS] = self.allocated_nodespaces
-        new_allocated_nodespaces_por_activators[0:self.NoNS] = self.allocated_nodespaces_por_activators
-        new_allocated_nodespaces_ret_activators[0:self.NoNS] = self.allocated_nodespaces_ret_activators
-        new_allocated_nodespaces_sub_activators[0:self.NoNS] = self.allocated_nodespaces_sub_activators
-        new_allocated_nodespaces_sur_activators[0:self.NoNS] = self.allocated_nodespaces_sur_activators
-        new_allocated_nodespaces_cat_activators[0:self.NoNS] = self.allocated_nodespaces_cat_activators
-        new_allocated_nodespaces_exp_activators[0:self.NoNS] = self.allocated_nodespaces_exp_activators
+        new_allocated_nodespaces = grow_vector(self.allocated_nodespaces, new_NoNS)
+        new_allocated_nodespaces_por_activators = grow_vector(self.allocated_nodespaces_por_activators, new_NoNS)
+        new_allocated_nodespaces_ret_activators = grow_vector(self.allocated_nodespaces_ret_activators, new_NoNS)
+        new_allocated_nodespaces_sub_activators = grow_vector(self.allocated_nodespaces_sub_activators, new_NoNS)
+        new_allocated_nodespaces_sur_activators = grow_vector(self.allocated_nodespaces_sur_activators, new_NoNS)
+        new_allocated_nodespaces_cat_activators = grow_vector(self.allocated_nodespaces_cat_activators, new_NoNS)
+        new_allocated_nodespaces_exp_activators = grow_vector(self.allocated_nodespaces_exp_activators, new_NoNS)
 
         with self.nodenet.netlock:
             self.NoNS = new_NoNS
@@ -946,53 +1211,42 @@ class TheanoPartition():
             self.allocated_nodespaces_sur_activators = new_allocated_nodespaces_sur_activators
             self.allocated_nodespaces_cat_activators = new_allocated_nodespaces_cat_activators
             self.allocated_nodespaces_exp_activators = new_allocated_nodespaces_exp_activators
-            self.has_new_usages = True
 
     def grow_number_of_elements(self, growby):
+        """
+        Grows all element vectors and w by the given number of elements.
+        The shared variables stay the same, so compiled functions keep working and nothing is recompiled.
+        """
 
         new_NoE = int(self.NoE + growby)
 
-        new_allocated_elements_to_nodes = np.zeros(new_NoE, dtype=np.int32)
-        new_allocated_elements_to_activators = np.zeros(new_NoE, dtype=np.int32)
+        new_allocated_elements_to_nodes = grow_vector(self.allocated_elements_to_nodes, new_NoE)
+        new_allocated_elements_to_activators = grow_vector(self.allocated_elements_to_activators, new_NoE)
 
+        w = self.w.get_value(borrow=True)
         if self.sparse:
-            new_w = sp.csr_matrix((new_NoE, new_NoE), dtype=self.nodenet.scipyfloatX)
+            # new rows and columns are empty, so the csr arrays can be reused, with only indptr extended
+            indptr = grow_vector(w.indptr, new_NoE + 1, w.indptr[-1])
+            new_w = sp.csr_matrix((w.data, w.indices, indptr), shape=(new_NoE, new_NoE), copy=False)
         else:
             new_w = np.zeros((new_NoE, new_NoE), dtype=self.nodenet.scipyfloatX)
+            new_w[0:self.NoE, 0:self.NoE] = w
 
-        new_a = np.zeros(new_NoE, dtype=self.nodenet.numpyfloatX)
+        new_a = grow_vector(self.a.get_value(borrow=True), new_NoE)
         new_a_shifted = np.lib.stride_tricks.as_strided(new_a, shape=(new_NoE, 7), strides=(self.nodenet.byte_per_float, self.nodenet.byte_per_float))
-        new_g_theta = np.zeros(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_factor = np.ones(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_threshold = np.zeros(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_amplification = np.ones(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_min = np.zeros(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_max = np.ones(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_function_selector = np.zeros(new_NoE, dtype=np.int8)
-        new_g_expect = np.ones(new_NoE, dtype=self.nodenet.numpyfloatX)
-        new_g_countdown = np.zeros(new_NoE, dtype=np.int16)
-        new_g_wait = np.ones(new_NoE, dtype=np.int16)
-        new_n_function_selector = np.zeros(new_NoE, dtype=np.int8)
-        new_n_node_porlinked = np.zeros(new_NoE, dtype=np.int8)
-        new_n_node_retlinked = np.zeros(new_NoE, dtype=np.int8)
-
-        new_allocated_elements_to_nodes[0:self.NoE] = self.allocated_elements_to_nodes
-        new_allocated_elements_to_activators[0:self.NoE] = self.allocated_elements_to_activators
-
-        new_w[0:self.NoE, 0:self.NoE] = self.w.get_value(borrow=True)
-
-        new_a[0:self.NoE] = self.a.get_value(borrow=True)
-        new_g_theta[0:self.NoE] = self.g_theta.get_value(borrow=True)
-        new_g_factor[0:self.NoE] = self.g_factor.get_value(borrow=True)
-        new_g_threshold[0:self.NoE] = self.g_threshold.get_value(borrow=True)
-        new_g_amplification[0:self.NoE] = self.g_amplification.get_value(borrow=True)
-        new_g_min[0:self.NoE] = self.g_min.get_value(borrow=True)
-        new_g_max[0:self.NoE] =  self.g_max.get_value(borrow=True)
-        new_g_function_selector[0:self.NoE] = self.g_function_selector.get_value(borrow=True)
-        new_g_expect[0:self.NoE] = self.g_expect.get_value(borrow=True)
-        new_g_countdown[0:self.NoE] = self.g_countdown.get_value(borrow=True)
-        new_g_wait[0:self.NoE] = self.g_wait.get_value(borrow=True)
-        new_n_function_selector[0:self.NoE] = self.n_function_selector.get_value(borrow=True)
+        new_g_theta = grow_vector(self.g_theta.get_value(borrow=True), new_NoE)
+        new_g_factor = grow_vector(self.g_factor.get_value(borrow=True), new_NoE, 1)
+        new_g_threshold = grow_vector(self.g_threshold.get_value(borrow=True), new_NoE)
+        new_g_amplification = grow_vector(self.g_amplification.get_value(borrow=True), new_NoE, 1)
+        new_g_min = grow_vector(self.g_min.get_value(borrow=True), new_NoE)
+        new_g_max = grow_vector(self.g_max.get_value(borrow=True), new_NoE, 1)
+        new_g_function_selector = grow_vector(self.g_function_selector.get_value(borrow=True), new_NoE)
+        new_g_expect = grow_vector(self.g_expect.get_value(borrow=True), new_NoE, 1)
+        new_g_countdown = grow_vector(self.g_countdown.get_value(borrow=True), new_NoE)
+        new_g_wait = grow_vector(self.g_wait.get_value(borrow=True), new_NoE, 1)
+        new_n_function_selector = grow_vector(self.n_function_selector.get_value(borrow=True), new_NoE)
+        new_n_node_porlinked = grow_vector(self.n_node_porlinked.get_value(borrow=True), new_NoE)
+        new_n_node_retlinked = grow_vector(self.n_node_retlinked.get_value(borrow=True), new_NoE)
 
         with self.nodenet.netlock:
             self.NoE = new_NoE
@@ -1014,10 +1268,6 @@ class TheanoPartition():
             self.n_function_selector.set_value(new_n_function_selector, borrow=True)
             self.n_node_porlinked.set_value(new_n_node_porlinked, borrow=True)
             self.n_node_retlinked.set_value(new_n_node_retlinked, borrow=True)
-            self.has_new_usages = True
-
-        if self.has_pipes:
-            self.por_ret_dirty = True
 
     def announce_nodes(self, number_of_nodes, average_elements_per_node):
 
@@ -1025,78 +1275,46 @@ class TheanoPartition():
         free_elements = self.NoE - np.count_nonzero(self.allocated_elements_to_nodes)
 
         if number_of_nodes > free_nodes:
-            gap = number_of_nodes - free_nodes
-            growby = gap + (gap // 3)
+            growby = get_growth(self.NoN, number_of_nodes - free_nodes)
             self.logger.info("Per announcement in partition %i, growing ID vectors by %d elements" % (self.pid, growby))
             self.grow_number_of_nodes(growby)
 
         number_of_elements = number_of_nodes*average_elements_per_node
         if number_of_elements > free_elements:
-            gap = number_of_elements - free_elements
-            growby = gap + (gap // 3)
+            growby = get_growth(self.NoE, number_of_elements - free_elements)
             self.logger.info("Per announcement in partition %i, growing elements vectors by %d elements" % (self.pid, growby))
-            self.grow_number_of_elements(gap + (gap //3))
+            self.grow_number_of_elements(growby)
 
     def create_node(self, nodetype, nodespace_id, id=None, parameters=None, gate_parameters=None, gate_functions=None):
+        self.__por_decay_entries = None
 
         # find a free ID / index in the allocated_nodes vector to hold the node type
         if id is None:
-            id = 0
-            for i in range((self.last_allocated_node + 1), self.NoN):
-                if self.allocated_nodes[i] == 0:
-                    id = i
-                    break
-
-            if id < 1:
-                for i in range(self.last_allocated_node - 1):
-                    if self.allocated_nodes[i] == 0:
-                        id = i
-                        break
-
-            if id < 1:
-                growby = self.NoN // 2
+            id = self.node_id_allocator.allocate(self.allocated_nodes)
+
+            if id is None:
+                growby = get_growth(self.NoN, 1)
                 self.logger.info("All %d node IDs in partition %i in use, growing id vectors by %d elements" % (self.NoN, self.pid, growby))
                 id = self.NoN
                 self.grow_number_of_nodes(growby)
 
         else:
             if id > self.NoN:
-                growby = id - (self.NoN - 2)
+                growby = get_growth(self.NoN, id - (self.NoN - 2))
                 self.logger.info("Requested ID larger than current size in partition %i, growing id vectors by %d elements" % (self.pid, growby))
                 self.grow_number_of_nodes(growby)
 
         # now find a range of free elements to be used by this node
         number_of_elements = get_elements_per_type(get_numerical_node_type(nodetype, self.nodenet.native_modules), self.nodenet.native_modules)
-        has_restarted_from_zero = False
-        offset = 0
-        i = self.last_allocated_offset + 1
-        while offset < 1:
-            freecount = 0
-            for j in range(0, number_of_elements):
-                if i+j < len(self.allocated_elements_to_nodes) and self.allocated_elements_to_nodes[i+j] == 0:
-                    freecount += 1
-                else:
-                    break
-            if freecount >= number_of_elements:
-                offset = i
-                break
-            else:
-                i += freecount+1
-
-            if i >= self.NoE:
-                if not has_restarted_from_zero:
-                    i = 0
-                    has_restarted_from_zero = True
-                else:
-                    growby = max(number_of_elements +1, self.NoE // 2)
-                    self.logger.info("All %d elements in use in partition %i, growing elements vectors by %d elements" % (self.NoE, self.pid, growby))
-                    offset = self.NoE
-                    self.grow_number_of_elements(growby)
+        offset = self.element_allocator.allocate(self.allocated_elements_to_nodes, number_of_elements)
+        if offset is None:
+            growby = get_growth(self.NoE, number_of_elements + 1)
+            self.logger.info("All %d elements in use in partition %i, growing elements vectors by %d elements" % (self.NoE, self.pid, growby))
+            offset = self.NoE
+            self.grow_number_of_elements(growby)
 
         uid = node_to_id(id, self.pid)
 
-        self.last_allocated_node = id
-        self.last_allocated_offset = offset
         self.allocated_nodes[id] = get_numerical_node_type(nodetype, self.nodenet.native_modules)
         self.allocated_node_parents[id] = nodespace_id
         self.allocated_node_offsets[id] = offset
@@ -1187,6 +1405,7 @@ class TheanoPartition():
         return id
 
     def delete_node(self, node_id):
+        self.__por_decay_entries = None
 
         type = self.allocated_nodes[node_id]
         offset = self.allocated_node_offsets[node_id]
@@ -1216,8 +1435,9 @@ class TheanoPartition():
             n_function_selector_array[offset + EXP] = NFPG_PIPE_NON
             self.n_function_selector.set_value(n_function_selector_array, borrow=True)
 
-        # hint at the free ID
-        self.last_allocated_node = node_id - 1
+        # hand the ID and elements back to the allocators
+        self.node_id_allocator.release(self.allocated_nodes, node_id)
+        self.element_allocator.release(self.allocated_elements_to_nodes, offset, get_elements_per_type(type, self.nodenet.native_modules))
 
         # remove the native module or comment instance if there should be one
         uid = node_to_id(node_id, self.pid)
@@ -1257,25 +1477,14 @@ class TheanoPartition():
 
         # find a free ID / index in the allocated_nodespaces vector to hold the nodespaces's parent
         if id is None:
-            id = 0
-            for i in range((self.last_allocated_nodespace + 1), self.NoNS):
-                if self.allocated_nodespaces[i] == 0:
-                    id = i
-                    break
-
-            if id < 1:
-                for i in range(self.last_allocated_nodespace - 1):
-                    if self.allocated_nodespaces[i] == 0:
-                        id = i
-                        break
-
-            if id < 1:
-                growby = self.NoNS // 2
+            id = self.nodespace_id_allocator.allocate(self.allocated_nodespaces)
+
+            if id is None:
+                growby = get_growth(self.NoNS, 1)
                 self.logger.info("All %d nodespace IDs in use in partition %i, growing nodespace ID vector by %d elements" % (self.NoNS, self.pid, growby))
                 id = self.NoNS
                 self.grow_number_of_nodespaces(growby)
 
-        self.last_allocated_nodespace = id
         self.allocated_nodespaces[id] = parent_id
         return id
 
@@ -1290,7 +1499,7 @@ class TheanoPartition():
 
         self.nodenet.clear_supplements(nodespace_to_id(nodespace_id, self.pid))
         self.allocated_nodespaces[nodespace_id] = 0
-        self.last_allocated_nodespace = nodespace_id
+        self.nodespace_id_allocator.release(self.allocated_nodespaces, nodespace_id)
 
     def set_node_gate_parameter(self, id, gate_type, parameter, value):
         numerical_node_type = self.allocated_nodes[id]
@@ -1362,6 +1571,7 @@ class TheanoPartition():
                                                       get_numerical_gate_type(gate_type)] = self.allocated_node_offsets[activator_id]
 
     def set_link_weight(self, source_node_id, gate_type, target_node_id, slot_type, weight=1):
+        self.__por_decay_entries = None
         source_nodetype = None
         target_nodetype = None
         if self.allocated_nodes[source_node_id] > MAX_STD_NODETYPE:
@@ -1409,6 +1619,36 @@ class TheanoPartition():
                     n_node_retlinked_array[self.allocated_node_offsets[target_node_id] + g] = 1
             self.n_node_retlinked.set_value(n_node_retlinked_array, borrow=True)
 
+    def set_link_weights_by_element(self, from_elements, to_elements, weights):
+        """
+        Sets the weights of the links from the given gate elements to the given slot elements at once.
+        Weights of 0 delete links, and for duplicate element pairs the last weight wins.
+        """
+        from_elements, to_elements, weights = deduplicate_links(from_elements, to_elements, weights)
+        self.__por_decay_entries = None
+
+        w_matrix = self.w.get_value(borrow=True)
+        if self.sparse:
+            w_matrix = merge_sparse_weights(w_matrix, to_elements, from_elements, weights)
+        else:
+            w_matrix[to_elements, from_elements] = weights
+        self.w.set_value(w_matrix, borrow=True)
+
+        # update the por/ret linked flags of all pipes with changed por or ret slots
+        n_function_selector_array = self.n_function_selector.get_value(borrow=True)
+        for selector, flags, first_gate in ((NFPG_PIPE_POR, self.n_node_porlinked, -1), (NFPG_PIPE_RET, self.n_node_retlinked, -2)):
+            rows = np.unique(to_elements[n_function_selector_array[to_elements] == selector])
+            if len(rows) == 0:
+                continue
+            if self.sparse:
+                linkedflags = (np.diff(w_matrix.indptr)[rows] > 0).astype(np.int8)
+            else:
+                linkedflags = np.any(w_matrix[rows, :], axis=1).astype(np.int8)
+            flags_array = flags.get_value(borrow=True)
+            for g in range(7):
+                flags_array[rows + first_gate + g] = linkedflags
+            flags.set_value(flags_array, borrow=True)
+
     def group_nodes_by_ids(self, nodespace_uid, ids, group_name, gatetype="gen"):
 
         if nodespace_uid not in self.nodegroups:
@@ -1465,6 +1705,7 @@ class TheanoPartition():
             return w_matrix[rows,cols]
 
     def set_link_weights(self, nodespace_from_uid, group_from, nodespace_to_uid, group_to, new_w):
+        self.__por_decay_entries = None
         if nodespace_from_uid not in self.nodegroups or group_from not in self.nodegroups[nodespace_from_uid]:
             raise ValueError("Group %s does not exist in nodespace %s." % (group_from, nodespace_from_uid))
         if nodespace_to_uid not in self.nodegroups or group_to not in self.nodegroups[nodespace_to_uid]:
@@ -1486,25 +1727,103 @@ class TheanoPartition():
             self.por_ret_dirty = True
 
     def set_inlink_weights(self, partition_from_spid, new_from_elements, new_to_elements, new_weights):
-        if partition_from_spid in self.inlinks:
-            theano_from_elements = self.inlinks[partition_from_spid][0]
-            theano_to_elements = self.inlinks[partition_from_spid][1]
-            theano_weights = self.inlinks[partition_from_spid][2]
-            old_from_elements = theano_from_elements.get_value(borrow=True)
-            old_to_elements = theano_to_elements.get_value(borrow=True)
-            old_weights = theano_weights.get_value(borrow=True)
-            propagation_function = self.inlinks[partition_from_spid][3]
+        """
+        Sets the weights of the links from the given gate elements in the given partition to the given slot
+        elements in this partition, with new_weights being a dense (to, from) block.
+        """
+        new_from_elements = np.asarray(new_from_elements, dtype=np.int32)
+        new_to_elements = np.asarray(new_to_elements, dtype=np.int32)
+        cols, rows = np.meshgrid(new_from_elements, new_to_elements)
+        self.set_inlink_weights_by_element(partition_from_spid, np.ravel(cols), np.ravel(rows), np.ravel(new_weights))
+
+    def set_inlink_weights_by_element(self, partition_from_spid, new_from_elements, new_to_elements, new_weights):
+        """
+        Sets the weights of the links from the given gate elements in the given partition to the given slot
+        elements in this partition, pair by pair. Weights of 0 delete links, and for duplicate element pairs
+        the last weight wins. The changes are collected and merged in one go by merge_pending_inlinks.
+        """
+        pending = self.__pending_inlinks.setdefault(partition_from_spid, ([], [], []))
+        pending[0].append(np.asarray(new_from_elements, dtype=np.int32).ravel())
+        pending[1].append(np.asarray(new_to_elements, dtype=np.int32).ravel())
+        pending[2].append(np.asarray(new_weights, dtype=self.nodenet.numpyfloatX).ravel())
+
+    def merge_pending_inlinks(self):
+        """
+        Merges the link changes collected by set_inlink_weights_by_element into the inlink matrices, once per
+        source partition, so that inserting links one by one doesn't rebuild the matrices every time.
+        Happens on the next access to inlinks, i.e. before propagation, saving or reading weights.
+        """
+        pending, self.__pending_inlinks = self.__pending_inlinks, {}
+        for partition_from_spid, (new_from_elements, new_to_elements, new_weights) in pending.items():
+            if partition_from_spid not in self.nodenet.partitions:
+                # the source partition has been deleted since
+                continue
+            new_from_elements, new_to_elements, new_weights = deduplicate_links(
+                np.concatenate(new_from_elements),
+                np.concatenate(new_to_elements),
+                np.concatenate(new_weights))
+
+            if partition_from_spid in self.__inlinks:
+                from_elements = self.__inlinks[partition_from_spid][0].get_value(borrow=True)
+                to_elements = self.__inlinks[partition_from_spid][1].get_value(borrow=True)
+                weights = self.__inlinks[partition_from_spid][2].get_value(borrow=True)
+            else:
+                from_elements = np.zeros(0, dtype=np.int32)
+                to_elements = np.zeros(0, dtype=np.int32)
+                weights = sp.csr_matrix((0, 0), dtype=self.nodenet.scipyfloatX)
+
+            # only the index arrays of the existing links need remapping if elements are added
+            if not np.all(np.in1d(new_from_elements, from_elements)) or not np.all(np.in1d(new_to_elements, to_elements)):
+                old_weights = weights.tocoo()
+                old_from_elements = from_elements
+                old_to_elements = to_elements
+                from_elements = np.union1d(old_from_elements, new_from_elements).astype(np.int32)
+                to_elements = np.union1d(old_to_elements, new_to_elements).astype(np.int32)
+                weights = sp.csr_matrix((
+                    old_weights.data,
+                    (np.searchsorted(to_elements, old_to_elements[old_weights.row]),
+                     np.searchsorted(from_elements, old_from_elements[old_weights.col]))),
+                    shape=(len(to_elements), len(from_elements)), dtype=self.nodenet.scipyfloatX)
+
+            weights = merge_sparse_weights(
+                weights,
+                np.searchsorted(to_elements, new_to_elements),
+                np.searchsorted(from_elements, new_from_elements),
+                new_weights)
+
+            self.store_inlinks(partition_from_spid, from_elements, to_elements, weights)
+
+    def get_inlink_weights(self, partition_from_spid, from_elements, to_elements):
+        """
+        Returns the weights of the links from the given gate elements in the given partition to the given slot
+        elements in this partition, as a dense (to, from) block.
+        """
+        block = np.zeros((len(to_elements), len(from_elements)), dtype=self.nodenet.numpyfloatX)
+        if partition_from_spid not in self.inlinks:
+            return block
+        inlink_from_elements = self.inlinks[partition_from_spid][0].get_value(borrow=True)
+        inlink_to_elements = self.inlinks[partition_from_spid][1].get_value(borrow=True)
+        weights = self.inlinks[partition_from_spid][2].get_value(borrow=True)
+        from_mask = np.in1d(from_elements, inlink_from_elements)
+        to_mask = np.in1d(to_elements, inlink_to_elements)
+        from_indices = np.searchsorted(inlink_from_elements, np.asarray(from_elements)[from_mask])
+        to_indices = np.searchsorted(inlink_to_elements, np.asarray(to_elements)[to_mask])
+        block[np.ix_(to_mask, from_mask)] = weights[to_indices][:, from_indices].toarray()
+        return block
+
+    def store_inlinks(self, partition_from_spid, from_elements, to_elements, weights):
+        if partition_from_spid in self.__inlinks:
+            theano_from_elements = self.__inlinks[partition_from_spid][0]
+            theano_to_elements = self.__inlinks[partition_from_spid][1]
+            theano_weights = self.__inlinks[partition_from_spid][2]
+            propagation_function = self.__inlinks[partition_from_spid][3]
         else:
-            old_from_elements = np.zeros(0, dtype=np.int32)
-            old_to_elements = np.zeros(0, dtype=np.int32)
-            old_weights = np.eye(0, dtype=T.config.floatX)
-
             weightsname = "w_%s_%s" % (partition_from_spid, self.spid)
             fromname = "in_from_%s_%s" % (partition_from_spid, self.spid)
             toname = "in_to_%s_%s" % (partition_from_spid, self.spid)
-            theano_from_elements = theano.shared(value=old_from_elements, name=fromname, borrow=True)
-            theano_to_elements = theano.shared(value=old_to_elements, name=toname, borrow=True)
-            theano_weights = theano.shared(value=old_weights.astype(T.config.floatX), name=weightsname, borrow=True)
+            theano_from_elements = theano.shared(value=np.zeros(0, dtype=np.int32), name=fromname, borrow=True)
+            theano_to_elements = theano.shared(value=np.zeros(0, dtype=np.int32), name=toname, borrow=True)
+            theano_weights = theano.shared(value=sp.csr_matrix((0, 0), dtype=self.nodenet.scipyfloatX), name=weightsname, borrow=True)
 
             from_partition = self.nodenet.partitions[partition_from_spid]
 
@@ -1514,25 +1833,11 @@ class TheanoPartition():
                 theano_to_elements,
                 theano_weights)
 
-        from_elements = np.union1d(old_from_elements, new_from_elements)
-        to_elements = np.union1d(old_to_elements, new_to_elements)
-        weights = np.zeros((len(to_elements), len(from_elements)), dtype=T.config.floatX)
-
-        old_from_indices = np.searchsorted(from_elements, old_from_elements)
-        old_to_indices = np.searchsorted(to_elements, old_to_elements)
-        oldcols, oldrows = np.meshgrid(old_from_indices, old_to_indices)
-        weights[oldrows, oldcols] = old_weights
-
-        new_from_indices = np.searchsorted(from_elements, new_from_elements)
-        new_to_indices = np.searchsorted(to_elements, new_to_elements)
-        newcols, newrows = np.meshgrid(new_from_indices, new_to_indices)
-        weights[newrows, newcols] = new_weights
-
         theano_from_elements.set_value(from_elements, borrow=True)
         theano_to_elements.set_value(to_elements, borrow=True)
         theano_weights.set_value(weights, borrow=True)
 
-        self.inlinks[partition_from_spid] = (
+        self.__inlinks[partition_from_spid] = (
             theano_from_elements,
             theano_to_elements,
             theano_weights,
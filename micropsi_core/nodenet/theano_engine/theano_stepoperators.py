@@ -25,12 +25,14 @@ class TheanoPropagate(Propagate):
     def execute(self, nodenet, nodes, netapi):
         # propagate cross-partition to the a_in vectors
         for partition in nodenet.partitions.values():
-            for inlinks in partition.inlinks.values():
-                inlinks[3]()                                # call the theano_function at [3]
+            with nodenet.profiler.timed("propagate inlinks partition %s", partition.spid):
+                for inlinks in partition.inlinks.values():
+                    inlinks[3]()                            # call the theano_function at [3]
 
         # then propagate internally in all partitions
         for partition in nodenet.partitions.values():
-            partition.propagate()
+            with nodenet.profiler.timed("propagate partition %s", partition.spid):
+                partition.propagate()
 
 class TheanoCalculate(Calculate):
     """
@@ -83,7 +85,8 @@ class TheanoCalculate(Calculate):
         self.write_actuators()
         self.read_sensors_and_actuator_feedback()
         for partition in nodenet.partitions.values():
-            partition.calculate()
+            with nodenet.profiler.timed("calculate partition %s", partition.spid):
+                partition.calculate()
         self.count_success_and_failure(nodenet)
 
 
@@ -8,6 +8,7 @@ maintains a set of users, worlds (up to one per user), and nodenets, and provide
 
 from micropsi_core._runtime_api_world import *
 from micropsi_core._runtime_api_monitors import *
+from micropsi_core._runtime_api_stream import *
 import re
 
 __author__ = 'joscha'
@@ -23,15 +24,21 @@ import os
 import sys
 from micropsi_core import tools
 import json
+import bisect
+import hashlib
+import itertools
+import functools
 import warnings
 import threading
 from datetime import datetime, timedelta
+from collections import OrderedDict
 import time
 import signal
+from concurrent.futures import ThreadPoolExecutor
 
 import logging
 
-from .micropsi_logger import MicropsiLogger
+from .micropsi_logger import MicropsiLogger, ThreadLogFilter
 
 NODENET_DIRECTORY = "nodenets"
 WORLD_DIRECTORY = "worlds"
@@ -39,13 +46,55 @@ RESOURCE_PATH = cfg['paths']['resource_path']
 
 configs = config.ConfigurationManager(cfg['paths']['server_settings_path'])
 
-worlds = {}
+worlds = WorldRegistry()
 nodenets = {}
 native_modules = {}
 custom_recipes = {}
 
+# seconds after which worlds that are not in use are unloaded, 0 to keep them loaded
+try:
+    WORLD_IDLE_TIMEOUT = int(cfg['micropsi2'].get('world_idle_timeout', '0'))
+except ValueError:
+    logging.getLogger("system").warning("Unsupported world_idle_timeout value from configuration: %s, keeping worlds loaded", cfg['micropsi2'].get('world_idle_timeout'))
+    WORLD_IDLE_TIMEOUT = 0
+
+# signatures of the nodenet and world files by path and file name, see crawl_definition_files
+definition_indexes = {}
+DEFINITION_INDEX_FILENAME = "definitions.index"
+DEFINITION_INDEX_VERSION = 1
+
+# recently delivered nodespace views per nodenet, see get_nodenet_data
+nodespace_views = {}
+NODESPACE_VIEW_HISTORY = 10
+# number of distinct nodespace, viewport and page combinations remembered per nodenet
+NODESPACE_VIEW_KEYS = 20
+NODE_ACTIVATION_KEYS = ('activation', 'gate_activations', 'sheaves', 'state')
+# the number of edits of each nodenet outside of steps, and the revision of its current state as
+# ((step, edits), revision). Revisions are unique across nodenets and reloads, see _get_nodenet_revision
+nodenet_edits = {}
+nodenet_revisions = {}
+revision_counter = itertools.count(1)
+
+
+def _edits_nodenet(func):
+    """ Decorates runtime functions that change a nodenet outside of a step, so that clients polling
+    for nodespace changes get a new revision afterwards"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nodenet_uid = args[0] if args else kwargs['nodenet_uid']
+        try:
+            return func(*args, **kwargs)
+        finally:
+            nodenet_edits[nodenet_uid] = nodenet_edits.get(nodenet_uid, 0) + 1
+    return wrapper
+
 runner = {'timestep': 1000, 'runner': None, 'factor': 1}
 
+# progress of the nodenets currently running steps in bulk, see run_steps
+batch_runs = {}
+# seconds between two progress notifications of a run
+RUN_STEPS_NOTIFY_INTERVAL = 0.5
+
 signal_handler_registry = []
 
 logger = MicropsiLogger({
@@ -66,6 +115,11 @@ def add_signal_handler(handler):
     signal_handler_registry.append(handler)
 
 
+def remove_signal_handler(handler):
+    if handler in signal_handler_registry:
+        signal_handler_registry.remove(handler)
+
+
 def signal_handler(signal, frame):
     logging.getLogger('system').info("Shutting down")
     for handler in signal_handler_registry:
@@ -87,6 +141,18 @@ class MicropsiRunner(threading.Thread):
             self.profiler = cProfile.Profile()
         else:
             self.profiler = None
+        self.pool = None
+        threads = cfg['micropsi2'].get('runner_threads', '1')
+        try:
+            threads = int(threads)
+        except ValueError:
+            logging.getLogger("system").warning("Unsupported runner_threads value from configuration: %s, falling back to 1", threads)
+            threads = 1
+        if threads > 1:
+            if self.profiler:
+                logging.getLogger("system").warning("Runner profiling is enabled, stepping nodenets on a single thread")
+            else:
+                self.pool = ThreadPoolExecutor(max_workers=threads)
         self.daemon = True
         self.paused = True
         self.state = threading.Condition()
@@ -119,35 +185,13 @@ class MicropsiRunner(threading.Thread):
 
             start = datetime.now()
             log = False
-            uids = list(nodenets.keys())
-            for uid in uids:
-                if uid in nodenets:
-                    nodenet = nodenets[uid]
-                    if nodenet.is_active:
-                        if not self.check_conditions(uid):
-                            nodenet.is_active = False
-                            continue
+            groups = self.get_nodenet_groups()
+            if self.pool is not None and len(groups) > 1:
+                log = any(list(self.pool.map(self.step_nodenet_group, groups)))
+            else:
+                for group in groups:
+                    if self.step_nodenet_group(group):
                         log = True
-                        try:
-                            if self.profiler:
-                                self.profiler.enable()
-                            nodenet.step()
-                            if self.profiler:
-                                self.profiler.disable()
-                            nodenet.update_monitors()
-                        except:
-                            if self.profiler:
-                                self.profiler.disable()
-                            nodenet.is_active = False
-                            logging.getLogger("nodenet").error("Exception in NodenetRunner:", exc_info=1)
-                            MicropsiRunner.last_nodenet_exception[uid] = sys.exc_info()
-                        if nodenet.world and nodenet.current_step % runner['factor'] == 0:
-                            try:
-                                nodenet.world.step()
-                            except:
-                                nodenet.is_active = False
-                                logging.getLogger("world").error("Exception in WorldRunner:", exc_info=1)
-                                MicropsiRunner.last_world_exception[nodenets[uid].world.uid] = sys.exc_info()
 
             elapsed = datetime.now() - start
             if log:
@@ -177,6 +221,60 @@ class MicropsiRunner(threading.Thread):
             if left.total_seconds() > 0:
                 time.sleep(left.total_seconds())
 
+    def get_nodenet_groups(self):
+        """ Returns the uids of all active nodenets, grouped by the world they are connected to.
+        Nodenets sharing a world end up in the same group and are stepped serially"""
+        groups = {}
+        uids = list(nodenets.keys())
+        for uid in uids:
+            nodenet = nodenets.get(uid)
+            if nodenet is not None and nodenet.is_active:
+                key = nodenet.world.uid if nodenet.world else uid
+                groups.setdefault(key, []).append(uid)
+        return list(groups.values())
+
+    def step_nodenet_group(self, uids):
+        """ Steps the given nodenets and their worlds. Returns True if at least one nodenet was stepped"""
+        stepped = False
+        for uid in uids:
+            if self.step_nodenet(uid):
+                stepped = True
+        return stepped
+
+    def step_nodenet(self, uid):
+        """ Steps the given nodenet, updates its monitors and advances its world in lockstep.
+        Returns True if the nodenet was stepped"""
+        nodenet = nodenets.get(uid)
+        if nodenet is None or not nodenet.is_active:
+            return False
+        if not self.check_conditions(uid):
+            nodenet.is_active = False
+            return False
+        try:
+            if self.profiler:
+                self.profiler.enable()
+            nodenet.step()
+            if self.profiler:
+                self.profiler.disable()
+            with nodenet.profiler.timed("monitor update"):
+                nodenet.update_monitors()
+        except:
+            if self.profiler:
+                self.profiler.disable()
+            nodenet.is_active = False
+            logging.getLogger("nodenet").error("Exception in NodenetRunner:", exc_info=1)
+            MicropsiRunner.last_nodenet_exception[uid] = sys.exc_info()
+        if nodenet.world and nodenet.current_step % runner['factor'] == 0:
+            try:
+                with nodenet.profiler.timed("world step"):
+                    nodenet.world.step()
+            except:
+                nodenet.is_active = False
+                logging.getLogger("world").error("Exception in WorldRunner:", exc_info=1)
+                MicropsiRunner.last_world_exception[nodenet.world.uid] = sys.exc_info()
+        notify_nodenet_subscribers(uid)
+        return True
+
     def resume(self):
         with self.state:
             self.paused = False
@@ -195,6 +293,8 @@ def kill_runners(signal, frame):
     runner['runner'].resume()
     runner['running'] = False
     runner['runner'].join()
+    if runner['runner'].pool is not None:
+        runner['runner'].pool.shutdown()
 
 
 def _get_world_uid_for_nodenet_uid(nodenet_uid):
@@ -226,10 +326,12 @@ def get_logger_messages(loggers=[], after=0):
     return logger.get_logs(loggers, after)
 
 
-def get_monitoring_info(nodenet_uid, logger=[], after=0):
-    """ Returns log-messages and monitor-data for the given nodenet."""
-    data = get_monitor_data(nodenet_uid, 0)
+def get_monitoring_info(nodenet_uid, logger=[], after=0, monitor_from_step=None, step_profile=False):
+    """ Returns log-messages and monitor-data for the given nodenet, and its step profile if step_profile is True."""
+    data = get_monitor_data(nodenet_uid, 0, monitor_from_step)
     data['logs'] = get_logger_messages(logger, after)
+    if step_profile:
+        data['step_profile'] = get_step_profile(nodenet_uid)
     return data
 
 
@@ -333,8 +435,21 @@ def load_nodenet(nodenet_uid):
     return False, "Nodenet %s not found in %s" % (nodenet_uid, RESOURCE_PATH)
 
 
-def get_nodenet_data(nodenet_uid, nodespace, step=0, include_links=True):
-    """ returns the current state of the nodenet """
+def get_nodenet_data(nodenet_uid, nodespace, step=0, include_links=True, revision=None, viewport=None,
+                     cursor=None, page_size=None, include_nodetypes=True):
+    """ returns the current state of the nodenet
+
+    If a revision is given, and the view of the nodespace delivered with that revision is still known,
+    only the changes since then are returned: changed and added nodes and links, the uids of removed
+    nodes and links, the activations and state of nodes that changed nothing else, and new monitor values.
+    Such a response has "delta" set to True. Every response carries the "revision" to ask for next.
+
+    If a viewport rectangle [left, top, right, bottom] is given, only the nodes of the nodespace positioned
+    within it are returned, with the links touching them. If a page_size is given, the nodes are returned
+    in pages of that size, ordered by uid. The response carries the "next_cursor" to pass as cursor for
+    the next page, which is None on the last page. Raises a ValueError for a page_size below 1.
+    Nodetype definitions are left out if include_nodetypes is False, see get_nodetype_definitions.
+    """
     nodenet = get_nodenet(nodenet_uid)
     data = nodenet.metadata
     if step > nodenet.current_step:
@@ -342,16 +457,125 @@ def get_nodenet_data(nodenet_uid, nodespace, step=0, include_links=True):
     with nodenet.netlock:
         if not nodenets[nodenet_uid].is_nodespace(nodespace):
             nodespace = nodenets[nodenet_uid].get_nodespace(None).uid
-        data.update(nodenets[nodenet_uid].get_nodespace_data(nodespace, include_links))
+        if viewport is not None:
+            viewport = tuple(viewport)
+        view_key = (nodespace, include_links, viewport, cursor, page_size)
+        nodenet_views = nodespace_views.setdefault(nodenet_uid, OrderedDict())
+        views = nodenet_views.setdefault(view_key, OrderedDict())
+        nodenet_views.move_to_end(view_key)
+        while len(nodenet_views) > NODESPACE_VIEW_KEYS:
+            nodenet_views.popitem(last=False)
+        current_revision = _get_nodenet_revision(nodenet_uid)
+        if revision is not None and current_revision in views:
+            nodespace_data = dict(views[current_revision]['data'])
+        else:
+            node_uids, next_cursor = _select_nodespace_nodes(nodenet, nodespace, viewport, cursor, page_size)
+            nodespace_data = nodenets[nodenet_uid].get_nodespace_data(nodespace, include_links, node_uids=node_uids)
+            if page_size is not None:
+                nodespace_data['next_cursor'] = next_cursor
+            views[current_revision] = {
+                'step': nodenet.current_step,
+                'data': dict((key, value) for key, value in nodespace_data.items() if key != 'user_prompt'),
+                'nodes': dict((uid, _fingerprint_node(node)) for uid, node in nodespace_data['nodes'].items()),
+                'links': dict((uid, _fingerprint(link)) for uid, link in nodespace_data['links'].items())
+            }
+            views.move_to_end(current_revision)
+            while len(views) > NODESPACE_VIEW_HISTORY:
+                views.popitem(last=False)
+        data.update(nodespace_data)
         data['nodespace'] = nodespace
-        data.update({
-            'nodetypes': nodenet.get_standard_nodetype_definitions(),
-            'native_modules': filter_native_modules(nodenet.engine),
-            'monitors': nodenet.construct_monitors_dict()
-        })
+        data['is_active'] = nodenet.is_active
+        data['include_links'] = include_links
+        data['revision'] = current_revision
+        if revision is not None and revision in views:
+            data.update(_diff_nodespace_views(views[revision], views[current_revision]))
+            data['delta'] = True
+            data['monitors'] = nodenet.construct_monitors_dict(views[revision]['step'] + 1)
+        else:
+            data['monitors'] = nodenet.construct_monitors_dict()
+            if include_nodetypes:
+                data.update({
+                    'nodetypes': nodenet.get_standard_nodetype_definitions(),
+                    'native_modules': filter_native_modules(nodenet.engine)
+                })
+    return data
+
+
+def _get_nodenet_revision(nodenet_uid):
+    """ returns the revision of the current state of the given nodenet, which changes with every step and edit"""
+    state = (nodenets[nodenet_uid].current_step, nodenet_edits.get(nodenet_uid, 0))
+    known = nodenet_revisions.get(nodenet_uid)
+    if known is None or known[0] != state:
+        known = (state, next(revision_counter))
+        nodenet_revisions[nodenet_uid] = known
+    return known[1]
+
+
+def _select_nodespace_nodes(nodenet, nodespace, viewport, cursor, page_size):
+    """ returns the uids of the nodes of the nodespace to deliver for the given viewport and page, or None for
+    all of them, and the cursor of the next page"""
+    if viewport is None and page_size is None:
+        return None, None
+    if page_size is not None and page_size <= 0:
+        raise ValueError("page_size must be positive, got %d" % page_size)
+    if viewport is not None:
+        node_uids = nodenet.get_node_uids_in_viewport(nodespace, viewport)
+    else:
+        node_uids = nodenet.get_nodespace(nodespace).get_known_ids('nodes')
+    if page_size is None:
+        return node_uids, None
+    node_uids = sorted(node_uids)
+    if cursor is not None:
+        node_uids = node_uids[bisect.bisect_right(node_uids, cursor):]
+    next_cursor = node_uids[page_size - 1] if len(node_uids) > page_size else None
+    return node_uids[:page_size], next_cursor
+
+
+def get_nodetype_definitions(nodenet_uid):
+    """ returns the standard nodetypes and the native modules available to the given nodenet, and a version
+    that changes whenever they do, for clients to cache them"""
+    nodenet = nodenets[nodenet_uid]
+    data = {
+        'nodetypes': nodenet.get_standard_nodetype_definitions(),
+        'native_modules': filter_native_modules(nodenet.engine)
+    }
+    data['version'] = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
     return data
 
 
+def _fingerprint(data):
+    return json.dumps(data, sort_keys=True)
+
+
+def _fingerprint_node(node_data):
+    """ returns fingerprints of the activations and state of a node, and of everything else"""
+    activations = dict((key, node_data.get(key)) for key in NODE_ACTIVATION_KEYS)
+    rest = dict((key, value) for key, value in node_data.items() if key not in NODE_ACTIVATION_KEYS)
+    return _fingerprint(rest), _fingerprint(activations)
+
+
+def _diff_nodespace_views(old, new):
+    """ returns the changes from the old to the new nodespace view"""
+    nodes = new['data']['nodes']
+    links = new['data']['links']
+    changes = {
+        'nodes': {},
+        'activations': {},
+        'removed_nodes': [uid for uid in old['nodes'] if uid not in new['nodes']],
+        'links': {},
+        'removed_links': [uid for uid in old['links'] if uid not in new['links']]
+    }
+    for uid, (structure, activations) in new['nodes'].items():
+        if uid not in old['nodes'] or old['nodes'][uid][0] != structure:
+            changes['nodes'][uid] = nodes[uid]
+        elif old['nodes'][uid][1] != activations:
+            changes['activations'][uid] = dict((key, nodes[uid].get(key)) for key in NODE_ACTIVATION_KEYS)
+    for uid, fingerprint in new['links'].items():
+        if old['links'].get(uid) != fingerprint:
+            changes['links'][uid] = links[uid]
+    return changes
+
+
 def unload_nodenet(nodenet_uid):
     """ Unload the nodenet.
         Deletes the instance of this nodenet without deleting it from the storage
@@ -364,6 +588,9 @@ def unload_nodenet(nodenet_uid):
     if nodenets[nodenet_uid].world:
         nodenets[nodenet_uid].world.unregister_nodenet(nodenet_uid)
     del nodenets[nodenet_uid]
+    nodespace_views.pop(nodenet_uid, None)
+    nodenet_revisions.pop(nodenet_uid, None)
+    notify_nodenet_subscribers(nodenet_uid)
     return True
 
 
@@ -406,6 +633,7 @@ def new_nodenet(nodenet_name, engine="dict_engine", worldadapter=None, template=
         nodenets[uid].merge_data(data_to_merge)
 
     nodenets[uid].save(filename)
+    update_definition_index(os.path.join(RESOURCE_PATH, NODENET_DIRECTORY), filename, nodenets[uid].metadata)
     return True, data['uid']
 
 
@@ -417,11 +645,13 @@ def delete_nodenet(nodenet_uid):
     filename = os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, nodenet_uid + '.json')
     nodenet = get_nodenet(nodenet_uid)
     nodenet.remove(filename)
+    update_definition_index(os.path.join(RESOURCE_PATH, NODENET_DIRECTORY), filename)
     unload_nodenet(nodenet_uid)
     del nodenet_data[nodenet_uid]
     return True
 
 
+@_edits_nodenet
 def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, world_uid=None, owner=None):
     """Sets the supplied parameters (and only those) for the nodenet with the given uid."""
 
@@ -446,7 +676,10 @@ def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, wo
 def start_nodenetrunner(nodenet_uid):
     """Starts a thread that regularly advances the given nodenet by one step."""
 
-    nodenets[nodenet_uid].is_active = True
+    with nodenet_lock:
+        if nodenet_uid in batch_runs:
+            return False, "Nodenet %s is running steps" % nodenet_uid
+        nodenets[nodenet_uid].is_active = True
     if runner['runner'].paused:
         runner['runner'].resume()
     return True
@@ -499,7 +732,7 @@ def stop_nodenetrunner(nodenet_uid):
     nodenets[nodenet_uid].is_active = False
     test = {nodenets[uid].is_active for uid in nodenets}
     if True not in test:
-        test = {worlds[uid].is_active for uid in worlds}
+        test = {worlds[uid].is_active for uid in worlds if worlds.is_loaded(uid)}
         if True not in test:
             runner['runner'].pause()
 
@@ -512,13 +745,79 @@ def step_nodenet(nodenet_uid):
     Arguments:
         nodenet_uid: The uid of the nodenet
     """
-    nodenets[nodenet_uid].step()
-    nodenets[nodenet_uid].update_monitors()
-    if nodenets[nodenet_uid].world and nodenets[nodenet_uid].current_step % configs['runner_factor'] == 0:
-        nodenets[nodenet_uid].world.step()
-    return nodenets[nodenet_uid].current_step
+    nodenet = nodenets[nodenet_uid]
+    nodenet.step()
+    with nodenet.profiler.timed("monitor update"):
+        nodenet.update_monitors()
+    if nodenet.world and nodenet.current_step % configs['runner_factor'] == 0:
+        with nodenet.profiler.timed("world step"):
+            nodenet.world.step()
+    notify_nodenet_subscribers(nodenet_uid)
+    return nodenet.current_step
 
 
+def run_steps(nodenet_uid, steps, world=True, monitors=False, log=False):
+    """Advances the given nodenet by the given number of steps as fast as possible, ignoring the runner timestep.
+    Meant for training runs and replays. Refused while the nodenet runner is active for the nodenet, and the
+    runner can't be started until the steps are done.
+
+    Arguments:
+        nodenet_uid: The uid of the nodenet
+        steps: the number of steps to run
+        world: if True, the world is stepped along with the nodenet, as the runner does it
+        monitors: if True, monitors are updated after every step, otherwise they are skipped
+        log: if False, debug and info messages logged while stepping are dropped
+
+    Subscribers of the nodenet stream are notified every RUN_STEPS_NOTIFY_INTERVAL seconds, and can follow the
+    progress in batch_runs. Returns the current step, the number of steps run and the duration in seconds.
+    """
+    nodenet = nodenets[nodenet_uid]
+    with nodenet_lock:
+        if nodenet.is_active:
+            return False, "Nodenet %s is running, stop it before running steps" % nodenet_uid
+        if nodenet_uid in batch_runs:
+            return False, "Nodenet %s is already running steps" % nodenet_uid
+        progress = batch_runs[nodenet_uid] = {'steps': steps, 'done': 0}
+    log_filter = None
+    if not log:
+        log_filter = ThreadLogFilter(threading.current_thread(), logging.WARNING)
+        logging.getLogger("nodenet").addFilter(log_filter)
+    factor = configs['runner_factor']
+    start = time.time()
+    next_notification = start + RUN_STEPS_NOTIFY_INTERVAL
+    try:
+        for i in range(steps):
+            nodenet.step()
+            if monitors:
+                with nodenet.profiler.timed("monitor update"):
+                    nodenet.update_monitors()
+            if world and nodenet.world and nodenet.current_step % factor == 0:
+                with nodenet.profiler.timed("world step"):
+                    nodenet.world.step()
+            progress['done'] = i + 1
+            if time.time() >= next_notification:
+                next_notification += RUN_STEPS_NOTIFY_INTERVAL
+                notify_nodenet_subscribers(nodenet_uid)
+                # let request threads have the interpreter for a moment
+                time.sleep(0)
+    except:
+        logging.getLogger("nodenet").error("Exception while running steps:", exc_info=1)
+        MicropsiRunner.last_nodenet_exception[nodenet_uid] = sys.exc_info()
+        return False, "Exception in step %d: %s" % (nodenet.current_step, str(sys.exc_info()[1]))
+    finally:
+        if log_filter is not None:
+            logging.getLogger("nodenet").removeFilter(log_filter)
+        with nodenet_lock:
+            del batch_runs[nodenet_uid]
+        notify_nodenet_subscribers(nodenet_uid)
+    return True, {
+        'current_step': nodenet.current_step,
+        'steps': steps,
+        'duration': time.time() - start
+    }
+
+
+@_edits_nodenet
 def revert_nodenet(nodenet_uid):
     """Returns the nodenet to the last saved state."""
     unload_nodenet(nodenet_uid)
@@ -529,8 +828,10 @@ def revert_nodenet(nodenet_uid):
 def save_nodenet(nodenet_uid):
     """Stores the nodenet on the server (but keeps it open)."""
     nodenet = nodenets[nodenet_uid]
-    nodenet.save(os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, nodenet_uid + '.json'))
+    filename = os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, nodenet_uid + '.json')
+    nodenet.save(filename)
     nodenet_data[nodenet_uid] = Bunch(**nodenet.metadata)
+    update_definition_index(os.path.join(RESOURCE_PATH, NODENET_DIRECTORY), filename, nodenet.metadata)
     return True
 
 
@@ -562,11 +863,13 @@ def import_nodenet(string, owner=None):
     filename = os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, import_data['uid'] + '.json')
     with open(filename, 'w+') as fp:
         fp.write(json.dumps(import_data))
+    update_definition_index(os.path.join(RESOURCE_PATH, NODENET_DIRECTORY), filename, import_data)
     nodenet_data[import_data['uid']] = parse_definition(import_data, filename)
     load_nodenet(import_data['uid'])
     return import_data['uid']
 
 
+@_edits_nodenet
 def merge_nodenet(nodenet_uid, string, keep_uids=False):
     """Merges the nodenet data with an existing nodenet, instantiates the nodenet.
 
@@ -631,6 +934,7 @@ def get_node(nodenet_uid, node_uid):
     return nodenets[nodenet_uid].get_node(node_uid).data
 
 
+@_edits_nodenet
 def add_node(nodenet_uid, type, pos, nodespace=None, state=None, uid=None, name="", parameters=None):
     """Creates a new node. (Including native module.)
 
@@ -651,6 +955,7 @@ def add_node(nodenet_uid, type, pos, nodespace=None, state=None, uid=None, name=
     uid = nodenet.create_node(type, nodespace, pos, name, uid=uid, parameters=parameters)
     return True, uid
 
+@_edits_nodenet
 def add_nodespace(nodenet_uid, pos, nodespace=None, uid=None, name="", options=None):
     """Creates a new nodespace
     Arguments:
@@ -666,6 +971,7 @@ def add_nodespace(nodenet_uid, pos, nodespace=None, uid=None, name="", options=N
     return True, uid
 
 
+@_edits_nodenet
 def clone_nodes(nodenet_uid, node_uids, clonemode, nodespace=None, offset=[50, 50]):
     """
     Clones a bunch of nodes. The nodes will get new unique node ids,
@@ -875,6 +1181,7 @@ def generate_netapi_fragment(nodenet_uid, node_uids):
     return "\n".join(lines)
 
 
+@_edits_nodenet
 def set_node_position(nodenet_uid, node_uid, pos):
     """Positions the specified node at the given coordinates."""
     nodenet = nodenets[nodenet_uid]
@@ -885,6 +1192,7 @@ def set_node_position(nodenet_uid, node_uid, pos):
     return True
 
 
+@_edits_nodenet
 def set_node_name(nodenet_uid, node_uid, name):
     """Sets the display name of the node"""
     nodenet = nodenets[nodenet_uid]
@@ -895,6 +1203,7 @@ def set_node_name(nodenet_uid, node_uid, name):
     return True
 
 
+@_edits_nodenet
 def set_node_state(nodenet_uid, node_uid, state):
     """ Sets the state of the given node to the given state"""
     node = nodenets[nodenet_uid].get_node(node_uid)
@@ -903,11 +1212,14 @@ def set_node_state(nodenet_uid, node_uid, state):
     return True
 
 
+@_edits_nodenet
 def set_node_activation(nodenet_uid, node_uid, activation):
     nodenets[nodenet_uid].get_node(node_uid).activation = activation
+    nodenets[nodenet_uid]._activations_changed()
     return True
 
 
+@_edits_nodenet
 def delete_node(nodenet_uid, node_uid):
     """Removes the node or node space"""
     nodenet = nodenets[nodenet_uid]
@@ -918,6 +1230,7 @@ def delete_node(nodenet_uid, node_uid):
         return False
 
 
+@_edits_nodenet
 def delete_nodespace(nodenet_uid, nodespace_uid):
     """ Removes the given node space and all its contents"""
     nodenet = nodenets[nodenet_uid]
@@ -942,6 +1255,7 @@ def get_available_native_module_types(nodenet_uid):
     return filter_native_modules(nodenets[nodenet_uid].engine)
 
 
+@_edits_nodenet
 def set_node_parameters(nodenet_uid, node_uid, parameters):
     """Sets a dict of arbitrary values to make the node stateful."""
     for key, value in parameters.items():
@@ -956,6 +1270,7 @@ def get_gatefunction(nodenet_uid, node_uid, gate_type):
     return nodenets[nodenet_uid].get_node(node_uid).get_gatefunction_name(gate_type)
 
 
+@_edits_nodenet
 def set_gatefunction(nodenet_uid, node_uid, gate_type, gatefunction=None):
     """
     Sets the gate function of the given node and gate.
@@ -971,6 +1286,7 @@ def get_available_gatefunctions(nodenet_uid):
     return nodenets[nodenet_uid].get_available_gatefunctions()
 
 
+@_edits_nodenet
 def set_gate_parameters(nodenet_uid, node_uid, gate_type, parameters):
     """Sets the gate parameters of the given gate of the given node to the supplied dictionary."""
     for key, value in parameters.items():
@@ -990,6 +1306,7 @@ def get_available_datatargets(nodenet_uid):
     return worlds[world_uid].get_available_datatargets(nodenet_uid)
 
 
+@_edits_nodenet
 def bind_datasource_to_sensor(nodenet_uid, sensor_uid, datasource):
     """Associates the datasource type to the sensor node with the given uid."""
     node = nodenets[nodenet_uid].get_node(sensor_uid)
@@ -999,6 +1316,7 @@ def bind_datasource_to_sensor(nodenet_uid, sensor_uid, datasource):
     return False
 
 
+@_edits_nodenet
 def bind_datatarget_to_actor(nodenet_uid, actor_uid, datatarget):
     """Associates the datatarget type to the actor node with the given uid."""
     node = nodenets[nodenet_uid].get_node(actor_uid)
@@ -1008,6 +1326,7 @@ def bind_datatarget_to_actor(nodenet_uid, actor_uid, datatarget):
     return False
 
 
+@_edits_nodenet
 def add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type, weight=1, certainty=1):
     """Creates a new link.
 
@@ -1028,6 +1347,30 @@ def add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type
     return success, uid
 
 
+@_edits_nodenet
+def add_links(nodenet_uid, links):
+    """Creates or updates many links at once.
+
+    Arguments.
+        links: a list of [source_node_uid, gate_type, target_node_uid, slot_type] lists, optionally
+            followed by the weight of the link (defaults to 1)
+
+    Returns the number of links written
+    """
+    nodenet = nodenets[nodenet_uid]
+    for link in links:
+        if len(link) not in (4, 5):
+            return False, "Links need to be given as [source_node_uid, gate_type, target_node_uid, slot_type, weight]"
+    columns = list(zip(*[list(link[:4]) + [link[4] if len(link) > 4 else 1] for link in links])) or [[]] * 5
+    with nodenet.netlock:
+        try:
+            nodenet.create_links(*[list(column) for column in columns])
+        except (KeyError, ValueError) as err:
+            return False, "Could not create links: %s" % str(err)
+    return True, len(links)
+
+
+@_edits_nodenet
 def set_link_weight(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type, weight=1, certainty=1):
     """Set weight of the given link."""
     nodenet = nodenets[nodenet_uid]
@@ -1052,18 +1395,21 @@ def get_links_for_nodes(nodenet_uid, node_uids):
 
 
 
+@_edits_nodenet
 def delete_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type):
     """Delete the given link."""
     nodenet = nodenets[nodenet_uid]
     return nodenet.delete_link(source_node_uid, gate_type, target_node_uid, slot_type)
 
 
+@_edits_nodenet
 def align_nodes(nodenet_uid, nodespace):
     """Perform auto-alignment of nodes in the current nodespace"""
     result = node_alignment.align(nodenets[nodenet_uid], nodespace)
     return result
 
 
+@_edits_nodenet
 def user_prompt_response(nodenet_uid, node_uid, values, resume_nodenet):
     for key, value in values.items():
         nodenets[nodenet_uid].get_node(node_uid).set_parameter(key, value)
@@ -1082,6 +1428,7 @@ def get_available_recipes():
     return recipes
 
 
+@_edits_nodenet
 def run_recipe(nodenet_uid, name, parameters):
     """ Calls the given recipe with the provided parameters, and returns the output, if any """
     netapi = nodenets[nodenet_uid].netapi
@@ -1117,29 +1464,98 @@ def filter_native_modules(engine=None):
     return data
 
 
+# <nodenet uid>-data-<partition spid>, see TheanoNodenet.save
+PARTITION_DATA_DIRECTORY = re.compile(r".+-data-\d+$")
+
+
 def crawl_definition_files(path, type="definition"):
     """Traverse the directories below the given path for JSON definitions of nodenets and worlds,
     and return a dictionary with the signatures of these nodenets or worlds.
+
+    Signatures are taken from the definition index of the path as long as size and modification time
+    of their file did not change, so only new and changed files are parsed.
     """
 
     result = {}
     tools.mkdir(path)
+    index = _read_definition_index(path)
+    entries = {}
 
     for user_directory_name, user_directory_names, file_names in os.walk(path):
+        # the array directories of theano partitions hold no definitions, only a manifest next to the arrays
+        user_directory_names[:] = [name for name in user_directory_names if not PARTITION_DATA_DIRECTORY.match(name)]
         for definition_file_name in file_names:
             if definition_file_name.endswith(".json"):
+                filename = os.path.join(user_directory_name, definition_file_name)
+                key = os.path.relpath(filename, path)
                 try:
-                    filename = os.path.join(user_directory_name, definition_file_name)
-                    with open(filename) as file:
-                        data = parse_definition(json.load(file), filename)
-                        result[data.uid] = data
+                    stat = os.stat(filename)
+                    entry = index.get(key)
+                    if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                        with open(filename) as file:
+                            data = parse_definition(json.load(file), filename)
+                        if data is None:
+                            raise ValueError("No uid")
+                        definition = dict((k, v) for k, v in data.items() if k != 'filename')
+                        entry = {'mtime': stat.st_mtime, 'size': stat.st_size, 'definition': definition}
+                    entries[key] = entry
+                    result[entry['definition']['uid']] = Bunch(filename=filename, **entry['definition'])
                 except ValueError:
                     warnings.warn("Invalid %s data in file '%s'" % (type, definition_file_name))
-                except IOError:
+                except (IOError, OSError):
                     warnings.warn("Could not open %s data file '%s'" % (type, definition_file_name))
+    if entries != index:
+        _write_definition_index(path, entries)
+    definition_indexes[path] = entries
     return result
 
 
+def _read_definition_index(path):
+    filename = os.path.join(path, DEFINITION_INDEX_FILENAME)
+    if not os.path.isfile(filename):
+        return {}
+    try:
+        with open(filename) as file:
+            index = json.load(file)
+        if index.get('version') != DEFINITION_INDEX_VERSION:
+            return {}
+        return index['files']
+    except (ValueError, KeyError, AttributeError, IOError):
+        logging.getLogger('system').warn("Ignoring invalid definition index %s" % filename)
+        return {}
+
+
+def _write_definition_index(path, entries):
+    filename = os.path.join(path, DEFINITION_INDEX_FILENAME)
+    try:
+        with open(filename + '.tmp', 'w') as file:
+            json.dump({'version': DEFINITION_INDEX_VERSION, 'files': entries}, file)
+        os.replace(filename + '.tmp', filename)
+    except (IOError, OSError) as err:
+        logging.getLogger('system').warn("Could not write definition index %s: %s" % (filename, str(err)))
+
+
+def update_definition_index(path, filename, data=None):
+    """Records the signature of the definition file with the given name in the definition index of the path,
+    as parsed from the given data. Without data, the file is dropped from the index.
+    Called whenever a nodenet or world file is written or deleted."""
+    if path not in definition_indexes:
+        definition_indexes[path] = _read_definition_index(path)
+    entries = definition_indexes[path]
+    key = os.path.relpath(filename, path)
+    definition = parse_definition(data, filename) if data is not None else None
+    if definition is None or not os.path.isfile(filename):
+        entries.pop(key, None)
+    else:
+        stat = os.stat(filename)
+        entries[key] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'definition': dict((k, v) for k, v in definition.items() if k != 'filename')
+        }
+    _write_definition_index(path, entries)
+
+
 def parse_definition(json, filename=None):
     if "uid" in json:
         result = dict(
@@ -1171,27 +1587,28 @@ def load_definitions():
         world_data[uid] = Bunch(uid=uid, name="default", version=1, filename=filename)
         with open(filename, 'w+') as fp:
             fp.write(json.dumps(world_data[uid], sort_keys=True, indent=4))
+        update_definition_index(os.path.join(RESOURCE_PATH, WORLD_DIRECTORY), filename, world_data[uid])
     return nodenet_data, world_data
 
 
 # set up all worlds referred to in the world_data:
-def init_worlds(world_data):
+def init_worlds():
+    """Sets up the registry of the worlds in world_data. They are instantiated on first access, see WorldRegistry"""
     global worlds
-    for uid in world_data:
-        if "world_type" in world_data[uid]:
-            try:
-                worlds[uid] = get_world_class_from_name(world_data[uid].world_type)(**world_data[uid])
-            except TypeError:
-                worlds[uid] = world.World(**world_data[uid])
-            except AttributeError as err:
-                warnings.warn("Unknown world_type: %s (%s)" % (world_data[uid].world_type, str(err)))
-            except:
-                warnings.warn("Can not instantiate World \"%s\": %s" % (world_data[uid].name, str(sys.exc_info()[1])))
-        else:
-            worlds[uid] = world.World(**world_data[uid])
+    worlds = WorldRegistry()
     return worlds
 
 
+def evict_worlds_periodically():
+    """Unloads idle worlds every now and then, see evict_idle_worlds"""
+    while runner['running']:
+        time.sleep(min(WORLD_IDLE_TIMEOUT, 60))
+        try:
+            evict_idle_worlds()
+        except:
+            logging.getLogger("world").error("Exception while unloading idle worlds:", exc_info=1)
+
+
 def load_user_files(do_reload=False):
     # see if we have additional nodetypes defined by the user.
     import sys
@@ -1268,7 +1685,7 @@ def reload_native_modules():
 
 
 load_definitions()
-init_worlds(world_data)
+init_worlds()
 load_user_files()
 
 # initialize runners
@@ -1285,6 +1702,9 @@ set_runner_properties(configs['runner_timestep'], configs['runner_factor'])
 runner['running'] = True
 runner['runner'] = MicropsiRunner()
 
+if WORLD_IDLE_TIMEOUT > 0:
+    threading.Thread(target=evict_worlds_periodically, daemon=True).start()
+
 add_signal_handler(kill_runners)
 
 signal.signal(signal.SIGINT, signal_handler)
@@ -29,3 +29,62 @@ def test_island(resourcepath):
     assert world.data['objects']['foobar']['position'] == (5, 5)
     assert runtime.get_world_view(world_uid, -1)['objects']['foobar']['position'] == (5, 5)
     runtime.delete_world(world_uid)
+
+
+def test_island_spatial_index(resourcepath):
+    success, world_uid = micropsi.new_world("Misland", "Island", owner="tester")
+    world = runtime.worlds[world_uid]
+    runtime.add_worldobject(world_uid, "Lightsource", (10, 10), uid='lamp', name='lamp', parameters={})
+    runtime.add_worldobject(world_uid, "Stone", (520, 510), uid='stone', name='stone', parameters={})
+    runtime.add_worldobject(world_uid, "Boulder", (900, 900), uid='boulder', name='boulder', parameters={})
+    assert world.object_index.get_nearest_object((500, 500)) is world.objects['stone']
+    assert list(world.object_index.lightsources.keys()) == ['lamp']
+    runtime.set_worldobject_properties(world_uid, "boulder", position=(495, 495))
+    assert world.object_index.get_nearest_object((500, 500)) is world.objects['boulder']
+    runtime.delete_worldobject(world_uid, "boulder")
+    assert world.object_index.get_nearest_object((500, 500)) is world.objects['stone']
+    assert world.object_index.get_nearest_object((0, 0)) is world.objects['lamp']
+    assert world.get_movement_result((520, 509.5), (0, 0.5), 1) == (520, 509.5)
+    assert world.get_movement_result((520, 400), (0, 5), 1) != (520, 400)
+    assert world.get_brightness_at((10, 10)) == world.objects['lamp'].get_intensity()
+    runtime.delete_world(world_uid)
+
+
+def test_island_groundmap(resourcepath):
+    import os
+    import numpy as np
+    from micropsi_core.world.island import island
+    success, world_uid = micropsi.new_world("Misland", "Island", owner="tester")
+    world = runtime.worlds[world_uid]
+    assert world.ground_data.dtype == np.uint8
+    assert world.ground_data.shape == (256, 256)
+    filename = os.path.join(os.path.dirname(island.__file__), 'resources', 'groundmaps', 'psi_1.png')
+    with open(filename, 'rb') as file:
+        x, y, rows, params = island.png.Reader(file).read()
+        rows = list(rows)
+    # the cached map is the decoded png
+    assert np.array_equal(island.load_groundmap_array(filename), np.array(rows, dtype=np.uint8))
+    positions = [(0, 0), (700, 400), (1003.9, 517), (5000, -20)]
+    xs, ys = zip(*positions)
+    assert world.get_ground_types_at(xs, ys).tolist() == [world.get_ground_at(x, y) for x, y in positions]
+    assert world.get_ground_at(700, 400) == rows[50][88]
+    assert island.ground_agent_allowed[world.get_ground_types_at([700], [400])].all()
+    runtime.delete_world(world_uid)
+
+
+def test_island_groundmap_cache_cleanup(tmpdir):
+    import os
+    import shutil
+    from micropsi_core.world.island import island
+    source = os.path.join(os.path.dirname(island.__file__), 'resources', 'groundmaps', 'psi_1.png')
+    filename = str(tmpdir.join('map.png'))
+    shutil.copy(source, filename)
+    stale = tmpdir.join('map.0123456789abcdef.npy')
+    other = tmpdir.join('map.v2.0123456789abcdef.npy')
+    stale.write('')
+    other.write('')
+    island.load_groundmap_array(filename)
+    assert not stale.check()
+    assert other.check()
+    caches = [name for name in os.listdir(str(tmpdir)) if name.startswith('map.') and name.count('.') == 2 and name.endswith('.npy')]
+    assert len(caches) == 1
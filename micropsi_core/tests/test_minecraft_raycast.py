@@ -0,0 +1,79 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the block cache and the batched ray casting of the minecraft vision
+"""
+import numpy as np
+
+from micropsi_core.world.minecraft import raycast
+from micropsi_core.tools import Bunch
+from micropsi_core.world.minecraft.block_cache import BlockCache
+
+
+def test_block_cache():
+    cache = BlockCache(capacity=1)
+    section = np.zeros((16, 16, 16), dtype=np.uint16)
+    section[3, 2, 1] = 17 << 4 | 2  # wood at (1, 3, 2) of the section
+    cache.set_section(-1, 4, 0, section)
+    cache.set_section(0, 0, 0, np.zeros((16, 16, 16), dtype=np.uint16))
+    assert len(cache) == 2
+    xs, ys, zs = [-15, -15, -15, 0, 0, 40], [67, 66, 3, 3, -1, 3], [2, 2, 2, 0, 0, 0]
+    assert cache.get_block_types(xs, ys, zs).tolist() == [17, 0, -1, 0, -1, -1]
+    cache.set_block(0, 1, 0, 1 << 4)
+    cache.set_block(-15, 3, 2, 5 << 4)
+    assert cache.get_block_types(xs, ys, zs).tolist() == [17, 0, 5, 0, -1, -1]
+    assert cache.get_block_types([0.5], [1.9], [0.2]).tolist() == [1]
+    cache.update_column(-1, 0, None)
+    assert (-1, 0) not in cache
+    assert cache.get_block_types(xs, ys, zs).tolist() == [-1, -1, -1, 0, -1, -1]
+    # columns without any loaded section don't keep a slot
+    free_slots = len(cache.free_slots)
+    cache.update_column(0, 0, Bunch(chunks=[None] * 16))
+    cache.update_column(3, 3, Bunch(chunks=[None] * 16))
+    assert len(cache) == 0
+    assert len(cache.free_slots) == free_slots + 1
+
+
+def test_cast_rays_finds_first_block():
+    cache = BlockCache()
+    for cx in (-2, -1):
+        for cy in (0, 1):
+            for cz in (-1, 0):
+                cache.set_section(cx, cy, cz, np.zeros((16, 16, 16), dtype=np.uint16))
+    for y in range(32):
+        for z in range(-16, 16):
+            cache.set_block(-12, y, z, 1 << 4)  # a wall at x == -12
+    cache.set_block(-16, 0, 9, 5 << 4)  # a single block at (-16, 0, 9)
+    origins = [(-15.5, 0.5, 0.5), (-15.5, 0.5, 0.5), (-15.5, 0.2, 0.5), (-30.5, 0.5, 0.5)]
+    directions = [(1, 0, 0), (0, 0, 1), (1, 0.2, 0), (-1, 0, 0)]
+    block_types, distances = raycast.cast_rays(origins, directions, cache.get_block_types, 10)
+    assert block_types.tolist() == [1, 5, 1, -1]
+    assert np.allclose(distances[:2], [3.5, 8.5])
+    # the slanted ray enters the wall after 3.5 blocks in x
+    assert np.isclose(distances[2], 3.5 * np.sqrt(1.04))
+    # the last ray leaves the loaded chunks
+    assert distances[3] == 10
+
+
+def test_cast_rays_visits_every_voxel():
+    visited = []
+
+    def get_block_types(xs, ys, zs):
+        visited.extend(zip(xs.tolist(), ys.tolist(), zs.tolist()))
+        return np.zeros(len(xs), dtype=np.int64)
+
+    block_types, distances = raycast.cast_rays([(0.5, 0.5, 0.5)], [(1, 1, 0)], get_block_types, 3)
+    assert block_types.tolist() == [0]
+    assert visited[0] == (0, 0, 0)
+    # consecutive voxels are face neighbours
+    for a, b in zip(visited, visited[1:]):
+        assert sum(abs(i - j) for i, j in zip(a, b)) == 1
+    assert visited[-1] in [(2, 2, 0), (2, 1, 0), (1, 2, 0)]
+
+
+def test_image_rays_rotate_with_the_camera():
+    origins, directions = raycast.image_rays([(0, 0, 1)], (0, 0, 0), 90, 0)
+    assert np.allclose(directions, [(1, 0, 0)])
+    origins, directions = raycast.image_rays([(0, 0, 1)], (0, 0, 0), 0, 90)
+    assert np.allclose(directions, [(0, -1, 0)])
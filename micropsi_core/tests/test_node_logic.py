@@ -5,6 +5,7 @@
 Tests for node activation propagation and gate arithmetic
 """
 
+import pytest
 from micropsi_core import runtime as micropsi
 from micropsi_core.world.world import World
 from micropsi_core.world.worldadapter import WorldAdapter
@@ -116,6 +117,22 @@ def test_node_logic_cancel(fixed_nodenet):
     assert reg_result.get_gate("gen").activation == 0
 
 
+@pytest.mark.engine("dict_engine")
+def test_node_logic_linkmatrix_follows_link_changes(fixed_nodenet):
+    # the cached link matrix has to pick up weight changes and new links
+    net, netapi, source = prepare(fixed_nodenet)
+    matrix = net.linkmatrix
+    assert matrix is not None
+    netapi.link(source, "gen", source, "gen", 0.5)
+    net.step()
+    assert source.get_gate("gen").activation == 0.5
+    register = netapi.create_node("Register", None, "Register")
+    netapi.link(source, "gen", register, "gen", 0.5)
+    assert net.linkmatrix is None
+    net.step()
+    assert register.get_gate("gen").activation == 0.25
+
+
 def test_node_logic_store_and_forward(fixed_nodenet):
     # collect activation in one node, go forward only if both dependencies are met
     net, netapi, source = prepare(fixed_nodenet)
@@ -541,6 +541,25 @@ def test_node_netapi_link_change_weight(fixed_nodenet):
         assert link.data['target_node_uid'] == node1.uid
 
 
+def test_node_netapi_link_many(fixed_nodenet):
+    # test creating several links at once
+    net, netapi, source = prepare(fixed_nodenet)
+    node1 = netapi.create_node("Register", None, "TestName1")
+    node2 = netapi.create_node("Register", None, "TestName2")
+    node3 = netapi.create_node("Pipe", None, "TestName3")
+    netapi.link_many([node1, node2, node2], ["gen", "gen", "gen"], [node2, node3, node3], ["gen", "sub", "sub"], [0.5, 1, 0.7])
+
+    assert len(node1.get_gate("gen").get_links()) == 1
+    assert node1.get_gate("gen").get_links()[0].target_node.uid == node2.uid
+    assert round(node1.get_gate("gen").get_links()[0].weight, 5) == 0.5
+    assert len(node2.get_gate("gen").get_links()) == 1
+    assert node3.get_slot("sub").get_links()[0].source_node.uid == node2.uid
+    assert round(node3.get_slot("sub").get_links()[0].weight, 5) == 0.7
+
+    netapi.link_many([node1], ["gen"], [node2], ["gen"])
+    assert node1.get_gate("gen").get_links()[0].weight == 1
+
+
 def test_node_netapi_link_with_reciprocal(fixed_nodenet):
     # test linking pipe and concept nodes with reciprocal links
     net, netapi, source = prepare(fixed_nodenet)
@@ -665,3 +665,20 @@ def test_node_pipe_logic_search_exp(fixed_nodenet):
 
     assert n_b.get_gate("exp").activation > 0
     assert n_a.get_gate("exp").activation > 0
+
+
+def test_node_pipe_logic_por_link_decay(fixed_nodenet):
+    # test that positive por links decay with the por_ret_decay modulator
+    net, netapi, source = prepare(fixed_nodenet)
+    n_a = netapi.create_node("Pipe", None, "A")
+    n_b = netapi.create_node("Pipe", None, "B")
+    n_c = netapi.create_node("Pipe", None, "C")
+    netapi.link(n_a, "por", n_b, "por", 0.8)
+    netapi.link(n_a, "por", n_c, "por", -0.5)
+    netapi.link(n_a, "sub", n_b, "sub", 0.8)
+    net.set_modulator("por_ret_decay", 0.1)
+    net.step()
+    net.step()
+    assert round(n_b.get_slot("por").get_links()[0].weight, 3) == round(0.8 * 0.9 * 0.9, 3)
+    assert round(n_c.get_slot("por").get_links()[0].weight, 3) == -0.5
+    assert round(n_b.get_slot("sub").get_links()[0].weight, 3) == 0.8
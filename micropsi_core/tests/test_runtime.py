@@ -90,6 +90,81 @@ def test_register_runner_condition_monitor(test_nodenet):
     assert round(nn.get_node(node.uid).get_gate('gen').activation, 4) == 0.8
 
 
+def test_run_steps(test_nodenet):
+    nn = micropsi.nodenets[test_nodenet]
+    node = nn.netapi.create_node('Register', None)
+    uid = micropsi.add_gate_monitor(test_nodenet, node.uid, 'gen')
+    result, data = micropsi.run_steps(test_nodenet, 250)
+    assert result
+    assert data['steps'] == 250
+    assert data['current_step'] == nn.current_step == 250
+    assert len(nn.get_monitor(uid).values) == 0
+    assert not nn.is_active
+
+    result, data = micropsi.run_steps(test_nodenet, 5, world=False, monitors=True)
+    assert data['current_step'] == 255
+    assert len(nn.get_monitor(uid).values) == 5
+    assert test_nodenet not in micropsi.batch_runs
+
+
+def test_run_steps_excludes_runner(test_nodenet):
+    nn = micropsi.nodenets[test_nodenet]
+    nn.is_active = True
+    try:
+        result, msg = micropsi.run_steps(test_nodenet, 5)
+        assert not result
+        assert nn.current_step == 0
+    finally:
+        nn.is_active = False
+
+    micropsi.batch_runs[test_nodenet] = {'steps': 5, 'done': 0}
+    try:
+        result, msg = micropsi.start_nodenetrunner(test_nodenet)
+        assert not result
+        assert not nn.is_active
+    finally:
+        del micropsi.batch_runs[test_nodenet]
+
+
+def test_run_steps_drops_debug_logs(test_nodenet):
+    nn = micropsi.nodenets[test_nodenet]
+    step = nn.step
+
+    def logging_step():
+        step()
+        nn.logger.info("info in step %d" % nn.current_step)
+        nn.logger.warning("warning in step %d" % nn.current_step)
+
+    level = logging.getLogger('nodenet').level
+    micropsi.set_logging_levels(nodenet='DEBUG')
+    nn.step = logging_step
+    try:
+        micropsi.run_steps(test_nodenet, 2)
+        messages = [l['msg'] for l in micropsi.get_logger_messages('nodenet')['logs']]
+        assert "warning in step 2" in messages
+        assert "info in step 2" not in messages
+        micropsi.run_steps(test_nodenet, 1, log=True)
+        messages = [l['msg'] for l in micropsi.get_logger_messages('nodenet')['logs']]
+        assert "info in step 3" in messages
+    finally:
+        del nn.step
+        logging.getLogger('nodenet').setLevel(level)
+
+
+def test_runner_groups_nodenets_by_world(test_nodenet, test_world, engine):
+    success, other_uid = micropsi.new_nodenet("Othernet", engine=engine, worldadapter="Braitenberg", owner="Pytest User", world_uid=test_world)
+    micropsi.set_nodenet_properties(test_nodenet, worldadapter="Braitenberg", world_uid=test_world)
+    micropsi.nodenets[test_nodenet].is_active = True
+    micropsi.nodenets[other_uid].is_active = True
+    groups = micropsi.runner['runner'].get_nodenet_groups()
+    assert sorted(groups[0]) == sorted([test_nodenet, other_uid])
+    assert micropsi.runner['runner'].step_nodenet_group(groups[0])
+    assert micropsi.nodenets[test_nodenet].current_step == 1
+    assert micropsi.nodenets[other_uid].current_step == 1
+    micropsi.nodenets[test_nodenet].is_active = False
+    micropsi.nodenets[other_uid].is_active = False
+
+
 def test_get_links_for_nodes(test_nodenet, node):
     api = micropsi.nodenets[test_nodenet].netapi
     ns = api.create_nodespace(None)
@@ -105,3 +180,87 @@ def test_get_links_for_nodes(test_nodenet, node):
     assert pipe1.uid in data['nodes']
     assert pipe2.uid in data['nodes']
     assert pipe3.uid not in data['nodes']
+
+
+def test_nodenet_stream_subscription(fixed_nodenet):
+    monitor_uid = micropsi.add_gate_monitor(fixed_nodenet, 'n0001', 'gen')
+    subscription = micropsi.subscribe_nodenet_stream(fixed_nodenet, nodespace='Root', monitors=True)
+    assert subscription.wait(0)
+    frame = subscription.next_frame()
+    assert 'delta' not in frame['nodenet']
+    assert not subscription.wait(0)
+    micropsi.step_nodenet(fixed_nodenet)
+    micropsi.step_nodenet(fixed_nodenet)
+    assert subscription.wait(0)
+    frame = subscription.next_frame()
+    assert frame['current_step'] == 2
+    assert frame['dropped_frames'] == 1
+    assert frame['nodenet']['delta']
+    assert sorted(frame['monitors'][monitor_uid]['values'].keys()) == [1, 2]
+    micropsi.unsubscribe_nodenet_stream(subscription)
+    assert fixed_nodenet not in micropsi.stream_subscriptions
+    subscription = micropsi.subscribe_nodenet_stream(fixed_nodenet, nodespace='Root', viewport=[-1000, -1000, -900, -900])
+    frame = subscription.next_frame()
+    assert frame['nodenet']['nodes'] == {}
+    assert 'nodetypes' not in frame['nodenet']
+    micropsi.unsubscribe_nodenet_stream(subscription)
+
+
+def test_nodenet_stream_logs(fixed_nodenet, monkeypatch):
+    import time
+    micropsi.set_logging_levels(nodenet='INFO')
+    subscription = micropsi.subscribe_nodenet_stream(fixed_nodenet, logger=['nodenet'])
+    subscription.next_frame()
+    # records of the same millisecond are told apart
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+    logging.getLogger('nodenet').info("first")
+    assert [l['msg'] for l in subscription.next_frame()['logs']] == ["first"]
+    logging.getLogger('nodenet').info("second")
+    assert [l['msg'] for l in subscription.next_frame()['logs']] == ["second"]
+    assert subscription.next_frame()['logs'] == []
+    micropsi.unsubscribe_nodenet_stream(subscription)
+
+
+def test_definition_index(test_nodenet, resourcepath):
+    import os
+    import json
+    path = os.path.join(resourcepath, micropsi.NODENET_DIRECTORY)
+    micropsi.save_nodenet(test_nodenet)
+    indexfile = os.path.join(path, micropsi.DEFINITION_INDEX_FILENAME)
+    with open(indexfile) as fp:
+        index = json.load(fp)
+    key = test_nodenet + '.json'
+    assert index['files'][key]['definition']['uid'] == test_nodenet
+    # unchanged files are not parsed again
+    index['files'][key]['definition']['name'] = 'from index'
+    with open(indexfile, 'w') as fp:
+        json.dump(index, fp)
+    assert micropsi.crawl_definition_files(path)[test_nodenet].name == 'from index'
+    # changed files are
+    filename = os.path.join(path, key)
+    stat = os.stat(filename)
+    os.utime(filename, (stat.st_atime, stat.st_mtime + 10))
+    data = micropsi.crawl_definition_files(path)[test_nodenet]
+    assert data.name != 'from index'
+    assert data.filename == filename
+    micropsi.delete_nodenet(test_nodenet)
+    with open(indexfile) as fp:
+        assert key not in json.load(fp)['files']
+
+
+def test_definition_crawl_skips_partition_data(test_nodenet, resourcepath, recwarn):
+    import os
+    import json
+    import warnings
+    path = os.path.join(resourcepath, micropsi.NODENET_DIRECTORY)
+    micropsi.save_nodenet(test_nodenet)
+    # the manifest written along with partition arrays saved in the npy format
+    directory = os.path.join(path, test_nodenet + "-data-000")
+    os.makedirs(directory)
+    with open(os.path.join(directory, "manifest.json"), 'w') as fp:
+        json.dump({'version': 1, 'arrays': {}}, fp)
+    warnings.simplefilter("always")
+    assert list(micropsi.crawl_definition_files(path).keys()) == [test_nodenet]
+    assert not [w for w in recwarn.list if 'manifest.json' in str(w.message)]
+    with open(os.path.join(path, micropsi.DEFINITION_INDEX_FILENAME)) as fp:
+        assert list(json.load(fp)['files'].keys()) == [test_nodenet + '.json']
@@ -164,3 +164,91 @@ def test_clear_monitor(fixed_nodenet):
     data = micropsi.get_monitor_data(fixed_nodenet)
     values = data['monitors'][uid]['values']
     assert len(values.keys()) == 0
+
+
+def test_monitor_values_ring_buffer():
+    from micropsi_core.nodenet.monitor import MonitorValues
+    values = MonitorValues(capacity=4, downsampling=False)
+    for step in range(1, 11):
+        values[step] = step * 0.5
+    values[11] = None
+    assert len(values) == 4
+    assert values.keys() == [8, 9, 10, 11]
+    assert 7 not in values
+    assert values[8] == 4.0
+    assert values[11] is None
+    steps, data = values.get_range(9, 10)
+    assert list(steps) == [9, 10]
+    assert list(data) == [4.5, 5.0]
+    assert values.to_dict(from_step=10) == {10: 5.0, 11: None}
+    values[9] = 1
+    assert values.keys() == [8, 9]
+
+
+def test_monitor_values_invalid_retention():
+    from configuration import config
+    from micropsi_core.nodenet.monitor import MonitorValues
+    retention = config['micropsi2'].get('monitor_retention')
+    config['micropsi2']['monitor_retention'] = 'lots'
+    try:
+        assert MonitorValues().capacity == 10000
+    finally:
+        if retention is None:
+            del config['micropsi2']['monitor_retention']
+        else:
+            config['micropsi2']['monitor_retention'] = retention
+
+
+def test_monitor_values_downsampling():
+    from micropsi_core.nodenet.monitor import MonitorValues
+    values = MonitorValues(capacity=8, downsampling=True)
+    for step in range(1, 10):
+        values[step] = step
+    assert len(values) == 7
+    assert values.items() == [(1, 1.5), (3, 3.5), (5, 5), (6, 6), (7, 7), (8, 8), (9, 9)]
+
+
+def test_get_monitor_data_from_step(fixed_nodenet):
+    uid = micropsi.add_gate_monitor(fixed_nodenet, 'n0001', 'gen')
+    for i in range(3):
+        micropsi.step_nodenet(fixed_nodenet)
+    data = micropsi.get_monitor_data(fixed_nodenet, 0, monitor_from_step=3)
+    assert list(data['monitors'][uid]['values'].keys()) == [3]
+
+
+@pytest.mark.engine("theano_engine")
+def test_gate_monitors_sampled_in_batch(fixed_nodenet):
+    net = micropsi.nodenets[fixed_nodenet]
+    uid1 = micropsi.add_gate_monitor(fixed_nodenet, 'n0001', 'gen')
+    uid2 = micropsi.add_gate_monitor(fixed_nodenet, 'n0002', 'gen')
+    net.get_node('n0001').activation = 0.7
+    net.update_monitors()
+    assert round(net.get_monitor(uid1).values[net.current_step], 2) == 0.7
+    assert net.get_monitor(uid2).values[net.current_step] == net.get_node('n0002').get_gate('gen').activation
+    micropsi.delete_node(fixed_nodenet, 'n0001')
+    micropsi.step_nodenet(fixed_nodenet)
+    assert net.get_monitor(uid1).values[net.current_step] is None
+
+
+def test_get_step_profile(fixed_nodenet):
+    assert not micropsi.get_step_profile(fixed_nodenet)['enabled']
+    micropsi.step_nodenet(fixed_nodenet)
+    assert micropsi.get_step_profile(fixed_nodenet)['sections'] == {}
+    micropsi.set_step_profiling(fixed_nodenet, True)
+    for i in range(3):
+        micropsi.step_nodenet(fixed_nodenet)
+    profile = micropsi.get_step_profile(fixed_nodenet)
+    assert profile['enabled']
+    sections = profile['sections']
+    assert sections['monitor update']['count'] == 3
+    operators = [op.__class__.__name__ for op in micropsi.nodenets[fixed_nodenet].stepoperators]
+    for name in operators:
+        assert sections[name]['count'] == 3
+        assert sum(sections[name]['histogram']) == 3
+        assert len(sections[name]['histogram']) == len(profile['histogram_bin_edges']) - 1
+        assert sections[name]['max'] >= sections[name]['median'] >= 0
+    micropsi.set_step_profiling(fixed_nodenet, False)
+    micropsi.step_nodenet(fixed_nodenet)
+    assert micropsi.get_step_profile(fixed_nodenet)['sections']['monitor update']['count'] == 3
+    micropsi.reset_step_profile(fixed_nodenet)
+    assert micropsi.get_monitoring_info(fixed_nodenet, step_profile=True)['step_profile']['sections'] == {}
@@ -5,6 +5,7 @@
 
 """
 import os
+import json
 from micropsi_core import runtime
 from micropsi_core import runtime as micropsi
 import mock
@@ -123,6 +124,67 @@ def test_nodespace_removal(fixed_nodenet):
     assert sub_uid not in micropsi.nodenets[fixed_nodenet].data['nodespaces']
 
 
+@pytest.mark.engine("dict_engine")
+def test_nodespace_data_scoped_to_nodespace(fixed_nodenet):
+    res, uid = micropsi.add_nodespace(fixed_nodenet, [100, 100], nodespace=None, name="testspace")
+    res, sub_uid = micropsi.add_nodespace(fixed_nodenet, [100, 100], nodespace=uid, name="subsubspace")
+    res, n1_uid = micropsi.add_node(fixed_nodenet, 'Register', [100, 100], nodespace=uid, name="sub1")
+    res, n2_uid = micropsi.add_node(fixed_nodenet, 'Register', [100, 200], nodespace=sub_uid, name="sub2")
+    micropsi.add_link(fixed_nodenet, n1_uid, 'gen', n2_uid, 'gen', weight=1, certainty=1)
+    data = micropsi.nodenets[fixed_nodenet].get_nodespace_data(uid, True)
+    assert set(data['nodespaces'].keys()) == {uid, sub_uid}
+    # the node at the other end of the boundary link comes along
+    assert set(data['nodes'].keys()) == {n1_uid, n2_uid}
+    assert len(data['links']) == 1
+    data = micropsi.nodenets[fixed_nodenet].get_nodespace_data(sub_uid, False)
+    assert set(data['nodes'].keys()) == {n2_uid}
+    assert set(data['nodespaces'].keys()) == {sub_uid}
+
+
+@pytest.mark.engine("dict_engine")
+def test_incremental_save(fixed_nodenet, resourcepath):
+    filename = os.path.join(resourcepath, runtime.NODENET_DIRECTORY, fixed_nodenet + ".json")
+    deltafilename = os.path.join(resourcepath, runtime.NODENET_DIRECTORY, fixed_nodenet + ".delta")
+    micropsi.save_nodenet(fixed_nodenet)
+    with open(filename) as fp:
+        base = fp.read()
+    micropsi.set_link_weight(fixed_nodenet, 'n0005', 'gen', 'n0003', 'gen', weight=0.5)
+    micropsi.delete_node(fixed_nodenet, 'n0002')
+    micropsi.save_nodenet(fixed_nodenet)
+    # only the delta log was written
+    assert os.path.isfile(deltafilename)
+    with open(filename) as fp:
+        assert fp.read() == base
+    micropsi.revert_nodenet(fixed_nodenet)
+    nodenet = micropsi.nodenets[fixed_nodenet]
+    assert not nodenet.is_node('n0002')
+    links = nodenet.get_node('n0005').get_gate('gen').get_links()
+    assert [l.weight for l in links if l.target_node.uid == 'n0003'] == [0.5]
+    # stepping changes activations without marking the nodes as changed
+    micropsi.step_nodenet(fixed_nodenet)
+    micropsi.step_nodenet(fixed_nodenet)
+    micropsi.set_node_activation(fixed_nodenet, 'n0005', 0.7)
+    activations = dict((uid, nodenet.get_node(uid).activation) for uid in nodenet.get_node_uids())
+    assert any(activations.values())
+    micropsi.save_nodenet(fixed_nodenet)
+    with open(filename) as fp:
+        assert fp.read() == base
+    micropsi.revert_nodenet(fixed_nodenet)
+    nodenet = micropsi.nodenets[fixed_nodenet]
+    assert dict((uid, nodenet.get_node(uid).activation) for uid in nodenet.get_node_uids()) == activations
+    # only the activations that differ from the persisted ones are recorded
+    micropsi.set_node_activation(fixed_nodenet, 'n0005', 0.2)
+    micropsi.save_nodenet(fixed_nodenet)
+    with open(deltafilename) as fp:
+        record = json.loads(fp.readlines()[-1])
+    assert list(record['activations'].keys()) == ['n0005']
+    micropsi.save_nodenet(fixed_nodenet)
+    with open(deltafilename) as fp:
+        assert 'activations' not in json.loads(fp.readlines()[-1])
+    micropsi.delete_nodenet(fixed_nodenet)
+    assert not os.path.isfile(deltafilename)
+
+
 def test_clone_nodes_nolinks(fixed_nodenet):
     nodenet = micropsi.get_nodenet(fixed_nodenet)
     success, result = micropsi.clone_nodes(fixed_nodenet, ['n0001', 'n0002'], 'none', offset=[10, 20])
@@ -339,3 +401,95 @@ def test_multiple_nodenet_interference(engine, nodetype_def, nodefunc_def):
     assert round(register2.get_slot('gen').get_links()[0].weight, 2) == 0.9
     assert register2.get_slot('gen').get_links()[0].source_node.name == 'Source2'
     assert n2.get_node(register2.uid).name == "Register2"
+
+
+def test_get_nodenet_data_delta(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    full = micropsi.get_nodenet_data(fixed_nodenet, None, revision=None)
+    assert 'delta' not in full
+    assert 'n0001' in full['nodes']
+    micropsi.step_nodenet(fixed_nodenet)
+    micropsi.delete_node(fixed_nodenet, 'n0005')
+    uid = micropsi.add_node(fixed_nodenet, 'Register', [10, 10], None, name='new')[1]
+    micropsi.step_nodenet(fixed_nodenet)
+    delta = micropsi.get_nodenet_data(fixed_nodenet, None, revision=full['revision'])
+    assert delta['delta']
+    assert delta['revision'] != full['revision']
+    assert delta['removed_nodes'] == ['n0005']
+    assert uid in delta['nodes']
+    assert 'n0001' not in delta['nodes']
+    assert 'nodetypes' not in delta
+    again = micropsi.get_nodenet_data(fixed_nodenet, None, revision=delta['revision'])
+    assert again['nodes'] == {} and again['removed_nodes'] == [] and again['activations'] == {}
+    assert again['revision'] == delta['revision']
+
+
+def test_get_nodenet_data_delta_after_edits(fixed_nodenet):
+    full = micropsi.get_nodenet_data(fixed_nodenet, None)
+    uid = micropsi.add_node(fixed_nodenet, 'Register', [10, 10], None, name='new')[1]
+    delta = micropsi.get_nodenet_data(fixed_nodenet, None, revision=full['revision'])
+    assert delta['delta']
+    assert list(delta['nodes'].keys()) == [uid]
+    micropsi.set_node_position(fixed_nodenet, uid, [20, 20])
+    micropsi.delete_link(fixed_nodenet, 'n0005', 'gen', 'n0003', 'gen')
+    moved = micropsi.get_nodenet_data(fixed_nodenet, None, revision=delta['revision'])
+    assert moved['revision'] != delta['revision']
+    assert moved['nodes'][uid]['position'][:2] == [20, 20]
+    assert len(moved['removed_links']) == 1
+
+
+def test_get_nodenet_data_viewport_and_pages(test_nodenet):
+    uids = []
+    for i in range(5):
+        res, uid = micropsi.add_node(test_nodenet, 'Register', [100 * i + 50, 50], None, name="n%d" % i)
+        uids.append(uid)
+    micropsi.add_link(test_nodenet, uids[1], 'gen', uids[4], 'gen', weight=1, certainty=1)
+    data = micropsi.get_nodenet_data(test_nodenet, None, viewport=[0, 0, 250, 100], include_nodetypes=False)
+    # the node at the other end of the link comes along
+    assert set(data['nodes'].keys()) == {uids[0], uids[1], uids[2], uids[4]}
+    assert len(data['links']) == 1
+    assert 'nodetypes' not in data
+    micropsi.set_node_position(test_nodenet, uids[3], [120, 60])
+    data = micropsi.get_nodenet_data(test_nodenet, None, viewport=[0, 0, 250, 100], include_links=False)
+    assert set(data['nodes'].keys()) == {uids[0], uids[1], uids[2], uids[3]}
+    assert 'nodetypes' in data
+    pages = []
+    cursor = None
+    while True:
+        data = micropsi.get_nodenet_data(test_nodenet, None, include_links=False, cursor=cursor, page_size=2)
+        pages.append(sorted(data['nodes'].keys()))
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    assert pages == [sorted(uids)[0:2], sorted(uids)[2:4], sorted(uids)[4:]]
+    with pytest.raises(ValueError):
+        micropsi.get_nodenet_data(test_nodenet, None, include_links=False, page_size=0)
+    micropsi.delete_node(test_nodenet, uids[0])
+    data = micropsi.get_nodenet_data(test_nodenet, None, viewport=[0, 0, 250, 100], include_links=False)
+    assert uids[0] not in data['nodes']
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_viewport_links(test_nodenet):
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    netapi = nodenet.netapi
+    nodespace = netapi.create_nodespace(None, "partition", options={"new_partition": True})
+    inside = netapi.get_node(micropsi.add_node(test_nodenet, "Pipe", [50, 50], None, name="inside")[1])
+    outside = netapi.get_node(micropsi.add_node(test_nodenet, "Register", [500, 50], None, name="outside")[1])
+    unrelated = netapi.get_node(micropsi.add_node(test_nodenet, "Register", [600, 50], None, name="unrelated")[1])
+    remote = netapi.get_node(micropsi.add_node(test_nodenet, "Register", [50, 50], nodespace.uid, name="remote")[1])
+    netapi.link(outside, "gen", inside, "sur", 0.5)
+    netapi.link(inside, "por", outside, "gen", 0.3)
+    netapi.link(remote, "gen", inside, "gen")
+    netapi.link(inside, "gen", remote, "gen")
+    netapi.link(outside, "gen", unrelated, "gen")
+
+    data = micropsi.get_nodenet_data(test_nodenet, None, viewport=[0, 0, 250, 100])
+    assert set(data['nodes'].keys()) == {inside.uid, outside.uid, remote.uid}
+    links = dict(((l['source_node_uid'], l['source_gate_name'], l['target_slot_name'], l['target_node_uid']), l['weight'])
+                 for l in data['links'].values())
+    assert len(links) == 4
+    assert round(links[(outside.uid, "gen", "sur", inside.uid)], 3) == 0.5
+    assert round(links[(inside.uid, "por", "gen", outside.uid)], 3) == 0.3
+    assert (remote.uid, "gen", "gen", inside.uid) in links
+    assert (inside.uid, "gen", "gen", remote.uid) in links
@@ -4,6 +4,7 @@
 """
 
 """
+import os
 from micropsi_core import runtime as micropsi
 import pytest
 
@@ -101,6 +102,35 @@ def test_add_link(test_nodenet):
     assert link2["target_slot_name"] == "gen"
 
 
+def test_add_links(test_nodenet):
+    nodes = prepare_nodenet(test_nodenet)
+    result, count = micropsi.add_links(test_nodenet, [
+        [nodes['a'], "por", nodes['b'], "por", 0.5],
+        [nodes['b'], "ret", nodes['a'], "ret"],
+        [nodes['s'], "gen", nodes['c'], "gen", 0.3],
+        [nodes['a'], "por", nodes['b'], "por", 0.8]
+    ])
+    assert result
+    assert count == 4
+
+    nodespace = micropsi.get_nodenet_data(test_nodenet, None)
+    links = dict((data['source_node_uid'], data) for data in nodespace["links"].values())
+    assert len(links) == 3
+    assert round(links[nodes['a']]['weight'], 3) == 0.8
+    assert links[nodes['a']]['target_slot_name'] == "por"
+    assert links[nodes['b']]['weight'] == 1
+    assert links[nodes['b']]['target_node_uid'] == nodes['a']
+    assert round(links[nodes['s']]['weight'], 3) == 0.3
+
+    # the pipes see their por/ret links right away
+    net = micropsi.get_nodenet(test_nodenet)
+    assert net.get_node(nodes['b']).get_slot("por").get_links()[0].source_node.uid == nodes['a']
+    assert net.get_node(nodes['a']).get_slot("ret").get_links()[0].source_node.uid == nodes['b']
+
+    result, message = micropsi.add_links(test_nodenet, [[nodes['a'], "por", nodes['b']]])
+    assert not result
+
+
 def test_delete_link(test_nodenet):
     nodes = prepare_nodenet(test_nodenet)
     success, link = micropsi.add_link(test_nodenet, nodes['a'], "por", nodes['b'], "gen", 0.5, 1)
@@ -315,3 +345,205 @@ def test_node_parameter_defaults(fixed_nodenet, resourcepath, nodetype_def, node
     res, uid = micropsi.add_node(fixed_nodenet, "Testnode", [10, 10], name="Test")
     node = micropsi.nodenets[fixed_nodenet].get_node(uid)
     assert node.get_parameter("testparam") == 13
+
+
+def test_theano_allocators():
+    import numpy as np
+    from micropsi_core.nodenet.theano_engine.theano_allocator import IdAllocator, RangeAllocator
+    ids = np.zeros(6, dtype=np.int32)
+    allocator = IdAllocator(reserved=1)
+    for expected in [1, 2, 3]:
+        id = allocator.allocate(ids)
+        assert id == expected
+        ids[id] = 1
+    ids[4] = 1  # taken without the allocator
+    ids[2] = 0
+    allocator.release(ids, 2)
+    assert allocator.allocate(ids) == 2
+    ids[2] = 1
+    assert allocator.allocate(ids) == 5
+    ids[5] = 1
+    assert allocator.allocate(ids) is None
+    # released IDs are handed out lowest first
+    for id in [1, 3]:
+        ids[id] = 0
+        allocator.release(ids, id)
+    assert allocator.allocate(ids) == 1
+
+    elements = np.zeros(20, dtype=np.int32)
+    allocator = RangeAllocator(reserved=1)
+    offsets = []
+    for node_id in range(1, 4):
+        offset = allocator.allocate(elements, 5)
+        elements[offset:offset + 5] = node_id
+        offsets.append(offset)
+    assert offsets == [1, 6, 11]
+    assert allocator.allocate(elements, 5) is None
+    for offset in offsets[:2]:
+        elements[offset:offset + 5] = 0
+        allocator.release(elements, offset, 5)
+    # the released ranges coalesce
+    assert allocator.allocate(elements, 9) == 1
+    grown = np.zeros(30, dtype=np.int32)
+    grown[:20] = elements
+    grown[1:10] = 1
+    assert allocator.allocate(grown, 8) == 16
+    # the smallest free range that fits is used
+    elements = np.ones(20, dtype=np.int32)
+    elements[2:8] = 0
+    elements[10:13] = 0
+    elements[15:19] = 0
+    allocator = RangeAllocator(reserved=1)
+    assert allocator.allocate(elements, 4) == 15
+    assert allocator.allocate(elements, 2) == 10
+    assert allocator.allocate(elements, 1) == 12
+    assert allocator.allocate(elements, 7) is None
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_node_ids_and_elements_are_reused(test_nodenet):
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    partition = nodenet.rootpartition
+    res, uid = micropsi.add_node(test_nodenet, "Pipe", (10, 10), None, name="A")
+    offset = partition.allocated_node_offsets[int(uid[4:])]
+    micropsi.delete_node(test_nodenet, uid)
+    res, uid2 = micropsi.add_node(test_nodenet, "Pipe", (10, 10), None, name="B")
+    assert uid2 == uid
+    assert partition.allocated_node_offsets[int(uid2[4:])] == offset
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_cross_partition_links_are_sparse(test_nodenet):
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    netapi = nodenet.netapi
+    nodespace = netapi.create_nodespace(None, "partition", options={"new_partition": True})
+    assert nodespace.uid == nodenet.get_partition(nodespace.uid).rootnodespace_uid
+    source = netapi.create_node("Register", None, "source")
+    targets = [netapi.create_node("Register", nodespace.uid, "target%d" % i) for i in range(3)]
+    netapi.link_many([source, source], ["gen", "gen"], [targets[0], targets[2]], ["gen", "gen"], [0.5, 0.3])
+
+    partition = nodenet.get_partition(nodespace.uid)
+    weights = partition.inlinks[nodenet.rootpartition.spid][2].get_value(borrow=True)
+    assert weights.nnz == 2
+    assert round(targets[0].get_slot("gen").get_links()[0].weight, 3) == 0.5
+    assert targets[1].get_slot("gen").get_links() == []
+    assert len(source.get_gate("gen").get_links()) == 2
+
+    source.activation = 1
+    nodenet.step()
+    assert round(targets[2].activation, 3) == 0.3
+
+    netapi.link(source, "gen", targets[2], "gen", 0)
+    assert partition.inlinks[nodenet.rootpartition.spid][2].get_value(borrow=True).nnz == 1
+
+    micropsi.save_nodenet(test_nodenet)
+    micropsi.revert_nodenet(test_nodenet)
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    links = nodenet.get_node(source.uid).get_gate("gen").get_links()
+    assert len(links) == 1
+    assert links[0].target_node.uid == targets[0].uid
+    assert round(links[0].weight, 3) == 0.5
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_cross_partition_links_are_merged_once(test_nodenet):
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    netapi = nodenet.netapi
+    nodespace = netapi.create_nodespace(None, "partition", options={"new_partition": True})
+    partition = nodenet.get_partition(nodespace.uid)
+    source = netapi.create_node("Register", None, "source")
+    targets = [netapi.create_node("Register", nodespace.uid, "target%d" % i) for i in range(3)]
+
+    merges = []
+    merge = partition.merge_pending_inlinks
+
+    def counting_merge():
+        merges.append(True)
+        merge()
+
+    partition.merge_pending_inlinks = counting_merge
+    for i, target in enumerate(targets):
+        nodenet.create_link(source.uid, "gen", target.uid, "gen", 0.1 * (i + 1))
+    nodenet.create_link(source.uid, "gen", targets[1].uid, "gen", 0)
+    assert merges == []
+
+    source.activation = 1
+    nodenet.step()
+    assert len(merges) == 1
+    assert partition.inlinks[nodenet.rootpartition.spid][2].get_value(borrow=True).nnz == 2
+    assert round(targets[0].activation, 3) == 0.1
+    assert targets[1].activation == 0
+    assert round(targets[2].activation, 3) == 0.3
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_compiled_functions_are_reused(test_nodenet, resourcepath):
+    from micropsi_core.nodenet.theano_engine.theano_function_cache import FunctionCache
+    partition = micropsi.get_nodenet(test_nodenet).rootpartition
+    directory = os.path.join(resourcepath, 'function_cache_test')
+    builds = []
+
+    def build_propagate(v):
+        builds.append(v)
+        return partition.build_propagate(v)
+
+    cache = FunctionCache(directory)
+    variables = dict(w=partition.w, a=partition.a, a_in=partition.a_in)
+    cache.get((partition.sparse,), variables, build_propagate)
+    propagate = cache.get((partition.sparse,), variables, build_propagate)
+    assert len(builds) == 1
+
+    # restarting loads the compiled function from disk
+    propagate = FunctionCache(directory).get((partition.sparse,), variables, build_propagate)
+    assert len(builds) == 1
+
+    a_in = partition.a_in.get_value()
+    a_in[1] = 0.5
+    partition.a_in.set_value(a_in)
+    propagate()
+    assert round(float(partition.a.get_value()[1]), 3) == 0.5
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_partition_capacity_doubles(test_nodenet):
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    netapi = nodenet.netapi
+    partition = nodenet.rootpartition
+    first = netapi.create_node("Pipe", None, "first")
+    second = netapi.create_node("Pipe", None, "second")
+    netapi.link(first, "por", second, "por", 0.5)
+    propagate = partition.propagate
+    initial_NoN = partition.NoN
+    initial_NoE = partition.NoE
+    for i in range(initial_NoN):
+        netapi.create_node("Pipe", None, "node%d" % i)
+    assert partition.NoN == 2 * initial_NoN
+    assert partition.NoE >= 2 * initial_NoE
+    assert partition.propagate is propagate
+    assert round(second.get_slot("por").get_links()[0].weight, 3) == 0.5
+    assert partition.n_node_porlinked.get_value()[partition.allocated_node_offsets[int(second.uid[4:])]] == 1
+
+
+@pytest.mark.engine("theano_engine")
+def test_theano_save_writes_changed_arrays_only(test_nodenet, resourcepath):
+    import numpy as np
+    nodenet = micropsi.get_nodenet(test_nodenet)
+    netapi = nodenet.netapi
+    node = netapi.create_node("Register", None, "reg")
+    netapi.link(node, "gen", node, "gen")
+    micropsi.save_nodenet(test_nodenet)
+    datafilename = os.path.join(resourcepath, micropsi.NODENET_DIRECTORY, test_nodenet + "-data-" + nodenet.rootpartition.spid)
+    archive = os.path.getmtime(datafilename + ".npz")
+    os.utime(datafilename + ".npz", (archive - 10, archive - 10))
+
+    node.activation = 0.5
+    nodenet.step()
+    micropsi.save_nodenet(test_nodenet)
+    # the activations went into the archive of changes, the main archive was left alone
+    assert os.path.getmtime(datafilename + ".npz") == archive - 10
+    assert 'a' in np.load(datafilename + ".changes.npz").files
+    assert 'w_data' not in np.load(datafilename + ".changes.npz").files
+
+    activation = node.activation
+    micropsi.revert_nodenet(test_nodenet)
+    assert round(micropsi.get_nodenet(test_nodenet).get_node(node.uid).activation, 3) == round(activation, 3)
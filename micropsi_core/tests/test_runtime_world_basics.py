@@ -232,4 +232,63 @@ def test_export_world(micropsi):
 def test_import_world(micropsi):
     assert 0
 
-"""
\ No newline at end of file
+"""
+
+def test_worlds_load_lazily_and_unload_when_idle(test_world):
+    runtime.worlds.unload(test_world)
+    assert not runtime.worlds.is_loaded(test_world)
+    assert test_world in runtime.get_available_worlds()
+    assert runtime.get_world_descriptors()[test_world].name == "World of Pain"
+    assert not runtime.worlds.is_loaded(test_world)
+    assert runtime.get_world_properties(test_world)['uid'] == test_world
+    assert runtime.worlds.is_loaded(test_world)
+    assert test_world in runtime.evict_idle_worlds(0)
+    assert not runtime.worlds.is_loaded(test_world)
+    # changed worlds stay until they are saved
+    runtime.add_worldobject(test_world, "Default", (10, 10), uid='foobar', name='foobar', parameters={})
+    assert test_world not in runtime.evict_idle_worlds(0)
+    runtime.save_world(test_world)
+    assert test_world in runtime.evict_idle_worlds(0)
+    assert 'foobar' in runtime.get_world_objects(test_world)
+
+
+def test_minecraft_unload_stops_shared_client_last():
+    import signal
+    import pytest
+    pytest.importorskip("spock")
+    from micropsi_core.tools import Bunch
+    from micropsi_core.world.minecraft.minecraft import Minecraft, Minecraft2D
+    calls = []
+
+    def make_world(cls):
+        world = cls.__new__(cls)
+        world.data = {}
+        world.agents = {}
+        world.spockplugin = Bunch(event=Bunch(kill=lambda: calls.append('kill')))
+        return world
+
+    first, second = make_world(Minecraft), make_world(Minecraft2D)
+    instances = {'spock': object(), 'thread': Bunch(join=lambda: calls.append('join')), 'signal_handler': first.kill_minecraft_thread}
+    with mock.patch.object(Minecraft, 'instances', instances):
+        runtime.add_signal_handler(first.kill_minecraft_thread)
+        runtime.worlds['minecraft'] = first
+        runtime.worlds['minecraft2d'] = second
+        try:
+            # the other world still uses the client
+            runtime.worlds.unload('minecraft')
+            assert calls == []
+            assert first.kill_minecraft_thread in runtime.signal_handler_registry
+            assert 'minecraft2d' in runtime.evict_idle_worlds(0)
+            assert calls == ['kill', 'join']
+            assert instances['thread'] is None
+            assert first.kill_minecraft_thread not in runtime.signal_handler_registry
+            for handler in list(runtime.signal_handler_registry):
+                if handler is not runtime.kill_runners:
+                    handler(signal.SIGTERM, None)
+            first.kill_minecraft_thread(signal.SIGTERM, None)
+            assert calls == ['kill', 'join']
+        finally:
+            runtime.remove_signal_handler(first.kill_minecraft_thread)
+            for uid in ['minecraft', 'minecraft2d']:
+                if runtime.worlds.is_loaded(uid):
+                    del runtime.worlds[uid]
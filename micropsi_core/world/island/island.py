@@ -1,6 +1,10 @@
 import math
 import os
+import re
+import glob
+import hashlib
 import logging
+import numpy as np
 from micropsi_core.world.world import World
 from micropsi_core.world.worldadapter import WorldAdapter
 from micropsi_core.world.worldobject import WorldObject
@@ -43,26 +47,47 @@ class Island(World):
         }
     }
 
+    # edge length of the cells of the spatial index over world objects
+    spatial_index_cell_size = 100
+
     def __init__(self, filename, world_type="Island", name="", owner="", engine=None, uid=None, version=1):
         World.__init__(self, filename, world_type=world_type, name=name, owner=owner, uid=uid, version=version)
         self.load_groundmap()
         # self.current_step = 0
         self.data['assets'] = self.assets
 
+    def initialize_world(self):
+        self.object_index = SpatialGrid(self.spatial_index_cell_size)
+        World.initialize_world(self)
+        for worldobject in self.objects.values():
+            self.object_index.add(worldobject)
+
+    def add_object(self, type, position, uid=None, orientation=0.0, name="", parameters=None, **data):
+        result, uid = World.add_object(self, type, position, uid=uid, orientation=orientation, name=name, parameters=parameters, **data)
+        if result:
+            self.object_index.add(self.objects[uid])
+        return result, uid
+
+    def delete_object(self, object_uid):
+        self.object_index.remove(object_uid)
+        return World.delete_object(self, object_uid)
+
+    def _worldobject_moved(self, worldobject):
+        if self.objects.get(worldobject.uid) is worldobject and hasattr(self, 'object_index'):
+            self.object_index.move(worldobject)
+
     def load_groundmap(self):
         """
         Imports a groundmap for an island world from a png file. We expect a bitdepth of 8 (i.e. each pixel defines
         a point with one of 256 possible values).
+        The decoded map is cached next to the png, keyed by the hash of the png, and memory-mapped from there.
         """
         filename = os.path.join(os.path.dirname(__file__), 'resources', 'groundmaps', self.groundmap["image"])
-        with open(filename, 'rb') as file:
-            png_reader = png.Reader(file)
-            x, y, image_array, image_params = png_reader.read()
-            self.ground_data = list(image_array)
-            self.scale_x = self.groundmap["scaling"][0]
-            self.scale_y = self.groundmap["scaling"][1]
-            self.x_max = x - 1
-            self.y_max = y - 1
+        self.ground_data = load_groundmap_array(filename)
+        self.scale_x = self.groundmap["scaling"][0]
+        self.scale_y = self.groundmap["scaling"][1]
+        self.y_max = self.ground_data.shape[0] - 1
+        self.x_max = self.ground_data.shape[1] - 1
 
     def get_ground_at(self, x, y):
         """
@@ -70,26 +95,33 @@ class Island(World):
         """
         _x = int(min(self.x_max, max(0, round(x / self.scale_x))))
         _y = int(min(self.y_max, max(0, round(y / self.scale_y))))
-        return self.ground_data[_y][_x]
+        return int(self.ground_data[_y, _x])
+
+    def get_ground_types_at(self, xs, ys):
+        """
+        returns the ground types at the given positions as an array of the shape of xs and ys
+        """
+        _x = np.clip(np.rint(np.asarray(xs, dtype=float) / self.scale_x), 0, self.x_max).astype(int)
+        _y = np.clip(np.rint(np.asarray(ys, dtype=float) / self.scale_y), 0, self.y_max).astype(int)
+        return self.ground_data[_y, _x]
 
     def get_brightness_at(self, position):
         """calculate the brightness of the world at the given position; used by sensors of agents"""
         brightness = 0
-        for key in self.objects:
-            if hasattr(self.objects[key], "get_intensity"):
-                # adapted from micropsi1
-                pos = self.objects[key].position
-                diff = (pos[0] - position[0], pos[1] - position[1])
-                dist = _2d_vector_norm(diff) + 1
-                lightness = self.objects[key].get_intensity()
-                brightness += (lightness /dist /dist)
+        for lightsource in self.object_index.lightsources.values():
+            # adapted from micropsi1
+            pos = lightsource.position
+            diff = (pos[0] - position[0], pos[1] - position[1])
+            dist = _2d_vector_norm(diff) + 1
+            lightness = lightsource.get_intensity()
+            brightness += (lightness /dist /dist)
         return brightness
 
     def get_movement_result(self, start_position, effort_vector, diameter=0):
         """determine how much an agent moves in the direction of the effort vector, starting in the start position.
         Note that agents may be hindered by impassable terrain and other objects"""
 
-        efficiency = ground_types[self.get_ground_at(*start_position)]['move_efficiency']
+        efficiency = float(ground_move_efficiency[self.get_ground_at(*start_position)])
         if not efficiency:
             return start_position
         movement_vector = (effort_vector[0] * efficiency, effort_vector[1] * efficiency)
@@ -99,13 +131,15 @@ class Island(World):
         while target_position is None and _2d_distance_squared((0, 0), movement_vector) > 0.01:
             target_position = _2d_translate(start_position, movement_vector)
 
-            for i in self.objects.values():
+            # objects collide if their squared distance is below their mean diameter
+            reach = math.sqrt(max(0, (diameter + self.object_index.max_diameter) / 2))
+            for i in self.object_index.get_objects_near(target_position, reach):
                 if _2d_distance_squared(target_position, i.position) < (diameter + i.diameter) / 2:
                     movement_vector = (movement_vector[0] * 0.5, movement_vector[1] * 0.5)  # should be collision point
                     target_position = None
                     break
 
-        if target_position is not None and ground_types[self.get_ground_at(target_position[0], target_position[1])]['agent_allowed']:
+        if target_position is not None and ground_agent_allowed[self.get_ground_at(target_position[0], target_position[1])]:
             return target_position
         else:
             return start_position
@@ -328,18 +362,11 @@ class Survivor(WorldAdapter):
         self.datatargets['loco_north'] = 0
         self.datatargets['loco_south'] = 0
 
-        if ground_types[self.world.get_ground_at(desired_position[0], desired_position[1])]['agent_allowed']:
+        if ground_agent_allowed[self.world.get_ground_at(desired_position[0], desired_position[1])]:
             self.position = desired_position
 
         #find nearest object to load into the scene
-        lowest_distance_to_worldobject = float("inf")
-        nearest_worldobject = None
-        for key, worldobject in self.world.objects.items():
-            # TODO: use a proper 2D geometry library
-            distance = _2d_distance_squared(self.position, worldobject.position)
-            if distance < lowest_distance_to_worldobject:
-                lowest_distance_to_worldobject = distance
-                nearest_worldobject = worldobject
+        nearest_worldobject = self.world.object_index.get_nearest_object(self.position)
 
         if self.currentobject is not nearest_worldobject and hasattr(nearest_worldobject, "structured_object_type"):
             self.currentobject = nearest_worldobject
@@ -486,6 +513,127 @@ def _2d_vector_norm(vector):
     return math.sqrt(sum(i**2 for i in vector))
 
 
+class SpatialGrid(object):
+    """A uniform grid over the positions of world objects, for nearest-object and collision queries.
+    Objects with a get_intensity method are also kept in a separate dict of light sources."""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.object_cells = {}
+        self.lightsources = {}
+        # upper bounds of the diameters and the occupied cells of all indexed objects
+        self.max_diameter = 0
+        self.bounds = None
+
+    def get_cell(self, position):
+        try:
+            return int(math.floor(position[0] / self.cell_size)), int(math.floor(position[1] / self.cell_size))
+        except TypeError:
+            return 0, 0
+
+    def add(self, worldobject):
+        cell = self.get_cell(worldobject.position)
+        self.cells.setdefault(cell, {})[worldobject.uid] = worldobject
+        self.object_cells[worldobject.uid] = cell
+        self.max_diameter = max(self.max_diameter, worldobject.diameter)
+        if self.bounds is None:
+            self.bounds = cell + cell
+        else:
+            self.bounds = (min(self.bounds[0], cell[0]), min(self.bounds[1], cell[1]), max(self.bounds[2], cell[0]), max(self.bounds[3], cell[1]))
+        if hasattr(worldobject, "get_intensity"):
+            self.lightsources[worldobject.uid] = worldobject
+
+    def remove(self, uid):
+        cell = self.object_cells.pop(uid, None)
+        if cell is not None:
+            del self.cells[cell][uid]
+            if not self.cells[cell]:
+                del self.cells[cell]
+        self.lightsources.pop(uid, None)
+
+    def move(self, worldobject):
+        if self.object_cells.get(worldobject.uid) != self.get_cell(worldobject.position):
+            self.remove(worldobject.uid)
+            self.add(worldobject)
+
+    def get_objects_near(self, position, radius):
+        """returns the objects in all cells that overlap the square of the given radius around position"""
+        min_x, min_y = self.get_cell((position[0] - radius, position[1] - radius))
+        max_x, max_y = self.get_cell((position[0] + radius, position[1] + radius))
+        objects = []
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                if (x, y) in self.cells:
+                    objects.extend(self.cells[(x, y)].values())
+        return objects
+
+    def get_nearest_object(self, position):
+        """returns the object closest to position, searching rings of cells around it, or None"""
+        if not self.object_cells:
+            return None
+        center_x, center_y = self.get_cell(position)
+        min_x, min_y, max_x, max_y = self.bounds
+        # no cell beyond this ring has ever been occupied
+        max_ring = max(center_x - min_x, max_x - center_x, center_y - min_y, max_y - center_y, 0)
+        nearest = None
+        lowest_distance = float("inf")
+        for ring in range(max_ring + 1):
+            # everything in this ring is at least ring - 1 cells away
+            if ring > 1 and ((ring - 1) * self.cell_size) ** 2 >= lowest_distance:
+                break
+            for cell in self.get_ring(center_x, center_y, ring):
+                for worldobject in self.cells.get(cell, {}).values():
+                    distance = _2d_distance_squared(position, worldobject.position)
+                    if distance < lowest_distance:
+                        lowest_distance = distance
+                        nearest = worldobject
+        return nearest
+
+    def get_ring(self, center_x, center_y, ring):
+        """returns the cells at the given chebyshev distance from the center cell"""
+        if ring == 0:
+            return [(center_x, center_y)]
+        cells = []
+        for x in range(center_x - ring, center_x + ring + 1):
+            cells.append((x, center_y - ring))
+            cells.append((x, center_y + ring))
+        for y in range(center_y - ring + 1, center_y + ring):
+            cells.append((center_x - ring, y))
+            cells.append((center_x + ring, y))
+        return cells
+
+
+def load_groundmap_array(filename):
+    """Returns the groundmap in the given png file as a 2D uint8 array of ground types, indexed by [y, x].
+
+    Decoded maps are stored as .npy files next to the png, named after a hash of the png contents, and
+    memory-mapped on later loads. If the cache can not be written, the decoded map is returned directly."""
+    with open(filename, 'rb') as file:
+        content = file.read()
+    base = os.path.splitext(filename)[0]
+    cache_filename = "%s.%s.npy" % (base, hashlib.sha1(content).hexdigest()[:16])
+    if os.path.isfile(cache_filename):
+        try:
+            return np.load(cache_filename, mmap_mode='r')
+        except (IOError, ValueError) as err:
+            logging.getLogger("world").warning("Could not load cached groundmap %s: %s" % (cache_filename, str(err)))
+    x, y, image_array, image_params = png.Reader(bytes=content).read()
+    ground_data = np.array([np.frombuffer(bytes(row), dtype=np.uint8) for row in image_array], dtype=np.uint8).reshape((y, x))
+    try:
+        # only the caches of this map: base name, a 16 digit hash and .npy, not those of maps named base.*
+        stale_pattern = re.compile(re.escape(os.path.basename(base)) + r"\.[0-9a-f]{16}\.npy$")
+        for stale in glob.glob(glob.escape(base) + ".*.npy"):
+            if stale_pattern.match(os.path.basename(stale)):
+                os.remove(stale)
+        with open(cache_filename + '.tmp', 'wb') as fp:
+            np.save(fp, ground_data)
+        os.replace(cache_filename + '.tmp', cache_filename)
+    except OSError as err:
+        logging.getLogger("world").debug("Could not cache groundmap %s: %s" % (cache_filename, str(err)))
+    return ground_data
+
+
 # the indices of ground types correspond to the color numbers in the groundmap png
 ground_types = (
     {
@@ -535,3 +683,7 @@ ground_types = (
         }
 
 )
+
+# ground type properties as arrays, to look them up for the results of Island.get_ground_types_at
+ground_move_efficiency = np.array([ground_type['move_efficiency'] for ground_type in ground_types])
+ground_agent_allowed = np.array([ground_type['agent_allowed'] for ground_type in ground_types])
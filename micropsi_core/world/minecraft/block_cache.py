@@ -0,0 +1,133 @@
+"""
+Dense cache of the blocks of the loaded Minecraft chunks, for looking up many voxels at once.
+
+spock keeps the world as a dict of chunk columns holding 16x16x16 sections, which is only accessible
+voxel by voxel. The cache copies every loaded column into one uint16 array, with a slot per column,
+and is kept up to date by the MicropsiPlugin from the chunk and block change packets.
+"""
+
+import threading
+
+import numpy as np
+
+# the number of 16 block high sections per chunk column
+SECTIONS = 16
+
+
+def section_blocks(chunk):
+    """Returns the raw block data (id << 4 | metadata) of a spock chunk section as an array indexed
+    by [y, z, x], the order in which spock stores it"""
+    data = chunk.block_data.data
+    if data is None:
+        return np.zeros((16, 16, 16), dtype=np.uint16)
+    return np.array(data, dtype=np.uint16).reshape((16, 16, 16))
+
+
+class BlockCache(object):
+    """Block data of chunk columns in a dense array
+
+    Attributes:
+        blocks: uint16 array of the raw block data, indexed by [slot, y, z, x] within the column
+        loaded: bool array of the loaded sections, indexed by [slot, section]
+        slots: the slots of the cached columns, by chunk x and z
+    """
+
+    def __init__(self, capacity=64):
+        self.blocks = np.zeros((capacity, SECTIONS * 16, 16, 16), dtype=np.uint16)
+        self.loaded = np.zeros((capacity, SECTIONS), dtype=bool)
+        self.slots = {}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def clear(self):
+        with self.lock:
+            self.loaded[:] = False
+            self.slots = {}
+            self.free_slots = list(range(len(self.blocks) - 1, -1, -1))
+
+    def update_column(self, cx, cz, column):
+        """Copies the given spock chunk column to the cache, or drops it if column is None or has no sections"""
+        with self.lock:
+            if column is None or all(chunk is None for chunk in column.chunks[:SECTIONS]):
+                self.__drop(cx, cz)
+                return
+            slot = self.__slot(cx, cz)
+            for cy, chunk in enumerate(column.chunks[:SECTIONS]):
+                self.loaded[slot, cy] = chunk is not None
+                if chunk is not None:
+                    self.blocks[slot, cy * 16:(cy + 1) * 16] = section_blocks(chunk)
+
+    def set_section(self, cx, cy, cz, blocks):
+        """Sets the raw block data of a chunk section from an array indexed by [y, z, x]"""
+        with self.lock:
+            slot = self.__slot(cx, cz)
+            self.blocks[slot, cy * 16:(cy + 1) * 16] = blocks
+            self.loaded[slot, cy] = True
+
+    def update_columns(self, columns, keys):
+        """Copies the columns with the given keys from the given dict of spock chunk columns"""
+        for cx, cz in keys:
+            self.update_column(cx, cz, columns.get((cx, cz)))
+
+    def set_block(self, x, y, z, data):
+        """Sets the raw block data of a single voxel, if its column is cached"""
+        with self.lock:
+            slot = self.slots.get((x >> 4, z >> 4))
+            if slot is None or not 0 <= y < SECTIONS * 16:
+                return
+            if not self.loaded[slot, y >> 4]:
+                self.blocks[slot, y & ~15:(y & ~15) + 16] = 0
+                self.loaded[slot, y >> 4] = True
+            self.blocks[slot, y, z & 15, x & 15] = data
+
+    def get_block_types(self, xs, ys, zs):
+        """Returns an array of the block types at the given voxel coordinates, -1 where nothing is loaded"""
+        xs = np.floor(np.asarray(xs, dtype=float)).astype(np.int64).ravel()
+        ys = np.floor(np.asarray(ys, dtype=float)).astype(np.int64).ravel()
+        zs = np.floor(np.asarray(zs, dtype=float)).astype(np.int64).ravel()
+        result = np.full(len(xs), -1, dtype=np.int64)
+        if not len(xs):
+            return result
+        # look up the slots of the distinct columns only
+        min_cx, min_cz = int(xs.min()) >> 4, int(zs.min()) >> 4
+        width = (int(zs.max()) >> 4) - min_cz + 1
+        keys, inverse = np.unique(((xs >> 4) - min_cx) * width + (zs >> 4) - min_cz, return_inverse=True)
+        with self.lock:
+            # read the arrays under the lock as well, slots may be dropped and refilled meanwhile
+            key_slots = np.array([self.slots.get((min_cx + key // width, min_cz + key % width), -1)
+                                  for key in keys.tolist()], dtype=np.int64)
+            slots = key_slots[inverse.ravel()]
+            valid = (slots >= 0) & (ys >= 0) & (ys < SECTIONS * 16)
+            valid[valid] = self.loaded[slots[valid], ys[valid] >> 4]
+            result[valid] = self.blocks[slots[valid], ys[valid], zs[valid] & 15, xs[valid] & 15] >> 4
+        return result
+
+    def __slot(self, cx, cz):
+        slot = self.slots.get((cx, cz))
+        if slot is None:
+            if not self.free_slots:
+                self.__grow()
+            slot = self.free_slots.pop()
+            self.slots[(cx, cz)] = slot
+        return slot
+
+    def __grow(self):
+        capacity = len(self.blocks)
+        blocks = np.zeros((capacity * 2,) + self.blocks.shape[1:], dtype=np.uint16)
+        blocks[:capacity] = self.blocks
+        loaded = np.zeros((capacity * 2, SECTIONS), dtype=bool)
+        loaded[:capacity] = self.loaded
+        self.blocks, self.loaded = blocks, loaded
+        self.free_slots = list(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def __drop(self, cx, cz):
+        slot = self.slots.pop((cx, cz), None)
+        if slot is not None:
+            self.loaded[slot] = False
+            self.free_slots.append(slot)
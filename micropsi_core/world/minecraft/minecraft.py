@@ -1,5 +1,7 @@
 from threading import Thread
 
+import numpy as np
+
 from spock.client import Client
 from spock.plugins import DefaultPlugins
 from spock.plugins.core.event import EventPlugin
@@ -11,6 +13,7 @@ from spock.plugins.helpers.reconnect import ReConnectPlugin
 from micropsi_core.world.world import World
 from micropsi_core.world.worldadapter import WorldAdapter
 from micropsi_core.world.minecraft.spockplugin import MicropsiPlugin
+from micropsi_core.world.minecraft import raycast
 from micropsi_core.world.minecraft.minecraft_graph_locomotion import MinecraftGraphLocomotion
 from micropsi_core.world.minecraft.minecraft_vision import MinecraftVision
 
@@ -33,10 +36,11 @@ class Minecraft(World):
         'y': 256,
     }
 
-    # thread and spock only exist once
+    # thread and spock only exist once, and are shared by all minecraft worlds
     instances = {
         'spock': None,
-        'thread': None
+        'thread': None,
+        'signal_handler': None
     }
 
     def __init__(self, filename, world_type="Minecraft", name="", owner="", engine=None, uid=None, version=1):
@@ -84,7 +88,8 @@ class Minecraft(World):
             # Note: client.start() is attached in StartPlugin w/ setattr(self.client, 'start', self.start)
             thread.start()
             self.instances['thread'] = thread
-            #
+            # the world that started the client stops it, see unload
+            self.instances['signal_handler'] = self.kill_minecraft_thread
             add_signal_handler(self.kill_minecraft_thread)
 
         # once MicropsiPlugin is instantiated and running, initialize micropsi world
@@ -124,11 +129,30 @@ class Minecraft(World):
 
     def kill_minecraft_thread(self, *args):
         """
+        Stops the spock client and waits for its thread. Does nothing if it was stopped already
         """
+        thread = self.instances['thread']
+        if thread is None:
+            return
         self.spockplugin.event.kill()
-        self.instances['thread'].join()
+        thread.join()
         # self.spockplugin.threadpool.shutdown(False)
 
+    def unload(self):
+        """
+        Stops the minecraft client once no other minecraft world is loaded, so the next instance connects anew
+        """
+        from micropsi_core.runtime import worlds, remove_signal_handler
+        if any(isinstance(world, Minecraft) for world in worlds.get_loaded_instances() if world is not self):
+            return
+        handler = self.instances['signal_handler']
+        if handler is not None:
+            remove_signal_handler(handler)
+            handler()
+        self.instances['spock'] = None
+        self.instances['thread'] = None
+        self.instances['signal_handler'] = None
+
 
 class Minecraft2D(Minecraft):
     """ mandatory: list of world adapters that are supported"""
@@ -154,7 +178,6 @@ class Minecraft2D(Minecraft):
     def get_perspective_projection(self, agent_info):
         """
         """
-        from math import sqrt
         from micropsi_core.world.minecraft import structs
 
         # specs
@@ -209,56 +232,18 @@ class Minecraft2D(Minecraft):
         x0, y0, z0 = position   # agent's position aka projective point
         zi = z0 + focal_length
 
-        for xi in reversed(h_line):
-            for yi in reversed(v_line):
-
-                distance = 0    # just a counter
-                block_type = 0
-                xb, yb, zb = xi, yi, zi
-
-                # compute difference vector between projective point and image point
-                diff = (xi - x0, yi - y0, zi - z0)
-
-                # normalize difference vector
-                magnitude = sqrt(diff[0] ** 2 + diff[1] ** 2 + diff[2] ** 2)
-                if magnitude == 0.:
-                    magnitude = 1.
-                norm = (diff[0] / magnitude, diff[1] / magnitude, diff[2] / magnitude)
-
-                # rotate norm vector
-                norm = self.rotate_around_x_axis(norm, pitch)
-                norm = self.rotate_around_y_axis(norm, yaw)
-
-                # rotate diff vector
-                diff = self.rotate_around_x_axis(diff, pitch)
-                diff = self.rotate_around_y_axis(diff, yaw)
-
-                # add diff to projection point aka agent's position
-                xb, yb, zb = x0 + diff[0], y0 + diff[1], z0 + diff[2]
-
-                while block_type <= 0:  # which is air
-
-                    # check block type of next distance point along ray
-                    # aka add normalized difference vector to image point
-                    xb = xb + norm[0]
-                    yb = yb + norm[1]
-                    zb = zb + norm[2]
-
-                    block_type = self.spockplugin.get_block_type(
-                        int(xb),
-                        int(yb),
-                        int(zb),
-                    )
-
-                    distance += 1
-                    if distance >= max_dist:
-                        break
-
-                # add block name, distance to projection plane
-                # hm, if block_type unknown, expect an exception
-                if structs.block_names.get(str(block_type)):
-                    block_name = structs.block_names[str(block_type)]
-                projection += (block_name, distance)
+        # cast the rays through all pixels together, column by column from the right, top down
+        xs, ys = np.meshgrid(list(reversed(h_line)), list(reversed(v_line)), indexing='ij')
+        image_points = np.column_stack((xs.ravel(), ys.ravel(), np.full(xs.size, zi)))
+        origins, directions = raycast.image_rays(image_points, position, yaw, pitch)
+        block_types, distances = raycast.cast_rays(origins, directions, self.spockplugin.get_block_types, max_dist)
+
+        for block_type, distance in zip(block_types.tolist(), distances.tolist()):
+            # add block name, distance to projection plane in whole blocks, at least 1 and at most max_dist
+            # hm, if block_type unknown, expect an exception
+            if structs.block_names.get(str(block_type)):
+                block_name = structs.block_names[str(block_type)]
+            projection += (block_name, min(int(distance) + 1, max_dist))
 
         self.data['projection'] = projection
 
@@ -6,7 +6,9 @@ import logging
 import time
 from functools import partial
 from math import sqrt, radians, cos, sin, tan
+import numpy as np
 from spock.mcp.mcpacket import Packet
+from micropsi_core.world.minecraft import raycast
 
 
 class MinecraftGraphLocomotion(WorldAdapter):
@@ -585,15 +587,9 @@ class MinecraftGraphLocomotion(WorldAdapter):
         v_line.reverse()
 
         # compute block type values for the whole patch /fovea
-        patch = []
-        for i in range(self.patch_height):
-            for j in range(self.patch_width):
-                try:
-                    block_type, distance = self.project(h_line[fov_x + j], v_line[fov_y + i], zi, x0, y0, z0, yaw, pitch)
-                except IndexError:
-                    block_type, distance = -1, -1
-                    self.logger.warning("IndexError at (%d,%d)" % (fov_x + j, fov_y + i))
-                patch.append(block_type)
+        patch = self.project_patch(h_line, v_line, fov_x + np.tile(np.arange(self.patch_width), self.patch_height),
+                                   fov_y + np.repeat(np.arange(self.patch_height), self.patch_width),
+                                   zi, x0, y0, z0, yaw, pitch).tolist()
 
         # write block type histogram values to self.datasources['fov_hist__*']
         # for every block type seen in patch, if there's a datasource for it, fill it with its normalized frequency
@@ -691,45 +687,35 @@ class MinecraftGraphLocomotion(WorldAdapter):
         ray to find the nearest block type that isn't air and its distance from
         the projective plane.
         """
-        distance = 0    # just a counter
-        block_type = -1  # consider mapping nothingness to air, ie. -1 to 0
+        block_types, distances = self.cast_rays([(xi, yi, zi)], x0, y0, z0, yaw, pitch)
+        return int(block_types[0]), distances[0]
 
-        # compute difference vector between projective point and image point
-        diff = (xi - x0, yi - y0, zi - z0)
-
-        # normalize difference vector
-        magnitude = sqrt(diff[0] ** 2 + diff[1] ** 2 + diff[2] ** 2)
-        if magnitude == 0.:
-            magnitude = 1.
-        norm = (diff[0] / magnitude, diff[1] / magnitude, diff[2] / magnitude)
-
-        # rotate norm vector
-        norm = self.rotate_around_x_axis(norm, pitch)
-        norm = self.rotate_around_y_axis(norm, yaw)
-
-        # rotate diff vector
-        diff = self.rotate_around_x_axis(diff, pitch)
-        diff = self.rotate_around_y_axis(diff, yaw)
-
-        # add diff to projection point aka agent's position
-        xb, yb, zb = x0 + diff[0], y0 + diff[1], z0 + diff[2]
-
-        while block_type <= 0:  # which is air and nothingness
-
-            # check block type of next distance point along ray
-            # aka add normalized difference vector to image point
-            # TODO: consider a more efficient way to move on the ray, eg. a log scale
-            xb += norm[0]
-            yb += norm[1]
-            zb += norm[2]
-
-            block_type = self.spockplugin.get_block_type(xb, yb, zb)
-
-            distance += 1
-            if distance >= self.max_dist:
-                break
-
-        return block_type, distance
+    def project_patch(self, h_line, v_line, h_indices, v_indices, zi, x0, y0, z0, yaw, pitch):
+        """
+        Casts the rays through the points (h_line[h_indices[k]], v_line[v_indices[k]], zi) of the
+        projection plane together, and returns an array of the block types they hit.
+        Points outside the image plane get the block type -1.
+        """
+        h_indices = np.asarray(h_indices)
+        v_indices = np.asarray(v_indices)
+        valid = (h_indices >= 0) & (h_indices < len(h_line)) & (v_indices >= 0) & (v_indices < len(v_line))
+        if not valid.all():
+            self.logger.warning("IndexError at %d points of the patch" % np.count_nonzero(~valid))
+        image_points = np.column_stack((
+            np.asarray(h_line, dtype=float)[h_indices[valid]],
+            np.asarray(v_line, dtype=float)[v_indices[valid]],
+            np.full(np.count_nonzero(valid), zi)))
+        block_types = np.full(len(h_indices), -1, dtype=np.int64)
+        block_types[valid], _ = self.cast_rays(image_points, x0, y0, z0, yaw, pitch)
+        return block_types
+
+    def cast_rays(self, image_points, x0, y0, z0, yaw, pitch):
+        """
+        Casts rays from the projective point (x0, y0, z0) through the given points of the projection plane,
+        rotated by pitch and yaw, and returns the block types they hit and their distances.
+        """
+        origins, directions = raycast.image_rays(image_points, (x0, y0, z0), yaw, pitch)
+        return raycast.cast_rays(origins, directions, self.spockplugin.get_block_types, self.max_dist)
 
     def rotate_around_x_axis(self, pos, angle):
         """ Rotate a 3D point around the x-axis given a specific angle. """
@@ -7,6 +7,7 @@ import logging
 import time
 from functools import partial
 from math import sqrt, radians, cos, sin, tan
+import numpy as np
 
 
 class MinecraftVision(MinecraftGraphLocomotion):
@@ -318,15 +319,9 @@ class MinecraftVision(MinecraftGraphLocomotion):
         v_line.reverse()  # inline
 
         # do raytracing to compute the resp. block type values of a 2D perspective projection
-        sensor_values = []
-        for i in range(len_x):
-            for j in range(len_y):
-                try:
-                    block_type, distance = self.project(h_line[fov_x + j], v_line[fov_y + i], zi, x0, y0, z0, yaw, pitch)
-                except IndexError:
-                    block_type, distance = -1, -1
-                    self.logger.warning("IndexError at (%d,%d)" % (fov_x + j, fov_y + i))
-                sensor_values.append(block_type)
+        sensor_values = self.project_patch(h_line, v_line, fov_x + np.tile(np.arange(len_y), len_x),
+                                           fov_y + np.repeat(np.arange(len_x), len_y),
+                                           zi, x0, y0, z0, yaw, pitch).tolist()
 
         # homogeneous_patch = False
         # if sensor_values[1:] == sensor_values[:-1]:  # if all sensor values are the same, ignore the sample ie. write zeros
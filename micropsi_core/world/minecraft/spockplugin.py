@@ -3,6 +3,7 @@ from spock.mcmap import smpmap
 from spock.mcp import mcdata, mcpacket
 from spock.mcp.mcpacket import Packet
 from spock.utils import pl_announce
+from micropsi_core.world.minecraft.block_cache import BlockCache
 
 
 STANCE_ADDITION = 1.620
@@ -30,6 +31,15 @@ class MicropsiPlugin(object):
             self.update_inventory
         )
 
+        # dense copy of the loaded chunks for bulk lookups, see get_block_types.
+        # the world plugin registers its handlers for these packets first, so the columns are up to date here
+        self.block_cache = BlockCache()
+        self.event.reg_event_handler((3, 0, 33), self.update_chunk_data)            # Chunk Data
+        self.event.reg_event_handler((3, 0, 38), self.update_chunk_bulk)            # Map Chunk Bulk
+        self.event.reg_event_handler((3, 0, 35), self.update_block_change)          # Block Change
+        self.event.reg_event_handler((3, 0, 34), self.update_multi_block_change)    # Multi Block Change
+        self.event.reg_event_handler('disconnect', self.clear_block_cache)
+
         # make references between micropsi world and MicropsiPlugin
         self.micropsi_world = settings['micropsi_world']
         self.micropsi_world.spockplugin = self
@@ -52,14 +62,15 @@ class MicropsiPlugin(object):
         y = target_coords['y'] - 1  # current block agent is standing on
 
         # check if the next step is possible: nothing in the way, height diff <= 1
-        if self.get_block_type(target_coords['x'], y + 2, target_coords['z']) > 0:
+        # block types of the target column from y - 1 to y + 3
+        column = self.get_block_types([target_coords['x']] * 5, range(y - 1, y + 4), [target_coords['z']] * 5).tolist()
+        if column[3] > 0:
             ground_offset = 2
-        elif self.get_block_type(target_coords['x'], y + 1, target_coords['z']) > 0 and \
-                self.get_block_type(target_coords['x'], y + 3, target_coords['z']) <= 0:
+        elif column[2] > 0 and column[4] <= 0:
             ground_offset = 1
-        elif self.get_block_type(target_coords['x'], y, target_coords['z']) > 0:
+        elif column[1] > 0:
             ground_offset = 0
-        elif self.get_block_type(target_coords['x'], y - 1, target_coords['z']) > 0:
+        elif column[0] > 0:
             ground_offset = -1
 
         if ground_offset < 2:
@@ -90,6 +101,31 @@ class MicropsiPlugin(object):
             return -1  # was 0
         return chunk.block_data.get(rx, ry, rz) >> 4
 
+    def get_block_types(self, xs, ys, zs):
+        """
+        Get the block types of many voxels at once, as an array. Voxels that are not loaded get -1.
+        """
+        return self.block_cache.get_block_types(xs, ys, zs)
+
+    def update_chunk_data(self, event, packet):
+        key = (packet.data['chunk_x'], packet.data['chunk_z'])
+        self.block_cache.update_columns(self.world.columns, [key])
+
+    def update_chunk_bulk(self, event, packet):
+        keys = [(meta['chunk_x'], meta['chunk_z']) for meta in packet.data['metadata']]
+        self.block_cache.update_columns(self.world.columns, keys)
+
+    def update_block_change(self, event, packet):
+        location = packet.data['location']
+        self.block_cache.set_block(location['x'], location['y'], location['z'], packet.data['block_data'])
+
+    def update_multi_block_change(self, event, packet):
+        key = (packet.data['chunk_x'], packet.data['chunk_z'])
+        self.block_cache.update_columns(self.world.columns, [key])
+
+    def clear_block_cache(self, event, data):
+        self.block_cache.clear()
+
     def get_biome_info(self, pos=None):
         from spock.mcmap.mapdata import biomes
         if pos is None:
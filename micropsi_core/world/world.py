@@ -140,6 +140,11 @@ class World(object):
             warnings.warn("Wrong version of the world data")
             return False
 
+    def unload(self):
+        """Called when the runtime drops this world from memory. Worlds holding threads or connections
+        release them here."""
+        pass
+
     def get_available_worldadapters(self):
         """ return the list of instantiated worldadapters """
         return self.supported_worldadapters
@@ -207,6 +212,10 @@ class World(object):
             return True
         return False
 
+    def _worldobject_moved(self, worldobject):
+        """ Called when the position of a world object or agent was set """
+        pass
+
     def get_world_objects(self, type=None):
         """ returns a dictionary of world objects. """
         objects = {}
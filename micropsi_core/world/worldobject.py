@@ -20,6 +20,7 @@ class WorldObject(object):
     @position.setter
     def position(self, position):
         self.data['position'] = position
+        self.world._worldobject_moved(self)
 
     @property
     def orientation(self):
@@ -145,16 +145,14 @@ def get_request_data():
 
 
 def _add_world_list(template_name, **params):
-    worlds = runtime.get_available_worlds()
+    worlds = runtime.get_world_descriptors()
     if request.query.get('select_world') and request.query.get('select_world') in worlds:
         current_world = request.query.get('select_world')
         response.set_cookie('selected_world', current_world)
     else:
         current_world = request.get_cookie('selected_world')
-    if current_world in worlds and hasattr(worlds[current_world], 'assets'):
-        world_assets = worlds[current_world].assets
-    else:
-        world_assets = {}
+    current_world_instance = runtime.worlds.get(current_world) if current_world in worlds else None
+    world_assets = getattr(current_world_instance, 'assets', {})
     return template(template_name, current=current_world,
         mine=dict((uid, worlds[uid]) for uid in worlds if worlds[uid].owner == params['user_id']),
         others=dict((uid, worlds[uid]) for uid in worlds if worlds[uid].owner != params['user_id']),
@@ -557,6 +555,24 @@ def export_nodenet(nodenet_uid):
     return runtime.export_nodenet(nodenet_uid)
 
 
+@micropsi_app.route("/nodenet/nodetypes/<nodenet_uid>")
+def nodetype_definitions(nodenet_uid):
+    """Nodetypes and native modules of the nodenet, as JSON. Clients revalidate with the ETag,
+    and get a 304 without a body as long as the definitions did not change."""
+    if runtime.get_nodenet(nodenet_uid) is None:
+        response.status = 404
+        return "No such nodenet"
+    data = runtime.get_nodetype_definitions(nodenet_uid)
+    etag = '"%s"' % data['version']
+    response.set_header('ETag', etag)
+    response.set_header('Cache-Control', 'private, no-cache')
+    if request.headers.get('If-None-Match') == etag:
+        response.status = 304
+        return ""
+    response.set_header('Content-type', 'application/json')
+    return json.dumps(data)
+
+
 @micropsi_app.route("/nodenet/edit")
 def edit_nodenet():
     user_id, permissions, token = get_request_data()
@@ -573,7 +589,7 @@ def edit_nodenet():
         # nodenet_uid=nodenet_uid,
         nodenets=runtime.get_available_nodenets(),
         templates=runtime.get_available_nodenets(),
-        worlds=runtime.get_available_worlds(),
+        worlds=runtime.get_world_descriptors(),
         version=VERSION, user_id=user_id, permissions=permissions, theano_available=theano_available)
 
 
@@ -653,7 +669,7 @@ def nodenet_list(current_nodenet=None):
 @micropsi_app.route("/world_list/<current_world>")
 def world_list(current_world=None):
     user_id, permissions, token = get_request_data()
-    worlds = runtime.get_available_worlds()
+    worlds = runtime.get_world_descriptors()
     return template("nodenet_list", type="world", user_id=user_id,
         current=current_world,
         mine=dict((uid, worlds[uid]) for uid in worlds if worlds[uid].owner == user_id),
@@ -675,7 +691,7 @@ def edit_runner_properties():
 def create_new_nodenet_form():
     user_id, permissions, token = get_request_data()
     nodenets = runtime.get_available_nodenets()
-    worlds = runtime.get_available_worlds()
+    worlds = runtime.get_world_descriptors()
     return template("nodenet_form", user_id=user_id, template="None",
         nodenets=nodenets, worlds=worlds)
 
@@ -713,11 +729,12 @@ def select_nodenet(nodenet_uid):
 
 
 @rpc("load_nodenet")
-def load_nodenet(nodenet_uid, nodespace='Root', include_links=True):
+def load_nodenet(nodenet_uid, nodespace='Root', include_links=True, viewport=None, include_nodetypes=True):
     result, uid = runtime.load_nodenet(nodenet_uid)
     if result:
-        data = runtime.get_nodenet_data(nodenet_uid, nodespace, -1, include_links)
-        data['nodetypes'] = runtime.get_available_node_types(nodenet_uid)
+        data = runtime.get_nodenet_data(nodenet_uid, nodespace, -1, include_links, viewport=viewport, include_nodetypes=include_nodetypes)
+        if include_nodetypes:
+            data['nodetypes'] = runtime.get_available_node_types(nodenet_uid)
         data['recipes'] = runtime.get_available_recipes()
         return True, data
     else:
@@ -760,6 +777,68 @@ def get_current_state(nodenet_uid, nodenet=None, world=None, monitors=None):
         return False, "No such nodenet"
 
 
+STREAM_KEEPALIVE_SECONDS = 15
+# servers that handle one request at a time, where an open stream would block every other request
+SINGLE_THREADED_SERVERS = ('wsgiref',)
+
+
+@micropsi_app.route("/stream/<nodenet_uid>")
+def stream_nodenet(nodenet_uid):
+    """Server-sent event stream with one frame per nodenet step. Slow clients skip intermediate steps.
+    Query parameters:
+        nodespace: send the changes of this nodespace, like get_current_state does for a known revision
+        include_links: "True" to send the links of the nodespace as well
+        viewport: "left,top,right,bottom" to only send the nodes positioned within that rectangle
+        monitors: "all", or a comma separated list of monitor uids to send new values for
+        logger: a comma separated list of loggers to send new records for
+        step_profile: "True" to send the step profile of the nodenet as well
+    Needs a multi-threaded server, since every client keeps its request open. Refused with 503 otherwise."""
+    if runtime.get_nodenet(nodenet_uid) is None:
+        response.status = 404
+        return "No such nodenet"
+    if cfg['micropsi2'].get('server', 'wsgiref') in SINGLE_THREADED_SERVERS:
+        response.status = 503
+        return "Streaming needs a multi-threaded server, see the server option in config.ini"
+    viewport = request.query.get('viewport')
+    if viewport:
+        try:
+            viewport = [float(value) for value in viewport.split(',')]
+        except ValueError:
+            viewport = None
+        if viewport is None or len(viewport) != 4:
+            response.status = 400
+            return "viewport needs four numbers"
+    monitors = request.query.get('monitors')
+    if monitors == 'all':
+        monitors = True
+    elif monitors:
+        monitors = monitors.split(',')
+    subscription = runtime.subscribe_nodenet_stream(
+        nodenet_uid,
+        nodespace=request.query.get('nodespace'),
+        include_links=request.query.get('include_links') == "True",
+        viewport=viewport or None,
+        monitors=monitors,
+        logger=[name for name in request.query.get('logger', '').split(',') if name],
+        step_profile=request.query.get('step_profile') == "True")
+    response.content_type = 'text/event-stream'
+    response.set_header('Cache-Control', 'no-cache')
+
+    def frames():
+        try:
+            while not subscription.closed:
+                if subscription.wait(STREAM_KEEPALIVE_SECONDS):
+                    frame = subscription.next_frame()
+                    if frame is None:
+                        break
+                    yield "data: %s\n\n" % json.dumps(frame)
+                elif not subscription.closed:
+                    yield ": keepalive\n\n"
+        finally:
+            runtime.unsubscribe_nodenet_stream(subscription)
+    return frames()
+
+
 @rpc("generate_uid")
 def generate_uid():
     return True, tools.generate_uid()
@@ -840,6 +919,11 @@ def step_simulation(nodenet_uid):
     return True, runtime.step_nodenet(nodenet_uid)
 
 
+@rpc("run_steps", permission_required="manage nodenets")
+def run_steps(nodenet_uid, steps, world=True, monitors=False, log=False):
+    return runtime.run_steps(nodenet_uid, int(steps), world=world, monitors=monitors, log=log)
+
+
 @rpc("revert_nodenet", permission_required="manage nodenets")
 def revert_nodenet(nodenet_uid):
     return runtime.revert_nodenet(nodenet_uid)
@@ -870,7 +954,7 @@ def merge_nodenet_rpc(nodenet_uid, nodenet_data):
 @rpc("get_available_worlds")
 def get_available_worlds(user_id=None):
     data = {}
-    for uid, world in runtime.get_available_worlds(user_id).items():
+    for uid, world in runtime.get_world_descriptors(user_id).items():
         data[uid] = {'name': world.name}  # fixme
     return True, data
 
@@ -1024,8 +1108,23 @@ def export_monitor_data(nodenet_uid, monitor_uid=None):
 
 
 @rpc("get_monitor_data")
-def get_monitor_data(nodenet_uid, step):
-    return True, runtime.get_monitor_data(nodenet_uid, step)
+def get_monitor_data(nodenet_uid, step, monitor_from_step=None):
+    return True, runtime.get_monitor_data(nodenet_uid, step, monitor_from_step)
+
+
+@rpc("get_step_profile")
+def get_step_profile(nodenet_uid):
+    return True, runtime.get_step_profile(nodenet_uid)
+
+
+@rpc("reset_step_profile", permission_required="manage nodenets")
+def reset_step_profile(nodenet_uid):
+    return True, runtime.reset_step_profile(nodenet_uid)
+
+
+@rpc("set_step_profiling", permission_required="manage nodenets")
+def set_step_profiling(nodenet_uid, enabled):
+    return True, runtime.set_step_profiling(nodenet_uid, enabled)
 
 
 # Nodenet
@@ -1037,8 +1136,14 @@ def get_nodespace_list(nodenet_uid):
 
 
 @rpc("get_nodespace")
-def get_nodespace(nodenet_uid, nodespace, step, include_links=True):
-    return True, runtime.get_nodenet_data(nodenet_uid, nodespace, step, include_links)
+def get_nodespace(nodenet_uid, nodespace, step, include_links=True, viewport=None, cursor=None, page_size=None, include_nodetypes=True):
+    try:
+        if page_size is not None:
+            page_size = int(page_size)
+        return True, runtime.get_nodenet_data(nodenet_uid, nodespace, step, include_links, viewport=viewport, cursor=cursor,
+                                              page_size=page_size, include_nodetypes=include_nodetypes)
+    except ValueError as err:
+        return False, str(err)
 
 
 @rpc("get_node")
@@ -1096,6 +1201,11 @@ def get_available_node_types(nodenet_uid):
     return True, runtime.get_available_node_types(nodenet_uid)
 
 
+@rpc("get_nodetype_definitions")
+def get_nodetype_definitions(nodenet_uid):
+    return True, runtime.get_nodetype_definitions(nodenet_uid)
+
+
 @rpc("get_available_native_module_types")
 def get_available_native_module_types(nodenet_uid):
     return True, runtime.get_available_native_module_types(nodenet_uid)
@@ -1151,6 +1261,11 @@ def add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type
     return runtime.add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type, weight=weight)
 
 
+@rpc("add_links", permission_required="manage nodenets")
+def add_links(nodenet_uid, links):
+    return runtime.add_links(nodenet_uid, links)
+
+
 @rpc("set_link_weight", permission_required="manage nodenets")
 def set_link_weight(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type, weight, certainty=1):
     return runtime.set_link_weight(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type, weight, certainty)
@@ -1198,8 +1313,8 @@ def get_logger_messages(logger=[], after=0):
 
 
 @rpc("get_monitoring_info")
-def get_monitoring_info(nodenet_uid, logger=[], after=0):
-    data = runtime.get_monitoring_info(nodenet_uid, logger, after)
+def get_monitoring_info(nodenet_uid, logger=[], after=0, monitor_from_step=None, step_profile=False):
+    data = runtime.get_monitoring_info(nodenet_uid, logger, after, monitor_from_step, step_profile=step_profile)
     return True, data
 
 
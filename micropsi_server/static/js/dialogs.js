@@ -568,20 +568,82 @@ var runner_properties = {};
 var sections = ['nodenet_editor', 'monitor', 'world_editor'];
 
 
-register_stepping_function = function(type, input, callback){
-    listeners[type] = {'input': input, 'callback': callback};
+// streams, if given, is a function returning the query parameters for /stream/<nodenet_uid>, and stream_callback
+// receives its frames. While the nodenet runs, such listeners are served by an EventSource instead of polling.
+register_stepping_function = function(type, input, callback, stream, stream_callback){
+    close_stepping_stream(type);
+    listeners[type] = {'input': input, 'callback': callback, 'stream': stream, 'stream_callback': stream_callback};
 }
 unregister_stepping_function = function(type){
+    close_stepping_stream(type);
     delete listeners[type];
 }
 
+var stepping_streams = {};
+// false once the server refused a stream, e.g. with 503 on a single threaded server
+var streaming_available = !!window.EventSource;
+
+function open_stepping_streams(){
+    for(var key in listeners){
+        if(!listeners[key].stream || !streaming_available){
+            continue;
+        }
+        var url = '/stream/' + currentNodenet + '?' + $.param(listeners[key].stream());
+        if(stepping_streams[key] && stepping_streams[key].url == url){
+            continue;
+        }
+        close_stepping_stream(key);
+        stepping_streams[key] = open_stepping_stream(key, url);
+    }
+}
+
+function open_stepping_stream(type, url){
+    var source = new EventSource(url);
+    source.onmessage = function(event){
+        var frame = JSON.parse(event.data);
+        if(listeners[type] && stepping_streams[type] === source){
+            listeners[type].stream_callback(frame);
+        }
+        if(!frame.simulation_running){
+            close_stepping_stream(type);
+        }
+    };
+    source.onerror = function(){
+        if(source.readyState == EventSource.CLOSED){
+            // refused by the server, poll from now on
+            streaming_available = false;
+        }
+        // polling takes over with the next step
+        close_stepping_stream(type);
+        if(simulationRunning){
+            fetch_stepping_info();
+        }
+    };
+    return source;
+}
+
+function close_stepping_stream(type){
+    if(stepping_streams[type]){
+        stepping_streams[type].close();
+        delete stepping_streams[type];
+    }
+}
+
+function close_stepping_streams(){
+    for(var key in stepping_streams){
+        close_stepping_stream(key);
+    }
+}
+
 
 fetch_stepping_info = function(){
     params = {
         nodenet_uid: currentNodenet
     };
     for (key in listeners){
-        params[key] = listeners[key].input()
+        if(!stepping_streams[key]){
+            params[key] = listeners[key].input()
+        }
     }
     api.call('get_current_state', params, success=function(data){
         var start = new Date().getTime();
@@ -614,6 +676,13 @@ fetch_stepping_info = function(){
             $('#set_runner_condition').show();
         }
 
+        simulationRunning = data.simulation_running;
+        if(data.simulation_running){
+            open_stepping_streams();
+        } else {
+            close_stepping_streams();
+        }
+
         var end = new Date().getTime();
         if(data.simulation_running){
             if(runner_properties.timestep - (end - start) > 0){
@@ -624,6 +693,7 @@ fetch_stepping_info = function(){
         }
         setButtonStates(data.simulation_running);
     }, error=function(data, outcome, type){
+        close_stepping_streams();
         $(document).trigger('runner_stopped');
         setButtonStates(false);
         if(data.data == 'No such nodenet'){
@@ -635,7 +705,9 @@ fetch_stepping_info = function(){
 
 $(document).on('runner_started', fetch_stepping_info);
 $(document).on('runner_stepped', fetch_stepping_info);
+$(document).on('runner_stopped', close_stepping_streams);
 $(document).on('nodenet_changed', function(event, new_uid){
+    close_stepping_streams();
     currentNodenet = new_uid;
     $.cookie('selected_nodenet', currentNodenet, { expires: 7, path: '/' });
     refreshNodenetList();
@@ -25,6 +25,8 @@ $(function(){
 
     var logs = [];
 
+    var showStepProfile = $.cookie('showStepProfile') == 'true';
+
     if($.cookie('capturedLoggers')){
         capturedLoggers = JSON.parse($.cookie('capturedLoggers'));
     }
@@ -33,6 +35,7 @@ $(function(){
     }
 
     var last_logger_call = 0;
+    var last_log_seq = 0;
 
     var log_container = $('#logs');
 
@@ -73,10 +76,37 @@ $(function(){
         refreshMonitors();
     });
     $(document).on('nodenet_changed', function(data, newNodenet){
+        if(showStepProfile && currentNodenet){
+            api.call('set_step_profiling', {nodenet_uid: currentNodenet, enabled: false});
+        }
         currentNodenet = newNodenet;
         init();
     });
 
+    // profiling costs step time, so it only runs while the profile is shown
+    $('#monitor').on('shown', function(event){
+        if(event.target === this && showStepProfile && currentNodenet){
+            api.call('set_step_profiling', {nodenet_uid: currentNodenet, enabled: true}, refreshMonitors);
+        }
+    });
+    $('#monitor').on('hidden', function(event){
+        if(event.target === this && showStepProfile && currentNodenet){
+            api.call('set_step_profiling', {nodenet_uid: currentNodenet, enabled: false});
+        }
+    });
+    $(window).on('beforeunload', function(){
+        if(showStepProfile && currentNodenet && window.fetch){
+            // a regular call would be cancelled with the page, keepalive lets the request finish
+            fetch('/rpc/set_step_profiling', {
+                method: 'POST',
+                keepalive: true,
+                credentials: 'same-origin',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({nodenet_uid: currentNodenet, enabled: false})
+            });
+        }
+    });
+
     function init() {
         bindEvents();
         if (currentNodenet = $.cookie('selected_nodenet')) {
@@ -86,7 +116,11 @@ $(function(){
                 include_links: false
             }, function(data) {
                 $('#loading').hide();
-                refreshMonitors();
+                if(showStepProfile){
+                    api.call('set_step_profiling', {nodenet_uid: currentNodenet, enabled: true}, refreshMonitors);
+                } else {
+                    refreshMonitors();
+                }
             },
             function(data) {
                 $('#loading').hide();
@@ -110,17 +144,47 @@ $(function(){
         }
         return {
             logger: poll,
-            after: last_logger_call
+            after: last_logger_call,
+            step_profile: showStepProfile
         }
     }
 
     function setData(data){
         setMonitorData(data);
         setLoggingData(data);
+        setStepProfileData(data.step_profile);
         currentSimulationStep = data.current_step;
     }
 
-    register_stepping_function('monitors', getPollParams, setData);
+    function getStreamParams(){
+        var params = {
+            monitors: 'all',
+            logger: getPollParams().logger.join(',')
+        };
+        if(showStepProfile){
+            params.step_profile = 'True';
+        }
+        return params;
+    }
+
+    function setStreamData(frame){
+        // frames only carry the monitor values of the steps since the last frame
+        var monitors = {};
+        for(var uid in frame.monitors){
+            monitors[uid] = frame.monitors[uid];
+            if(uid in nodenetMonitors){
+                monitors[uid].values = $.extend(nodenetMonitors[uid].values, frame.monitors[uid].values);
+            }
+        }
+        currentSimulationStep = frame.current_step;
+        setMonitorData({monitors: monitors});
+        setLoggingData({logs: {servertime: last_logger_call, logs: frame.logs || []}});
+        if(frame.step_profile){
+            setStepProfileData(frame.step_profile);
+        }
+    }
+
+    register_stepping_function('monitors', getPollParams, setData, getStreamParams, setStreamData);
 
     function refreshMonitors(newNodenet){
         params = getPollParams();
@@ -145,7 +209,11 @@ $(function(){
     function setLoggingData(data){
         last_logger_call = data.logs.servertime;
         for(var idx in data.logs.logs){
-            logs.push(data.logs.logs[idx]);
+            // polling asks for the records since the last call's servertime, which may include ones we have
+            if(data.logs.logs[idx].seq > last_log_seq){
+                logs.push(data.logs.logs[idx]);
+                last_log_seq = data.logs.logs[idx].seq;
+            }
         }
         if(logs.length > viewProperties.max_log_entries){
             logs.splice(0, logs.length - viewProperties.max_log_entries);
@@ -195,6 +263,65 @@ $(function(){
                 el.checked=true;
             }
         });
+        $('#step_profile_switch').prop('checked', showStepProfile);
+        $('#step_profile_switch').on('change', function(event){
+            showStepProfile = event.target.checked;
+            $.cookie('showStepProfile', String(showStepProfile), {path:'/', expires:7})
+            if(!showStepProfile){
+                setStepProfileData(null);
+            }
+            if(currentNodenet){
+                api.call('set_step_profiling', {nodenet_uid: currentNodenet, enabled: showStepProfile}, refreshMonitors);
+            }
+        });
+        $('#step_profile_reset').on('click', function(event){
+            event.preventDefault();
+            api.call('reset_step_profile', {nodenet_uid: currentNodenet}, function(){
+                refreshMonitors();
+            });
+        });
+    }
+
+    function formatDuration(seconds){
+        if(seconds < 0.001){
+            return (seconds * 1000000).toFixed(0) + ' µs';
+        } else if(seconds < 1){
+            return (seconds * 1000).toFixed(2) + ' ms';
+        }
+        return seconds.toFixed(2) + ' s';
+    }
+
+    function setStepProfileData(profile){
+        var body = $('#step_profile tbody');
+        body.empty();
+        if(!profile){
+            return;
+        }
+        var names = Object.keys(profile.sections).sort(function(a, b){
+            return profile.sections[b].mean - profile.sections[a].mean;
+        });
+        for(var i = 0; i < names.length; i++){
+            var section = profile.sections[names[i]];
+            var peak = Math.max.apply(null, section.histogram) || 1;
+            var bars = $('<td>');
+            for(var j = 0; j < section.histogram.length; j++){
+                var title = formatDuration(profile.histogram_bin_edges[j]) + ' - ' + formatDuration(profile.histogram_bin_edges[j+1]) + ': ' + section.histogram[j];
+                bars.append($('<span>').attr('title', title).css({
+                    display: 'inline-block',
+                    verticalAlign: 'bottom',
+                    width: '4px',
+                    marginRight: '1px',
+                    background: '#08c',
+                    height: Math.ceil(16 * section.histogram[j] / peak) + 'px'
+                }));
+            }
+            var row = $('<tr>');
+            var cells = [names[i], section.count, formatDuration(section.mean), formatDuration(section.median), formatDuration(section.p95), formatDuration(section.max)];
+            for(var k = 0; k < cells.length; k++){
+                row.append($('<td>').text(cells[k]));
+            }
+            body.append(row.append(bars));
+        }
     }
 
     function updateMonitorList(monitors){
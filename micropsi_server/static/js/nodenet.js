@@ -47,7 +47,9 @@ var viewProperties = {
     yMax: 13500,
     xMax: 13500,
     copyPasteOffset: 50,
-    snap_to_grid: false
+    snap_to_grid: false,
+    // nodes are fetched for the visible part of the nodespace, in cells of this size
+    viewportGrid: 500
 };
 
 var nodenetscope = paper;
@@ -124,6 +126,9 @@ canvas_container = $('#nodenet').parent();
 
 max_coordinates = {};
 
+// the rectangle of the nodespace the nodes were fetched for
+currentViewport = null;
+
 var clipboard = {};
 
 // hm. not really nice. but let's see if we got other pairs, or need them configurable:
@@ -144,6 +149,11 @@ worldadapters = {};
 currentSimulationStep = 0;
 nodenetRunning = false;
 
+// the revision of the last nodespace data received while polling, and that data,
+// so the server only needs to send the changes since then
+nodespaceRevision = null;
+lastNodespaceData = null;
+
 get_available_worlds();
 
 registerResizeHandler();
@@ -240,10 +250,13 @@ function setCurrentNodenet(uid, nodespace, changed){
         nodespace = "Root";
     }
     $('#loading').show();
+    var viewport = getViewport();
     api.call('load_nodenet',
         {nodenet_uid: uid,
             nodespace: nodespace,
             include_links: $.cookie('renderlinks') == 'always',
+            viewport: viewport,
+            include_nodetypes: false
         },
         function(data){
             $('#loading').hide();
@@ -267,6 +280,7 @@ function setCurrentNodenet(uid, nodespace, changed){
             showDefaultForm();
             currentNodeSpace = data['nodespace'];
             currentNodenet = uid;
+            currentViewport = viewport;
 
             nodes = {};
             links = {};
@@ -275,35 +289,15 @@ function setCurrentNodenet(uid, nodespace, changed){
 
             $.cookie('selected_nodenet', currentNodenet, { expires: 7, path: '/' });
             if(nodenetChanged || jQuery.isEmptyObject(nodetypes)){
-                nodetypes = data.nodetypes;
-                sorted_nodetypes = Object.keys(nodetypes);
-                sorted_nodetypes.sort(function(a, b){
-                    if(a < b) return -1;
-                    if(a > b) return 1;
-                    return 0;
-                });
-                native_modules = data.native_modules;
-                sorted_native_modules = Object.keys(native_modules);
-                sorted_native_modules.sort(function(a, b){
-                    if(a < b) return -1;
-                    if(a > b) return 1;
-                    return 0;
-                });
-                for(var key in native_modules){
-                    nodetypes[key] = native_modules[key];
-                }
-                available_gatetypes = [];
-                for(var key in nodetypes){
-                    $.merge(available_gatetypes, nodetypes[key].gatetypes || []);
-                }
-                available_gatetypes = $.unique(available_gatetypes);
-                get_available_worldadapters(data.world, function(){
-                    setNodenetValues(nodenet_data);
-                    showDefaultForm();
+                getNodetypes(function(){
+                    get_available_worldadapters(data.world, function(){
+                        setNodenetValues(nodenet_data);
+                        showDefaultForm();
+                    });
+                    get_available_gatefunctions();
+                    setNodespaceData(data, true);
+                    getNodespaceList();
                 });
-                get_available_gatefunctions();
-                setNodespaceData(data, true);
-                getNodespaceList();
             } else {
                 setNodespaceData(data, (nodespaceChanged));
             }
@@ -321,6 +315,41 @@ function setCurrentNodenet(uid, nodespace, changed){
         });
 }
 
+// fetch the nodetypes and native modules. the browser revalidates them with their ETag,
+// so they are only transferred when they changed.
+function getNodetypes(callback){
+    $.ajax({
+        url: '/nodenet/nodetypes/' + currentNodenet,
+        dataType: 'json',
+        success: function(data){
+            nodetypes = data.nodetypes;
+            sorted_nodetypes = Object.keys(nodetypes);
+            sorted_nodetypes.sort(function(a, b){
+                if(a < b) return -1;
+                if(a > b) return 1;
+                return 0;
+            });
+            native_modules = data.native_modules;
+            sorted_native_modules = Object.keys(native_modules);
+            sorted_native_modules.sort(function(a, b){
+                if(a < b) return -1;
+                if(a > b) return 1;
+                return 0;
+            });
+            for(var key in native_modules){
+                nodetypes[key] = native_modules[key];
+            }
+            available_gatetypes = [];
+            for(var key in nodetypes){
+                $.merge(available_gatetypes, nodetypes[key].gatetypes || []);
+            }
+            available_gatetypes = $.unique(available_gatetypes);
+            if(callback) callback();
+        },
+        error: api.defaultErrorCallback
+    });
+}
+
 function getNodespaceList(){
     api.call('get_nodespace_list', {nodenet_uid:currentNodenet}, function(nodespacedata){
         var sorted = Object.values(nodespacedata);
@@ -339,6 +368,16 @@ function getNodespaceList(){
 // set visible nodes and links
 function setNodespaceData(data, changed){
     nodenetscope.activate();
+    if (data && data.delta){
+        data = mergeNodespaceDelta(data);
+    }
+    if (data && 'revision' in data){
+        nodespaceRevision = data.revision;
+        lastNodespaceData = data;
+    } else {
+        nodespaceRevision = null;
+        lastNodespaceData = null;
+    }
     if (data && !jQuery.isEmptyObject(data)){
         currentSimulationStep = data.current_step || 0;
         currentWorldadapter = data.worldadapter;
@@ -417,6 +456,45 @@ function setNodespaceData(data, changed){
     drawGridLines(view.element);
 }
 
+// applies the changes sent by the server to the last nodespace data we received
+function mergeNodespaceDelta(delta){
+    var data = lastNodespaceData;
+    var uid, key;
+    var merged_keys = ['delta', 'nodes', 'links', 'activations', 'removed_nodes', 'removed_links', 'monitors'];
+    delete data.user_prompt;
+    for(key in delta){
+        if(merged_keys.indexOf(key) < 0){
+            data[key] = delta[key];
+        }
+    }
+    for(var i = 0; i < delta.removed_nodes.length; i++){
+        delete data.nodes[delta.removed_nodes[i]];
+    }
+    for(i = 0; i < delta.removed_links.length; i++){
+        delete data.links[delta.removed_links[i]];
+    }
+    for(uid in delta.nodes){
+        data.nodes[uid] = delta.nodes[uid];
+    }
+    for(uid in delta.activations){
+        for(key in delta.activations[uid]){
+            data.nodes[uid][key] = delta.activations[uid][key];
+        }
+    }
+    for(uid in delta.links){
+        data.links[uid] = delta.links[uid];
+    }
+    var monitor_data = {};
+    for(uid in delta.monitors){
+        monitor_data[uid] = delta.monitors[uid];
+        if(data.monitors && uid in data.monitors){
+            monitor_data[uid].values = $.extend(data.monitors[uid].values, delta.monitors[uid].values);
+        }
+    }
+    data.monitors = monitor_data;
+    return data;
+}
+
 function addLinks(link_data){
     var link, sourceId, targetId;
     var outsideLinks = [];
@@ -450,21 +528,48 @@ function addLinks(link_data){
 }
 
 function get_nodenet_data(){
+    var include_links = $.cookie('renderlinks') == 'always';
+    var revision = null;
+    if(lastNodespaceData && lastNodespaceData.nodespace == currentNodeSpace && lastNodespaceData.include_links == include_links){
+        revision = nodespaceRevision;
+    }
     return {
         'nodespace': currentNodeSpace,
         'step': currentSimulationStep - 1,
-        'include_links': $.cookie('renderlinks') == 'always',
+        'include_links': include_links,
+        'revision': revision,
+        'viewport': currentViewport,
+        'include_nodetypes': false
+    }
+}
+
+function get_nodenet_stream_params(){
+    // the stream keeps track of the revision itself, and only sends the changes after its first frame
+    var params = {
+        'nodespace': currentNodeSpace,
+        'include_links': $.cookie('renderlinks') == 'always' ? 'True' : 'False'
+    }
+    if(currentViewport){
+        params.viewport = currentViewport.join(',');
+    }
+    return params;
+}
+
+function setNodespaceStreamData(frame){
+    if(frame.nodenet){
+        setNodespaceData(frame.nodenet);
     }
 }
 
+function register_nodenet_stepping(){
+    register_stepping_function('nodenet', get_nodenet_data, setNodespaceData, get_nodenet_stream_params, setNodespaceStreamData);
+}
 
 if($('#nodenet_editor').height() > 0){
-    register_stepping_function('nodenet', get_nodenet_data, setNodespaceData);
+    register_nodenet_stepping();
 }
 
-$('#nodenet_editor').on('shown', function(){
-    register_stepping_function('nodenet', get_nodenet_data, setNodespaceData);
-});
+$('#nodenet_editor').on('shown', register_nodenet_stepping);
 $('#nodenet_editor').on('hidden', function(){
     unregister_stepping_function('nodenet');
 });
@@ -484,7 +589,10 @@ function refreshNodespace(nodespace, step, callback){
         params.step = step;
     }
     params.include_links = nodenet_data['renderlinks'] == 'always';
+    params.viewport = getViewport();
+    params.include_nodetypes = false;
     api.call('get_nodespace', params , success=function(data){
+        currentViewport = params.viewport;
         var changed = nodespace != currentNodeSpace;
         if(changed){
             currentNodeSpace = nodespace;
@@ -781,6 +889,13 @@ updateViewSize = function() {
             maxY = Math.max(maxY, node.y * viewProperties.zoomFactor + node.bounds.height + viewProperties.frameWidth);
         }
     }
+    // only the nodes in the viewport are loaded, keep the rest of the nodespace reachable
+    if(max_coordinates.x){
+        maxX = Math.max(maxX, (max_coordinates.x + viewProperties.nodeWidth) * viewProperties.zoomFactor + viewProperties.frameWidth);
+    }
+    if(max_coordinates.y){
+        maxY = Math.max(maxY, (max_coordinates.y + viewProperties.nodeWidth) * viewProperties.zoomFactor + viewProperties.frameWidth);
+    }
     var newSize = new Size(
         Math.min(viewProperties.xMax, Math.max((maxX+viewProperties.frameWidth),
         el.width())),
@@ -2285,6 +2400,7 @@ function zoomIn(event){
     $.cookie('zoom_factor', viewProperties.zoomFactor, { expires: 7, path: '/' });
     prerenderLayer.removeChildren();
     redrawNodeNet(currentNodeSpace);
+    checkViewport();
 }
 
 function zoomOut(event){
@@ -2293,12 +2409,44 @@ function zoomOut(event){
     $.cookie('zoom_factor', viewProperties.zoomFactor, { expires: 7, path: '/' });
     prerenderLayer.removeChildren();
     redrawNodeNet(currentNodeSpace);
+    checkViewport();
 }
 
 function onResize(event) {
     updateViewSize();
+    checkViewport();
 }
 
+// the visible part of the nodespace with a margin of one cell, in node coordinates, snapped to
+// viewProperties.viewportGrid so that the view only changes when scrolling into a new cell
+function getViewport(){
+    var grid = viewProperties.viewportGrid;
+    var zoom = viewProperties.zoomFactor;
+    var left = canvas_container.scrollLeft() / zoom;
+    var top = canvas_container.scrollTop() / zoom;
+    var right = left + canvas_container.width() / zoom;
+    var bottom = top + canvas_container.height() / zoom;
+    return [
+        (Math.floor(left / grid) - 1) * grid,
+        (Math.floor(top / grid) - 1) * grid,
+        (Math.ceil(right / grid) + 1) * grid,
+        (Math.ceil(bottom / grid) + 1) * grid
+    ];
+}
+
+// fetch the nodes again if the visible part of the nodespace left the fetched one
+function checkViewport(){
+    if(currentViewport && nodenet_loaded && getViewport().join(',') != currentViewport.join(',')){
+        refreshNodespace();
+    }
+}
+
+var viewport_timeout = null;
+canvas_container.on('scroll', function(){
+    clearTimeout(viewport_timeout);
+    viewport_timeout = setTimeout(checkViewport, 200);
+});
+
 function updateSelection(event){
     var pos = event.point;
     if(Math.abs(pos.x - selectionStart.x) > 5 && Math.abs(pos.y - selectionStart.y) > 5){
@@ -38,6 +38,19 @@ def test_load_nodenet(app, test_nodenet):
     assert data['uid'] == test_nodenet
 
 
+def test_load_nodenet_viewport(app, test_nodenet, node):
+    response = app.post_json('/rpc/load_nodenet', params={
+        'nodenet_uid': test_nodenet,
+        'viewport': [-1000, -1000, -900, -900],
+        'include_nodetypes': False
+    })
+    assert_success(response)
+    data = response.json_body['data']
+    assert data['nodes'] == {}
+    assert 'nodetypes' not in data
+    assert 'native_modules' not in data
+
+
 def test_new_nodenet(app, engine):
     app.set_auth()
     response = app.post_json('/rpc/new_nodenet', params={
@@ -204,6 +217,14 @@ def test_step_simulation(app, test_nodenet):
     assert response.json_body['data']['current_step'] == 1
 
 
+def test_run_steps(app, test_nodenet):
+    app.set_auth()
+    response = app.get_json('/rpc/run_steps(nodenet_uid="%s",steps=20)' % test_nodenet)
+    assert_success(response)
+    assert response.json_body['data']['current_step'] == 20
+    assert response.json_body['data']['steps'] == 20
+
+
 def test_get_current_state(app, test_nodenet, test_world, node):
     from time import sleep
     app.set_auth()
@@ -733,6 +754,38 @@ def test_get_nodespace(app, test_nodenet, node):
     assert node in response.json_body['data']['nodes']
 
 
+def test_get_nodespace_viewport(app, test_nodenet, node):
+    response = app.post_json('/rpc/get_nodespace', params={
+        'nodenet_uid': test_nodenet,
+        'nodespace': None,
+        'include_links': False,
+        'step': -1,
+        'viewport': [-1000, -1000, -900, -900],
+        'page_size': 10,
+        'include_nodetypes': False
+    })
+    assert_success(response)
+    data = response.json_body['data']
+    assert data['nodes'] == {}
+    assert data['next_cursor'] is None
+    assert 'nodetypes' not in data
+    response = app.post_json('/rpc/get_nodespace', params={
+        'nodenet_uid': test_nodenet,
+        'nodespace': None,
+        'step': -1,
+        'page_size': 0
+    })
+    assert_failure(response)
+
+
+def test_nodetype_definitions(app, test_nodenet):
+    response = app.get('/nodenet/nodetypes/%s' % test_nodenet)
+    assert 'Pipe' in response.json_body['nodetypes']
+    etag = response.headers['ETag']
+    response = app.get('/nodenet/nodetypes/%s' % test_nodenet, headers={'If-None-Match': etag}, status=304)
+    assert response.body == b''
+
+
 def test_get_node(app, test_nodenet, node):
     response = app.get_json('/rpc/get_node(nodenet_uid="%s",node_uid="%s")' % (test_nodenet, node))
     assert_success(response)
@@ -1150,6 +1203,20 @@ def test_get_monitoring_info(app, test_nodenet):
     assert response.json_body['data']['logs']['logs'] == []
 
 
+def test_step_profiling_needs_permission(app, test_nodenet):
+    app.unset_auth()
+    response = app.post_json('/rpc/set_step_profiling', params={'nodenet_uid': test_nodenet, 'enabled': True}, expect_errors=True)
+    assert_failure(response)
+    assert 'Insufficient permissions' in response.json_body['data']
+    response = app.post_json('/rpc/reset_step_profile', params={'nodenet_uid': test_nodenet}, expect_errors=True)
+    assert_failure(response)
+    app.set_auth()
+    response = app.post_json('/rpc/set_step_profiling', params={'nodenet_uid': test_nodenet, 'enabled': True})
+    assert_success(response)
+    response = app.post_json('/rpc/set_step_profiling', params={'nodenet_uid': test_nodenet, 'enabled': False})
+    assert_success(response)
+
+
 def test_400(app):
     app.set_auth()
     response = app.get_json('/rpc/save_nodenet("foobar")', expect_errors=True)
@@ -1259,7 +1326,11 @@ def test_nodenet_data_structure(app, test_nodenet, nodetype_def, nodefunc_def, n
     response = app.get_json('/rpc/revert_nodenet(nodenet_uid="%s")' % test_nodenet)
     response_2 = app.get_json('/rpc/load_nodenet(nodenet_uid="%s")' % test_nodenet)
 
-    assert response_1.json_body['data'] == response_2.json_body['data']
+    # reverting is a change, so only the revision differs
+    data_1 = response_1.json_body['data']
+    data_2 = response_2.json_body['data']
+    assert data_1.pop('revision') != data_2.pop('revision')
+    assert data_1 == data_2
 
     data = response_2.json_body['data']
 
@@ -1349,3 +1420,19 @@ def test_nodenet_data_structure(app, test_nodenet, nodetype_def, nodefunc_def, n
     assert data['version'] == 1
     assert data['world'] is None
     assert data['worldadapter'] is None
+
+
+def test_stream_unknown_nodenet(app):
+    response = app.get('/stream/no_such_nodenet', expect_errors=True)
+    assert response.status_int == 404
+
+
+def test_stream_refused_on_single_threaded_server(app, test_nodenet):
+    from configuration import config
+    server = config['micropsi2']['server']
+    config['micropsi2']['server'] = 'wsgiref'
+    try:
+        response = app.get('/stream/%s' % test_nodenet, expect_errors=True)
+        assert response.status_int == 503
+    finally:
+        config['micropsi2']['server'] = server
@@ -108,6 +108,32 @@
                     </form>
                 </div>
             </div>
+            <div class="profile_field layout_field">
+                <h4>Step profile</h4>
+                <div class="contentbox section">
+                    <form class="form-horizontal monitor_list">
+                        <label for="step_profile_switch">
+                            <input type="checkbox" id="step_profile_switch" />
+                            Show step timings
+                        </label>
+                        <button class="btn btn-mini" id="step_profile_reset">Reset</button>
+                    </form>
+                    <table class="table table-condensed table-striped" id="step_profile">
+                        <thead>
+                            <tr>
+                                <th>Section</th>
+                                <th>Count</th>
+                                <th>Mean</th>
+                                <th>Median</th>
+                                <th>95%</th>
+                                <th>Max</th>
+                                <th>Histogram</th>
+                            </tr>
+                        </thead>
+                        <tbody></tbody>
+                    </table>
+                </div>
+            </div>
             <p style="clear:both">&nbsp;</p>
         </div>
     </div>